@@ -0,0 +1,44 @@
+"""Compares reading a list through the JSON API with the HTML list page.
+
+    python -m benchmarks.bench_api --sizes 10 1000 10000 --repeat 50
+"""
+import argparse
+
+from benchmarks.utils import measure, print_table, seed_list, setup_django, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+    client = Client()
+    client.get('/')  # sets the CSRF cookie used by the HTML ETags
+
+    rows = []
+    for size in args.sizes:
+        list_ = seed_list(size)
+        paths = {
+            'html': '/lists/{}/'.format(list_.id),
+            'html-stream': '/lists/{}/?stream=1'.format(list_.id),
+            'api': '/api/lists/{}/'.format(list_.id),
+            'api-text': '/api/lists/{}/?fields=text'.format(list_.id),
+        }
+        for name, path in paths.items():
+            def fetch():
+                response = client.get(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            rows.append(dict(items=size, path=name, **summarize(measure(fetch, args.repeat))))
+        etag = client.get(paths['api'])['ETag']
+        samples = measure(lambda: client.get(paths['api'], HTTP_IF_NONE_MATCH=etag), args.repeat)
+        rows.append(dict(items=size, path='api-304', **summarize(samples)))
+
+    print_table(rows, ['items', 'path', 'mean_ms', 'p50_ms', 'p95_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Compares how many slow clients sync WSGI workers and the ASGI entry point
+can serve at once.
+
+Each client takes --upload-ms to send its request body. A sync worker is
+held for the whole upload, so --workers of them serve that many clients at
+a time. The ASGI handler reads bodies on the event loop and only uses its
+--workers threads to run the views.
+
+    python -m benchmarks.bench_asgi_concurrency --clients 200 --workers 8 --upload-ms 100
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import print_table, seed_list, setup_django, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--upload-ms', type=float, default=100)
+    parser.add_argument('--items', type=int, default=100)
+    args = parser.parse_args()
+
+    setup_django()
+    from benchmarks.harness import WSGIDriver
+    from superlists.asgi import ASGIHandler
+    list_path = '/lists/{}/'.format(seed_list(args.items).id)
+    upload = args.upload_ms / 1000
+    driver = WSGIDriver()
+
+    # Every client connects at the start, so latencies include the time
+    # spent waiting for a free worker.
+    def sync_client(started):
+        time.sleep(upload)  # the worker waits on the slow upload
+        driver.request('GET', list_path)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        sync_latencies = list(pool.map(sync_client, [started] * args.clients))
+    sync_duration = time.perf_counter() - started
+
+    handler = ASGIHandler(driver.application, max_workers=args.workers)
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': list_path, 'query_string': b'',
+        'headers': [(b'host', b'localhost')], 'server': ('localhost', 80),
+    }
+
+    async def asgi_client(started):
+        async def receive():
+            await asyncio.sleep(upload)
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            pass
+
+        await handler(scope, receive, send)
+        return time.perf_counter() - started
+
+    async def all_asgi_clients(started):
+        return await asyncio.gather(*[asgi_client(started) for _ in range(args.clients)])
+
+    loop = asyncio.new_event_loop()
+    started = time.perf_counter()
+    asgi_latencies = loop.run_until_complete(all_asgi_clients(started))
+    asgi_duration = time.perf_counter() - started
+    loop.close()
+
+    rows = [
+        dict(server='wsgi sync', duration_s=sync_duration,
+             req_per_s=args.clients / sync_duration, **summarize(sync_latencies)),
+        dict(server='asgi', duration_s=asgi_duration,
+             req_per_s=args.clients / asgi_duration, **summarize(asgi_latencies)),
+    ]
+    print_table(rows, ['server', 'duration_s', 'req_per_s', 'p50_ms', 'p95_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Times duplicate validation and saving of a new item on lists of growing
+size, with the exact-match query alone and with the list's item index in
+front of it, kept in memory or in mapped files (LISTS_ITEM_INDEX_DIR).
+
+The index is built once per list (reported as build_ms) and then kept up to
+date by the saves; validations of new texts skip the query, repeated texts
+and the filter's false positives still run it.
+
+    python -m benchmarks.bench_dedupe --sizes 1000 10000 100000 --repeat 500
+"""
+import argparse
+import tempfile
+
+from benchmarks.utils import measure, print_table, seed_list, setup_django, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext, override_settings
+    from lists import dedupe, forms
+    from lists.forms import ExistingListItemForm
+
+    rows = []
+    for size in args.sizes:
+        list_ = seed_list(size)
+        texts = iter('new item {}'.format(n) for n in range(20 * args.repeat))
+
+        def validate_new():
+            form = ExistingListItemForm(for_list=list_, data={'text': next(texts)})
+            assert form.is_valid()
+
+        def save_new():
+            form = ExistingListItemForm(for_list=list_, data={'text': next(texts)})
+            assert form.is_valid()
+            form.save()
+
+        def validate_duplicate():
+            form = ExistingListItemForm(for_list=list_, data={'text': 'item 0'})
+            assert not form.is_valid()
+
+        original = forms.may_contain
+        forms.may_contain = lambda list_, text_hash: True
+        try:
+            rows.append(dict(items=size, mode='query', queries=args.repeat,
+                             save_ms=summarize(measure(save_new, args.repeat))['mean_ms'],
+                             **summarize(measure(validate_new, args.repeat))))
+        finally:
+            forms.may_contain = original
+
+        for mode, index_dir in [('memory', None), ('files', tempfile.mkdtemp())]:
+            with override_settings(LISTS_ITEM_INDEX_DIR=index_dir):
+                build = measure(lambda: dedupe.get_item_index(list_), 1)
+                with CaptureQueriesContext(connection) as queries:
+                    validated = measure(validate_new, args.repeat)
+                saved = measure(save_new, args.repeat)
+                duplicate = measure(validate_duplicate, args.repeat)
+                index_kb = len(dedupe.get_item_index(list_).buffer) / 1024
+                dedupe.get_indexes().clear()
+            rows.append(dict(items=size, mode=mode, queries=len(queries),
+                             save_ms=summarize(saved)['mean_ms'],
+                             build_ms=1000 * build[0], index_kb=index_kb,
+                             **summarize(validated)))
+            rows.append(dict(items=size, mode=mode + ', dup', queries=args.repeat,
+                             **summarize(duplicate)))
+    for row in rows:
+        for column in ('save_ms', 'build_ms', 'index_kb'):
+            row.setdefault(column, '')
+    print_table(rows, ['items', 'mode', 'mean_ms', 'p95_ms', 'queries', 'save_ms',
+                       'build_ms', 'index_kb'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Holds thousands of idle event stream subscribers on one ASGI handler and
+measures what they cost and how fast a new item reaches all of them.
+
+Every subscriber is an /lists/<id>/events stream served by
+superlists.asgi. Items are then saved --events times, --interval seconds
+apart, either in this process or, with --cross-process, by a second broker
+that reaches this one over the unix socket directory the way another
+gunicorn worker would. Delivery latency is from the save to each stream
+sending the row.
+
+    python -m benchmarks.bench_events --subscribers 5000 --events 20
+"""
+import argparse
+import asyncio
+import resource
+import tempfile
+import threading
+import time
+
+from benchmarks.utils import print_table, setup_django, summarize
+
+
+def rss_mb():
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--subscribers', type=int, default=5000)
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--lists', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--interval', type=float, default=0.5)
+    parser.add_argument('--cross-process', action='store_true')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from benchmarks.harness import WSGIDriver
+    from lists.broker import Broker, get_broker, item_events
+    from lists.forms import ExistingListItemForm
+    from lists.models import List
+    from superlists.asgi import ASGIHandler
+
+    broker_dir = tempfile.mkdtemp() if args.cross_process else None
+    settings.LISTS_BROKER_DIR = broker_dir
+    settings.LISTS_EVENTS_KEEPALIVE = 3600
+    broker = get_broker()
+    publisher = Broker(broker_dir) if args.cross_process else broker
+
+    lists = [List.objects.create() for _ in range(args.lists)]
+    handler = ASGIHandler(WSGIDriver().application, max_workers=args.workers)
+    received = {}  # event id -> arrival times
+    sent_at = {}
+    done = threading.Event()
+    expected = args.subscribers // args.lists
+
+    def add_items():
+        for n in range(args.events):
+            list_ = lists[n % len(lists)]
+            form = ExistingListItemForm(for_list=list_, data={'text': 'item {}'.format(n)})
+            form.is_valid()
+            started = time.perf_counter()
+            if publisher is broker:
+                item = form.save()
+            else:
+                # Save without the signal and publish from the other broker.
+                item = form.instance
+                item.save()
+                list_.record_new_items(1)
+                publisher.publish(list_.id, item_events(list_, [item]))
+            sent_at[item.id] = started
+            time.sleep(args.interval)
+        done.set()
+
+    async def subscriber(list_, disconnected):
+        scope = {
+            'type': 'http', 'method': 'GET',
+            'path': '/lists/{}/events'.format(list_.id), 'query_string': b'',
+            'headers': [(b'host', b'localhost')], 'server': ('localhost', 80),
+        }
+        requests = [{'type': 'http.request', 'body': b''}]
+
+        async def receive():
+            if requests:
+                return requests.pop(0)
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            body = message.get('body', b'')
+            if body.startswith(b'id: '):
+                event_id = int(body[4:body.index(b'\n')])
+                received.setdefault(event_id, []).append(time.perf_counter())
+
+        await handler(scope, receive, send)
+
+    async def run():
+        disconnected = asyncio.Event()
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        streams = [
+            asyncio.ensure_future(subscriber(lists[n % len(lists)], disconnected))
+            for n in range(args.subscribers)
+        ]
+        while sum(map(len, handler.event_queues.values())) < args.subscribers:
+            await asyncio.sleep(0.01)
+        connect_s = time.perf_counter() - started
+        idle_kb = 1024 * (rss_mb() - rss_before) / args.subscribers
+
+        threading.Thread(target=add_items).start()
+        while not done.is_set() or sum(map(len, received.values())) < expected * args.events:
+            await asyncio.sleep(0.01)
+        disconnected.set()
+        await asyncio.gather(*streams)
+        return connect_s, idle_kb
+
+    loop = asyncio.get_event_loop()
+    connect_s, idle_kb = loop.run_until_complete(run())
+    handler.executor.shutdown()
+
+    delivery = [
+        arrival - sent_at[event_id]
+        for event_id, arrivals in received.items() for arrival in arrivals
+    ]
+    rows = [dict(
+        subscribers=args.subscribers,
+        connect_s=connect_s,
+        idle_kb_each=idle_kb,
+        deliveries=len(delivery),
+        **summarize(delivery)
+    )]
+    print_table(rows, ['subscribers', 'connect_s', 'idle_kb_each', 'deliveries',
+                       'p50_ms', 'p95_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Measures the latency of adding one item to lists of growing size, going
+through ExistingListItemForm's duplicate check and save.
+
+    python -m benchmarks.bench_item_inserts --sizes 10 1000 100000 --repeat 200
+"""
+import argparse
+
+from benchmarks.utils import measure, print_table, seed_list, setup_django, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from lists.forms import ExistingListItemForm
+
+    rows = []
+    for size in args.sizes:
+        list_ = seed_list(size)
+        counter = iter(range(args.repeat))
+
+        def add_item():
+            text = 'new item {} '.format(next(counter)) * 20
+            form = ExistingListItemForm(for_list=list_, data={'text': text})
+            assert form.is_valid()
+            form.save()
+
+        def reject_duplicate():
+            form = ExistingListItemForm(for_list=list_, data={'text': 'item 0'})
+            assert not form.is_valid()
+
+        rows.append(dict(items=size, op='insert', **summarize(measure(add_item, args.repeat))))
+        rows.append(dict(items=size, op='duplicate', **summarize(measure(reject_duplicate, args.repeat))))
+
+    print_table(rows, ['items', 'op', 'mean_ms', 'p50_ms', 'p95_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Times item searches through the full-text index against the scan it
+replaces (every word matched with icontains), on --items items spread over
+--lists lists.
+
+Item texts are a few words drawn from a fixed vocabulary, so a search for a
+common word has plenty of matches to rank and a rare one only a handful.
+The index is built from scratch first, as `manage.py rebuild_search_index`
+does (reported as build_s, with its size on disk).
+
+    python -m benchmarks.bench_search --items 1000000 --repeat 50 --scan-repeat 3
+"""
+import argparse
+import os
+import random
+import tempfile
+
+from benchmarks.utils import measure, print_table, setup_django, summarize
+
+COMMON = ['buy', 'milk', 'call', 'fix', 'book', 'pay', 'send', 'clean', 'read', 'plan']
+RARE = ['peacock', 'feathers', 'fishing', 'accordion', 'zeppelin']
+QUERIES = [
+    ('common word', 'milk'),
+    ('two words', 'buy milk'),
+    ('prefix', 'feath*'),
+    ('rare word', 'zeppelin'),
+    ('no match', 'quokka'),
+]
+
+
+def seed(item_count, list_count, chunk_size=10000):
+    from lists.models import Item, List, hash_text
+    rng = random.Random(0)
+    lists = [List.objects.create() for _ in range(list_count)]
+    for start in range(0, item_count, chunk_size):
+        items = []
+        for n in range(start, min(start + chunk_size, item_count)):
+            words = rng.sample(COMMON, 3)
+            if rng.random() < 0.001:
+                words.append(rng.choice(RARE))
+            text = '{} {}'.format(' '.join(words), n)
+            items.append(Item(list=lists[n % list_count], text=text, text_hash=hash_text(text)))
+        Item.objects.bulk_create(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=1000000)
+    parser.add_argument('--lists', type=int, default=1000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--scan-repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from lists.search import all_item_rows, get_search_index, scan_items
+
+    path = os.path.join(tempfile.gettempdir(), 'superlists-bench-search.sqlite3')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    settings.LISTS_SEARCH_INDEX = path
+    seed(args.items, args.lists)
+    index = get_search_index()
+    build = measure(lambda: index.rebuild(all_item_rows()), 1)[0]
+    index_mb = os.path.getsize(path) / 2 ** 20
+
+    rows = []
+    for name, query in QUERIES:
+        hits = len(index.search(query, args.limit))
+        indexed = measure(lambda: index.search(query, args.limit), args.repeat)
+        scanned = measure(lambda: scan_items(query, args.limit), args.scan_repeat)
+        rows.append(dict(query=name, mode='index', hits=hits, **summarize(indexed)))
+        rows.append(dict(query=name, mode='scan', hits=len(scan_items(query, args.limit)),
+                         **summarize(scanned)))
+    print('{} items in {} lists; index built in {:.1f}s, {:.1f} MB'.format(
+        args.items, args.lists, build, index_mb))
+    print_table(rows, ['query', 'mode', 'hits', 'mean_ms', 'p50_ms', 'p95_ms'])
+
+
+if __name__ == '__main__':
+    main()
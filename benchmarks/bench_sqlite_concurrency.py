@@ -0,0 +1,142 @@
+"""Measures how long list reads take while other connections keep inserting
+items, with SQLite's default rollback journal and with the WAL profile from
+superlists/production_settings.py.
+
+    python -m benchmarks.bench_sqlite_concurrency --readers 4 --writers 2 --seconds 5
+"""
+import argparse
+import sqlite3
+import threading
+import time
+import traceback
+
+from benchmarks.utils import print_table, seed_list, setup_django, summarize
+
+PROFILES = {
+    'rollback journal': {'journal_mode': 'delete', 'synchronous': 'full'},
+    'wal': None,  # filled from production settings
+}
+
+# Pragmas stored in the database file rather than set per connection. They
+# are set once before the threads start: connections switching the journal
+# mode at the same time fail with "database is locked".
+DATABASE_PRAGMAS = ('journal_mode',)
+
+
+def run_profile(db_name, pragmas, list_id, readers, writers, seconds, stall_ms):
+    from lists.db import apply_sqlite_pragmas
+    from lists.models import hash_text
+
+    stop = threading.Event()
+    read_samples, write_samples = [], []
+    errors, failures = [], []
+    lock = threading.Lock()
+
+    conn = sqlite3.connect(db_name, timeout=30)
+    try:
+        apply_sqlite_pragmas(conn.cursor(), pragmas)
+    finally:
+        conn.close()
+    connection_pragmas = {name: value for name, value in pragmas.items()
+                          if name not in DATABASE_PRAGMAS}
+
+    def connect():
+        conn = sqlite3.connect(db_name, timeout=30)
+        apply_sqlite_pragmas(conn.cursor(), connection_pragmas)
+        return conn
+
+    def run(target, *args):
+        # A thread that dies would leave the profile measured with fewer
+        # connections than asked for.
+        try:
+            target(*args)
+        except Exception:
+            with lock:
+                failures.append(traceback.format_exc())
+            stop.set()
+
+    def reader():
+        conn = connect()
+        samples = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            conn.execute(
+                'SELECT id, text FROM lists_item WHERE list_id = ? ORDER BY id LIMIT 100',
+                (list_id,)).fetchall()
+            samples.append(time.perf_counter() - start)
+        with lock:
+            read_samples.extend(samples)
+
+    def writer(number):
+        conn = connect()
+        samples = []
+        count = 0
+        while not stop.is_set():
+            count += 1
+            text = 'writer {} item {} {}'.format(number, count, time.time())
+            start = time.perf_counter()
+            try:
+                with conn:
+                    conn.execute(
+                        'INSERT INTO lists_item (list_id, text, text_hash) VALUES (?, ?, ?)',
+                        (list_id, text, hash_text(text)))
+            except sqlite3.OperationalError as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            samples.append(time.perf_counter() - start)
+        with lock:
+            write_samples.extend(samples)
+
+    threads = [threading.Thread(target=run, args=(reader,)) for _ in range(readers)]
+    threads += [threading.Thread(target=run, args=(writer, n)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    stop.wait(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise RuntimeError('{} of {} threads failed:\n{}'.format(
+            len(failures), len(threads), failures[0]))
+
+    stalls = sum(1 for sample in read_samples if sample * 1000 > stall_ms)
+    return {
+        'reads_per_s': len(read_samples) / seconds,
+        'read_stalls': stalls,
+        'writes_per_s': len(write_samples) / seconds,
+        'write_errors': len(errors),
+        **{'read_' + key: value for key, value in summarize(read_samples).items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--stall-ms', type=float, default=50,
+                        help='reads slower than this count as stalls')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.db import connection
+    from superlists import production_settings
+    list_id = seed_list(args.items).id
+    connection.close()
+
+    PROFILES['wal'] = production_settings.LISTS_SQLITE_PRAGMAS
+    db_name = settings.DATABASES['default']['NAME']
+    rows = []
+    for name, pragmas in PROFILES.items():
+        result = run_profile(db_name, pragmas, list_id, args.readers, args.writers,
+                             args.seconds, args.stall_ms)
+        rows.append(dict(profile=name, **result))
+    print_table(rows, ['profile', 'reads_per_s', 'read_p50_ms', 'read_p95_ms',
+                       'read_stalls', 'writes_per_s', 'write_errors'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Measures render time per view template with the development template
+settings (templates re-read and parsed on every render, static URLs
+resolved on every render) and with the production ones (cached loader,
+memoized static URLs).
+
+    python -m benchmarks.bench_templates --repeat 500
+"""
+import argparse
+
+from benchmarks.utils import measure, print_table, seed_list, setup_django, summarize
+
+APP_DIRS_LOADERS = ['django.template.loaders.app_directories.Loader']
+CACHED_LOADERS = [('django.template.loaders.cached.Loader', APP_DIRS_LOADERS)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=500)
+    parser.add_argument('--items', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.template import Engine, RequestContext
+    from django.test import RequestFactory
+    from lists import assets
+    from lists.forms import ExistingListItemForm, ItemForm
+
+    list_ = seed_list(args.items)
+    request = RequestFactory().get('/')
+    contexts = {
+        'home.html': {'form': ItemForm()},
+        'list.html': {'list': list_, 'form': ExistingListItemForm(for_list=list_)},
+    }
+    engines = {
+        'uncached': Engine(loaders=APP_DIRS_LOADERS, libraries={
+            'lists_tags': 'lists.templatetags.lists_tags'}),
+        'cached': Engine(loaders=CACHED_LOADERS, libraries={
+            'lists_tags': 'lists.templatetags.lists_tags'}),
+    }
+
+    rows = []
+    for config, engine in engines.items():
+        for name, context in contexts.items():
+            def render():
+                if config == 'uncached':
+                    # What {% load static from staticfiles %} did per render.
+                    assets.static_url.cache_clear()
+                return engine.get_template(name).render(RequestContext(request, context))
+            render()
+            samples = measure(render, args.repeat)
+            rows.append(dict(config=config, template=name, **summarize(samples)))
+
+    print_table(rows, ['config', 'template', 'mean_ms', 'p50_ms', 'p95_ms'])
+
+
+if __name__ == '__main__':
+    main()
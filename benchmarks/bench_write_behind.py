@@ -0,0 +1,106 @@
+"""Bursts of item posts from many concurrent clients, saved directly and
+through the write-behind journal.
+
+Every client posts --posts items to one of --lists lists as list.js does. The
+database uses the WAL profile and busy timeout from
+superlists/production_settings.py, so direct saves queue on SQLite's write
+lock; with the journal they only append to a file, and the flusher thread
+saves them in batches. After the burst the queue is drained and counted, to
+check that nothing was lost.
+
+    python -m benchmarks.bench_write_behind --clients 32 --posts 50
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.utils import print_table, setup_django, summarize
+
+
+def run_burst(driver, list_ids, clients, posts, label):
+    samples, errors = [], []
+    lock = threading.Lock()
+
+    def client(number):
+        from django.db import connection
+        own_samples, own_errors = [], 0
+        for n in range(posts):
+            list_id = list_ids[(number + n) % len(list_ids)]
+            start = time.perf_counter()
+            try:
+                response = driver.request(
+                    'POST', '/lists/{}/'.format(list_id),
+                    data={'text': '{} client {} item {}'.format(label, number, n)},
+                    xhr=True)
+                ok = response.status == 201
+            except Exception:
+                ok = False
+            if ok:
+                own_samples.append(time.perf_counter() - start)
+            else:
+                own_errors += 1
+        connection.close()
+        with lock:
+            samples.extend(own_samples)
+            errors.append(own_errors)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+    return dict(
+        mode=label,
+        posts_per_s=len(samples) / duration,
+        errors=sum(errors),
+        **summarize(samples)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--posts', type=int, default=50)
+    parser.add_argument('--lists', type=int, default=4)
+    parser.add_argument('--no-fsync', action='store_true',
+                        help='Append to the journal without fsync.')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.db import connection
+    from benchmarks.harness import WSGIDriver
+    from lists.models import Item, List
+    from lists.writebehind import get_journal
+    from superlists import production_settings
+
+    settings.LISTS_SQLITE_PRAGMAS = production_settings.LISTS_SQLITE_PRAGMAS
+    settings.DATABASES['default']['OPTIONS'] = (
+        production_settings.DATABASES['default'].get('OPTIONS', {}))
+    connection.close()
+    list_ids = [List.objects.create().id for _ in range(args.lists)]
+    driver = WSGIDriver()
+
+    rows = [run_burst(driver, list_ids, args.clients, args.posts, 'direct')]
+
+    settings.LISTS_WRITE_BEHIND_JOURNAL = os.path.join(
+        tempfile.mkdtemp(), 'items.jsonl')
+    settings.LISTS_WRITE_BEHIND_FSYNC = not args.no_fsync
+    journal = get_journal()
+    rows.append(run_burst(driver, list_ids, args.clients, args.posts, 'write-behind'))
+    started = time.perf_counter()
+    journal.flush()
+    drain_s = time.perf_counter() - started
+
+    print_table(rows, ['mode', 'posts_per_s', 'mean_ms', 'p50_ms', 'p95_ms', 'errors'])
+    saved = Item.objects.filter(text__startswith='write-behind').count()
+    print('write-behind: {} items saved, {} errors, final drain {:.2f}s'.format(
+        saved, rows[1]['errors'], drain_s))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+"""Load test for the superlists request paths.
+
+Replays a weighted mix of list views, item adds (including duplicates and
+empty items) and new lists against a database seeded with --lists lists of
+--items items each, either in-process through superlists.wsgi.application
+or over the unix socket of a local gunicorn, as deployed by
+deploy_tools/gunicorn-upstart.template.conf.
+
+    python -m benchmarks.harness --mode wsgi --requests 2000 --save baseline.json
+    python -m benchmarks.harness --mode gunicorn --workers 3 --concurrency 8 \\
+        --baseline baseline.json
+
+Reports requests per second, latency percentiles and queries per request
+for each kind of request. Query counts come from the Server-Timing header
+added by lists.middleware.PerformanceMiddleware. With --baseline, exits
+with status 1 when a request kind got slower or runs more queries than the
+baseline did.
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from benchmarks.utils import percentile, print_table, seed_list, setup_django
+
+DEFAULT_MIX = 'view=60,add=20,duplicate=5,empty=5,new=10'
+CSRF_TOKEN = 'b' * 32
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+class Response(object):
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def queries(self):
+        match = QUERIES_RE.search(self.headers.get('server-timing', ''))
+        return int(match.group(1)) if match else None
+
+
+class WSGIDriver(object):
+    """Calls the WSGI application directly, in this process."""
+
+    def __init__(self):
+        from superlists.wsgi import application
+        self.application = application
+
+    def request(self, method, path, data=None, xhr=False):
+        body = urlencode(data).encode('utf-8') if data is not None else b''
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'HTTP_COOKIE': 'csrftoken=' + CSRF_TOKEN,
+            'HTTP_X_CSRFTOKEN': CSRF_TOKEN,
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        if xhr:
+            environ['HTTP_X_REQUESTED_WITH'] = 'XMLHttpRequest'
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split()[0])
+            started['headers'] = {name.lower(): value for name, value in headers}
+
+        result = self.application(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return Response(started['status'], started['headers'], content)
+
+    def close(self):
+        pass
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, socket_path):
+        super().__init__('localhost')
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+class GunicornDriver(object):
+    """Starts gunicorn on a unix socket and talks HTTP to it."""
+
+    def __init__(self, workers, worker_class='sync'):
+        self.socket_path = os.path.join(
+            tempfile.gettempdir(), 'superlists-bench-{}.socket'.format(os.getpid()))
+        gunicorn = os.path.join(os.path.dirname(sys.executable), 'gunicorn')
+        self.process = subprocess.Popen([
+            gunicorn,
+            '--bind', 'unix:' + self.socket_path,
+            '--workers', str(workers),
+            '--worker-class', worker_class,
+            'superlists.wsgi:application',
+        ], env=dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings'))
+        self._connections = threading.local()
+        self._wait_until_ready()
+
+    def _wait_until_ready(self, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError('gunicorn exited with {}'.format(self.process.returncode))
+            if os.path.exists(self.socket_path):
+                try:
+                    self.request('GET', '/')
+                    return
+                except OSError:
+                    self._connections.conn = None
+            time.sleep(0.1)
+        raise RuntimeError('gunicorn did not start within {}s'.format(timeout))
+
+    def request(self, method, path, data=None):
+        conn = getattr(self._connections, 'conn', None)
+        if conn is None:
+            conn = self._connections.conn = UnixHTTPConnection(self.socket_path)
+        body = urlencode(data) if data is not None else None
+        conn.request(method, path, body=body, headers={
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Cookie': 'csrftoken=' + CSRF_TOKEN,
+            'X-CSRFToken': CSRF_TOKEN,
+        })
+        response = conn.getresponse()
+        content = response.read()
+        headers = {name.lower(): value for name, value in response.getheaders()}
+        return Response(response.status, headers, content)
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+class Workload(object):
+    """Picks the next request from the weighted mix."""
+
+    def __init__(self, mix, list_ids, items_per_list, rng):
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.list_ids = list_ids
+        self.items_per_list = items_per_list
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.counter = 0
+
+    def _unique_text(self):
+        with self.lock:
+            self.counter += 1
+            return 'bench item {}-{}'.format(os.getpid(), self.counter)
+
+    def next_request(self):
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        list_id = self.rng.choice(self.list_ids)
+        list_path = '/lists/{}/'.format(list_id)
+        if kind == 'view':
+            return kind, 'GET', list_path, None
+        if kind == 'add':
+            return kind, 'POST', list_path, {'text': self._unique_text()}
+        if kind == 'duplicate':
+            text = 'item {}'.format(self.rng.randrange(max(self.items_per_list, 1)))
+            return kind, 'POST', list_path, {'text': text}
+        if kind == 'empty':
+            return kind, 'POST', list_path, {'text': ''}
+        if kind == 'new':
+            return kind, 'POST', '/lists/new', {'text': self._unique_text()}
+        raise ValueError('Unknown request kind: {}'.format(kind))
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        kind, weight = part.split('=')
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+def run(driver, workload, total_requests, concurrency):
+    samples = {kind: [] for kind in workload.kinds}
+    errors = {kind: 0 for kind in workload.kinds}
+    lock = threading.Lock()
+
+    def one_request(_):
+        kind, method, path, data = workload.next_request()
+        start = time.perf_counter()
+        try:
+            response = driver.request(method, path, data)
+        except Exception:
+            with lock:
+                errors[kind] += 1
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            if response.status >= 400:
+                errors[kind] += 1
+            else:
+                samples[kind].append((elapsed, response.queries))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_request, range(total_requests)))
+    duration = time.perf_counter() - started
+    return summarize(samples, errors, duration)
+
+
+def summarize(samples, errors, duration):
+    results = {}
+    everything = []
+    for kind, kind_samples in samples.items():
+        if not kind_samples and not errors[kind]:
+            continue
+        latencies = [elapsed for elapsed, _ in kind_samples]
+        queries = [count for _, count in kind_samples if count is not None]
+        everything.extend(kind_samples)
+        results[kind] = _stats(latencies, queries, duration, errors[kind])
+    results['all'] = _stats(
+        [elapsed for elapsed, _ in everything],
+        [count for _, count in everything if count is not None],
+        duration, sum(errors.values()),
+    )
+    return results
+
+
+def _stats(latencies, queries, duration, error_count):
+    if not latencies:
+        return {'requests': 0, 'errors': error_count}
+    return {
+        'requests': len(latencies),
+        'errors': error_count,
+        'req_per_s': len(latencies) / duration,
+        'p50_ms': 1000 * percentile(latencies, 0.50),
+        'p90_ms': 1000 * percentile(latencies, 0.90),
+        'p99_ms': 1000 * percentile(latencies, 0.99),
+        'queries': sum(queries) / len(queries) if queries else None,
+    }
+
+
+def find_regressions(results, baseline, tolerance, query_tolerance):
+    regressions = []
+    for kind, stats in results.items():
+        before = baseline.get(kind)
+        if not before or 'p50_ms' not in before or 'p50_ms' not in stats:
+            continue
+        if stats['p50_ms'] > before['p50_ms'] * (1 + tolerance):
+            regressions.append('{}: p50 {:.2f}ms -> {:.2f}ms'.format(
+                kind, before['p50_ms'], stats['p50_ms']))
+        if (stats['queries'] is not None and before.get('queries') is not None and
+                stats['queries'] > before['queries'] * (1 + query_tolerance)):
+            regressions.append('{}: queries {:.2f} -> {:.2f}'.format(
+                kind, before['queries'], stats['queries']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['wsgi', 'gunicorn'], default='wsgi')
+    parser.add_argument('--workers', type=int, default=3,
+                        help='gunicorn worker processes')
+    parser.add_argument('--worker-class', default='sync',
+                        help='gunicorn worker class')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='client threads sending requests')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--lists', type=int, default=20)
+    parser.add_argument('--items', type=int, default=100,
+                        help='items seeded into each list')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help='weights per request kind (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare with results saved by --save')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative p50 slowdown against the baseline')
+    parser.add_argument('--query-tolerance', type=float, default=0.1,
+                        help='allowed relative increase in queries per request')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    list_ids = [seed_list(args.items).id for _ in range(args.lists)]
+    workload = Workload(parse_mix(args.mix), list_ids, args.items, random.Random(args.seed))
+    if args.mode == 'wsgi':
+        driver = WSGIDriver()
+    else:
+        driver = GunicornDriver(args.workers, args.worker_class)
+    try:
+        results = run(driver, workload, args.requests, args.concurrency)
+    finally:
+        driver.close()
+
+    rows = [dict(kind=kind, **stats) for kind, stats in sorted(results.items())
+            if 'p50_ms' in stats]
+    print_table(rows, ['kind', 'requests', 'errors', 'req_per_s',
+                       'p50_ms', 'p90_ms', 'p99_ms', 'queries'])
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = find_regressions(
+            results, baseline, args.tolerance, args.query_tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
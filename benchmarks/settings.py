@@ -0,0 +1,20 @@
+import os
+import tempfile
+
+from superlists.settings import *  # noqa: F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get(
+            'BENCH_DB',
+            os.path.join(tempfile.gettempdir(), 'superlists-bench.sqlite3')
+        ),
+    }
+}
+
+# The harness reads queries per request from the Server-Timing header.
+LISTS_PERF_SAMPLE_RATE = 1.0
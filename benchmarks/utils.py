@@ -0,0 +1,63 @@
+import os
+import time
+
+
+def setup_django(fresh_db=True):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.core.management import call_command
+    db_name = settings.DATABASES['default']['NAME']
+    if fresh_db and os.path.exists(db_name):
+        os.remove(db_name)
+    call_command('migrate', verbosity=0)
+
+
+def seed_list(item_count, chunk_size=5000):
+    from lists.models import Item, List, hash_text
+    list_ = List.objects.create()
+    for start in range(0, item_count, chunk_size):
+        texts = ['item {}'.format(n)
+                 for n in range(start, min(start + chunk_size, item_count))]
+        Item.objects.bulk_create(
+            Item(list=list_, text=text, text_hash=hash_text(text)) for text in texts
+        )
+    list_.record_new_items(item_count)
+    return list_
+
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        'mean_ms': 1000 * sum(samples) / len(samples),
+        'p50_ms': 1000 * percentile(samples, 0.50),
+        'p95_ms': 1000 * percentile(samples, 0.95),
+    }
+
+
+def print_table(rows, columns):
+    widths = [max(len(str(column)), 10) for column in columns]
+    print('  '.join(str(c).rjust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        cells = []
+        for column, width in zip(columns, widths):
+            value = row[column]
+            if isinstance(value, float):
+                value = '{:.2f}'.format(value)
+            cells.append(str(value).rjust(width))
+        print('  '.join(cells))
@@ -1,15 +1,72 @@
+import os
+import socketserver
 import sys
+import time
+from multiprocessing.util import Finalize
+
 from django.contrib.staticfiles.testing import StaticLiveServerTestCase
+from django.core.servers.basehttp import WSGIServer
+from django.db import connections
+from django.test import testcases
 from selenium import webdriver
 
+from functional_tests.httpdriver import HttpDriver
+
+_browser = None
+
+
+def needs_browser(test):
+    """Marks a test, or a whole test class, that needs Firefox because it
+    runs scripts or checks the layout. The others get an HttpDriver, unless
+    FUNCTIONAL_TESTS_BROWSER_ONLY is set or they run against --liveserver."""
+    test.needs_browser = True
+    return test
+
+
+def get_browser():
+    """The process's browser, shared by the tests it runs. It is quit when
+    the process exits, which Finalize also does for test runner workers."""
+    global _browser
+    if _browser is None:
+        _browser = webdriver.Firefox()
+        _browser.implicitly_wait(1)
+        Finalize(None, _browser.quit, exitpriority=10)
+    return _browser
+
+
+class ThreadedWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+    def __init__(self, *args, connections_override=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connections_override = connections_override or {}
+
+    def process_request_thread(self, request, client_address):
+        for alias, conn in self.connections_override.items():
+            connections[alias] = conn
+        super().process_request_thread(request, client_address)
+
+
+class LiveServerThread(testcases.LiveServerThread):
+    # With LISTS_LIVE_UPDATES, list pages hold an event stream open, which
+    # would keep a single-threaded server from answering anything else.
+
+    def _create_server(self, port):
+        return ThreadedWSGIServer(
+            (self.host, port), testcases.QuietWSGIRequestHandler,
+            connections_override=self.connections_override)
+
 
 class FunctionalTest(StaticLiveServerTestCase):
+    needs_browser = False
+    against_server = False
 
     @classmethod
     def setUpClass(cls):
         for arg in sys.argv:
             if 'liveserver' in arg:
                 cls.server_url = 'http://' + arg.split('=')[1]
+                cls.against_server = True
                 return
         super().setUpClass()
         cls.server_url = cls.live_server_url
@@ -19,17 +76,41 @@ class FunctionalTest(StaticLiveServerTestCase):
         if cls.server_url == cls.live_server_url:
             super().tearDownClass()
 
+    @classmethod
+    def _create_server_thread(cls, host, possible_ports, connections_override):
+        return LiveServerThread(
+            host, possible_ports, cls.static_handler,
+            connections_override=connections_override)
+
     def setUp(self):
-        self.browser = webdriver.Firefox()
-        self.browser.implicitly_wait(1)
+        test = getattr(self, self._testMethodName)
+        if (getattr(test, 'needs_browser', self.needs_browser) or self.against_server or
+                os.environ.get('FUNCTIONAL_TESTS_BROWSER_ONLY')):
+            self.browser = get_browser()
+        else:
+            self.browser = HttpDriver(self.server_url)
 
     def tearDown(self):
-        self.browser.quit()
+        # Leave the browser as the next test expects to find it: without
+        # this site's cookies, and off the page, so its event stream closes.
+        self.start_new_session()
+
+    def start_new_session(self):
+        self.browser.delete_all_cookies()
+        self.browser.get('about:blank')
 
-    def check_for_row_in_list_table(self, row_text):
-        table = self.browser.find_element_by_id('id_list_table')
-        rows = table.find_elements_by_tag_name('tr')
-        self.assertIn(row_text, ' '.join(row.text for row in rows))
+    def check_for_row_in_list_table(self, row_text, timeout=2):
+        # Items are added over XHR, so the row may arrive a moment after
+        # the keypress that submitted it.
+        deadline = time.time() + timeout
+        while True:
+            table = self.browser.find_element_by_id('id_list_table')
+            rows = ' '.join(
+                row.text for row in table.find_elements_by_tag_name('tr'))
+            if row_text in rows or time.time() > deadline:
+                break
+            time.sleep(0.1)
+        self.assertIn(row_text, rows)
 
     def get_item_input_box(self):
         return self.browser.find_element_by_id('id_text')
@@ -0,0 +1,262 @@
+"""A stand-in for Selenium's WebDriver that drives the site in-process.
+
+Pages are fetched with Django's test client and parsed into a small element
+tree that answers the lookups the functional tests make. Typing Enter into a
+field submits its form, as a browser would with scripts off. Nothing runs
+scripts or lays out the page: tests that need either are marked with
+functional_tests.base.needs_browser and get Firefox instead.
+"""
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+from django.test import Client
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.keys import Keys
+
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'param', 'source', 'track', 'wbr',
+}
+BLOCK_ELEMENTS = {
+    'address', 'article', 'aside', 'blockquote', 'body', 'br', 'dd', 'div', 'dl',
+    'dt', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr',
+    'li', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'tr', 'ul',
+}
+CELL_ELEMENTS = {'td', 'th'}
+HIDDEN_ELEMENTS = {'head', 'noscript', 'script', 'style', 'template', 'title'}
+SUBMIT_KEYS = ('\n', Keys.ENTER, Keys.RETURN)
+
+SELECTOR_PART = re.compile(r'([#.]?)([\w-]+)')
+
+
+def parse_selector(selector):
+    """'div.has-error span' -> [('div', None, {'has-error'}), ('span', None, set())]"""
+    compounds = []
+    for compound in selector.split():
+        tag, id_, classes = None, None, set()
+        for prefix, name in SELECTOR_PART.findall(compound):
+            if prefix == '#':
+                id_ = name
+            elif prefix == '.':
+                classes.add(name)
+            else:
+                tag = name.lower()
+        compounds.append((tag, id_, classes))
+    return compounds
+
+
+class Searchable(object):
+
+    def _descendants(self):
+        for child in self.children:
+            if isinstance(child, Element):
+                yield child
+                yield from child._descendants()
+
+    def find_elements_by_tag_name(self, name):
+        return [element for element in self._descendants() if element.tag_name == name]
+
+    def find_elements_by_css_selector(self, selector):
+        compounds = parse_selector(selector)
+        return [element for element in self._descendants()
+                if element._matches_path(compounds, self)]
+
+    def find_element_by_tag_name(self, name):
+        return _first(self.find_elements_by_tag_name(name), 'tag name', name)
+
+    def find_element_by_id(self, id_):
+        return _first(self.find_elements_by_css_selector('#' + id_), 'id', id_)
+
+    def find_element_by_css_selector(self, selector):
+        return _first(self.find_elements_by_css_selector(selector), 'css selector', selector)
+
+
+def _first(elements, by, value):
+    if not elements:
+        raise NoSuchElementException(
+            'Unable to locate element: {{"method":"{}","selector":"{}"}}'.format(by, value))
+    return elements[0]
+
+
+class Element(Searchable):
+
+    def __init__(self, driver, tag_name, attrs, parent):
+        self.driver = driver
+        self.tag_name = tag_name
+        self.attrs = {name: value if value is not None else '' for name, value in attrs}
+        self.parent = parent
+        self.children = []
+
+    def __repr__(self):
+        return '<Element {} {}>'.format(self.tag_name, self.attrs)
+
+    @property
+    def text(self):
+        chunks = []
+        self._collect_text(chunks, top=True)
+        lines = (re.sub(r'[ \t\r\f\v]+', ' ', line).strip()
+                 for line in ''.join(chunks).split('\n'))
+        return '\n'.join(line for line in lines if line)
+
+    def _collect_text(self, chunks, top=False):
+        if self.tag_name in HIDDEN_ELEMENTS and not top or not self.is_displayed():
+            return
+        block = self.tag_name in BLOCK_ELEMENTS
+        if block:
+            chunks.append('\n')
+        for child in self.children:
+            if isinstance(child, Element):
+                child._collect_text(chunks)
+            else:
+                chunks.append(re.sub(r'\s+', ' ', child))
+        if block:
+            chunks.append('\n')
+        elif self.tag_name in CELL_ELEMENTS:
+            chunks.append(' ')
+
+    def get_attribute(self, name):
+        return self.attrs.get(name)
+
+    def is_displayed(self):
+        style = self.attrs.get('style', '').replace(' ', '')
+        return 'hidden' not in self.attrs and 'display:none' not in style
+
+    def _matches(self, compound):
+        tag, id_, classes = compound
+        return (
+            (tag is None or self.tag_name == tag) and
+            (id_ is None or self.attrs.get('id') == id_) and
+            classes <= set(self.attrs.get('class', '').split())
+        )
+
+    def _matches_path(self, compounds, root):
+        if not self._matches(compounds[-1]):
+            return False
+        remaining = compounds[:-1]
+        ancestor = self.parent
+        while remaining and isinstance(ancestor, Element) and ancestor is not root:
+            if ancestor._matches(remaining[-1]):
+                remaining = remaining[:-1]
+            ancestor = ancestor.parent
+        return not remaining
+
+    def send_keys(self, *values):
+        for char in ''.join(values):
+            if char in SUBMIT_KEYS:
+                self.submit()
+                return
+            self.attrs['value'] = self.attrs.get('value', '') + char
+
+    def clear(self):
+        self.attrs['value'] = ''
+
+    def submit(self):
+        form = self
+        while isinstance(form, Element) and form.tag_name != 'form':
+            form = form.parent
+        if not isinstance(form, Element):
+            raise ValueError('{!r} is not in a form'.format(self))
+        data = {}
+        for field in form.find_elements_by_tag_name('input'):
+            if field.get_attribute('name') and field.get_attribute('type') not in (
+                    'button', 'checkbox', 'image', 'radio', 'submit'):
+                data[field.get_attribute('name')] = field.get_attribute('value') or ''
+        for field in form.find_elements_by_tag_name('textarea'):
+            if field.get_attribute('name'):
+                data[field.get_attribute('name')] = field.text
+        action = urljoin(self.driver.current_url, form.get_attribute('action') or '')
+        self.driver.request(form.get_attribute('method') or 'GET', action, data)
+
+
+class TreeBuilder(HTMLParser):
+
+    def __init__(self, driver):
+        super().__init__(convert_charrefs=True)
+        self.driver = driver
+        self.document = Document()
+        self.open_elements = [self.document]
+
+    def handle_starttag(self, tag, attrs):
+        element = Element(self.driver, tag, attrs, self.open_elements[-1])
+        self.open_elements[-1].children.append(element)
+        if tag not in VOID_ELEMENTS:
+            self.open_elements.append(element)
+
+    def handle_startendtag(self, tag, attrs):
+        element = Element(self.driver, tag, attrs, self.open_elements[-1])
+        self.open_elements[-1].children.append(element)
+
+    def handle_endtag(self, tag):
+        # Close up to the matching element; stray end tags are ignored.
+        for depth in range(len(self.open_elements) - 1, 0, -1):
+            if self.open_elements[depth].tag_name == tag:
+                del self.open_elements[depth:]
+                return
+
+    def handle_data(self, data):
+        self.open_elements[-1].children.append(data)
+
+
+class Document(Searchable):
+
+    def __init__(self):
+        self.children = []
+
+
+class HttpDriver(Searchable):
+    """The part of the WebDriver API the functional tests use, served by the
+    test client against the test database."""
+
+    def __init__(self, server_url):
+        self.server_url = server_url
+        self.client = Client()
+        self.current_url = 'about:blank'
+        self.page_source = ''
+        self.document = Document()
+
+    @property
+    def children(self):
+        return self.document.children
+
+    @property
+    def title(self):
+        titles = self.find_elements_by_tag_name('title')
+        return titles[0].text if titles else ''
+
+    def get(self, url):
+        if url == 'about:blank':
+            self.current_url, self.page_source, self.document = url, '', Document()
+        else:
+            self.request('GET', url)
+
+    def request(self, method, url, data=None):
+        url = urljoin(self.server_url + '/', url)
+        parts = urlsplit(url)
+        if '{}://{}'.format(parts.scheme, parts.netloc) != self.server_url:
+            raise ValueError('{} is not on {}'.format(url, self.server_url))
+        path = parts.path + ('?' + parts.query if parts.query else '')
+        send = self.client.post if method.upper() == 'POST' else self.client.get
+        response = send(path, data or {}, follow=True)
+        final = response.request
+        self.current_url = urljoin(self.server_url, final['PATH_INFO'])
+        if final.get('QUERY_STRING'):
+            self.current_url += '?' + final['QUERY_STRING']
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        self.page_source = content.decode(response.charset)
+        builder = TreeBuilder(self)
+        builder.feed(self.page_source)
+        builder.close()
+        self.document = builder.document
+
+    def delete_all_cookies(self):
+        self.client.cookies.clear()
+
+    def implicitly_wait(self, seconds):
+        pass
+
+    def quit(self):
+        pass
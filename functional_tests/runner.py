@@ -0,0 +1,117 @@
+"""Test runner for the functional tests.
+
+    python manage.py test functional_tests --parallel
+
+With --parallel, test classes are shared out between worker processes. Each
+worker switches to its own copy of the test database, and each class starts
+its live server on the first free port, so workers never see each other's
+data. A worker's tests share one browser. When the run is over, every test's
+duration is printed, slowest first.
+
+Tests that don't need scripts or layout drive the site in-process with
+functional_tests.httpdriver; --browser-only runs them in Firefox as well.
+
+On a machine without a display, run the browser tests under xvfb-run.
+
+--liveserver=host:port still points the tests at a running server instead.
+"""
+import os
+import sys
+import time
+import unittest
+
+from django.test.runner import (
+    DiscoverRunner, ParallelTestSuite, RemoteTestResult, RemoteTestRunner,
+)
+
+
+class TimedRemoteTestResult(RemoteTestResult):
+    """Also sends each test's duration back from the worker process."""
+
+    def startTest(self, test):
+        self.started = time.perf_counter()
+        super().startTest(test)
+
+    def stopTest(self, test):
+        self.events.append(
+            ('addDuration', self.test_index, time.perf_counter() - self.started))
+        super().stopTest(test)
+
+
+def _run_subsuite(args):
+    subsuite_index, subsuite, failfast = args
+    runner = RemoteTestRunner(failfast=failfast, resultclass=TimedRemoteTestResult)
+    result = runner.run(subsuite)
+    return subsuite_index, result.events
+
+
+class TimedParallelTestSuite(ParallelTestSuite):
+    run_subsuite = _run_subsuite
+
+
+class TimedTextTestResult(unittest.TextTestResult):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.durations = []
+
+    def startTest(self, test):
+        self.started = time.perf_counter()
+        self.timed = False
+        super().startTest(test)
+
+    def addDuration(self, test, elapsed):
+        # Sent by the worker that ran the test; its own clock is the one
+        # that counts.
+        self.durations.append((test, elapsed))
+        self.timed = True
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        if not self.timed:
+            self.durations.append((test, time.perf_counter() - self.started))
+
+
+class FunctionalTestRunner(DiscoverRunner):
+    parallel_test_suite = TimedParallelTestSuite
+
+    def __init__(self, browser_only=False, slowest=None, **kwargs):
+        super().__init__(**kwargs)
+        self.browser_only = browser_only
+        self.slowest = slowest
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--browser-only', action='store_true', dest='browser_only', default=False,
+            help='Run every functional test in a browser, not only those marked '
+                 'with needs_browser.')
+        parser.add_argument(
+            '--slowest', type=int, dest='slowest', default=None,
+            help='Only report the durations of the N slowest tests.')
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        if self.browser_only:
+            # Set before the workers fork, so they inherit it.
+            os.environ['FUNCTIONAL_TESTS_BROWSER_ONLY'] = '1'
+
+    def get_resultclass(self):
+        return super().get_resultclass() or TimedTextTestResult
+
+    def run_suite(self, suite, **kwargs):
+        result = super().run_suite(suite, **kwargs)
+        durations = getattr(result, 'durations', None)
+        if durations:
+            self.report_durations(durations)
+        return result
+
+    def report_durations(self, durations, stream=None):
+        stream = stream or sys.stderr
+        durations = sorted(durations, key=lambda duration: duration[1], reverse=True)
+        stream.write('\nTest durations, slowest first:\n')
+        for test, elapsed in durations[:self.slowest]:
+            stream.write('{:8.2f}s  {}\n'.format(elapsed, test.id()))
+        stream.write('{:8.2f}s  total across {} tests\n'.format(
+            sum(elapsed for test, elapsed in durations), len(durations)))
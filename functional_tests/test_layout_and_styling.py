@@ -1,6 +1,7 @@
-from .base import FunctionalTest
+from .base import FunctionalTest, needs_browser
 
 
+@needs_browser
 class LayoutAndStylingTest(FunctionalTest):
 
     def test_layout_and_styling(self):
@@ -1,4 +1,4 @@
-from .base import FunctionalTest
+from .base import FunctionalTest, needs_browser
 
 
 class ItemValidationTest(FunctionalTest):
@@ -45,6 +45,7 @@ class ItemValidationTest(FunctionalTest):
         error = self.get_error_element()
         self.assertEqual(error.text, "You've already got this in your list")
 
+    @needs_browser
     def test_error_messages_are_cleared_on_input(self):
         # Edith starts new list in a way that causes a validation error
         self.browser.get(self.server_url)
@@ -1,5 +1,4 @@
 from .base import FunctionalTest
-from selenium import webdriver
 from selenium.webdriver.common.keys import Keys
 
 
@@ -44,8 +43,7 @@ class NewVisitorTest(FunctionalTest):
 
         # Now a new user, Francis, comes along to the site.
         ## New browser session to make sure no information is coming through
-        self.browser.quit()
-        self.browser = webdriver.Firefox()
+        self.start_new_session()
 
         # Francis visits the home page there is no sign of Peters list
         self.browser.get(self.server_url)
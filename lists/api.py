@@ -0,0 +1,90 @@
+import json
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import condition, require_safe
+
+from lists.conditional import list_last_modified, list_state
+from lists.models import Item, List
+from lists.pagination import parse_cursor
+from lists.search import search_items
+from lists.writebehind import pending_items
+
+ITEM_FIELDS = ('id', 'text')
+
+
+def _json_response(payload, status=200):
+    return HttpResponse(
+        json.dumps(payload, separators=(',', ':')),
+        content_type='application/json',
+        status=status,
+    )
+
+
+def _parse_fields(value):
+    if not value:
+        return ITEM_FIELDS
+    fields = tuple(field for field in value.split(',') if field)
+    if not fields or not set(fields) <= set(ITEM_FIELDS):
+        raise ValueError('fields must be a subset of {}'.format(','.join(ITEM_FIELDS)))
+    return fields
+
+
+def _parse_limit(value):
+    limit = parse_cursor(value) or settings.LISTS_API_PAGE_SIZE
+    return min(limit, settings.LISTS_API_MAX_PAGE_SIZE)
+
+
+@require_safe
+@condition(etag_func=list_state, last_modified_func=list_last_modified)
+def list_detail(request, list_id):
+    try:
+        fields = _parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return _json_response({'error': str(e)}, status=400)
+    if not List.objects.filter(id=list_id).exists():
+        return _json_response({'error': 'List not found'}, status=404)
+
+    after = parse_cursor(request.GET.get('after'))
+    limit = _parse_limit(request.GET.get('limit'))
+    # The id is always fetched so the next cursor can be computed, even when
+    # it is not one of the requested fields.
+    columns = ('id',) + tuple(field for field in fields if field != 'id')
+    rows = Item.objects.filter(list_id=list_id)
+    if after is not None:
+        rows = rows.filter(id__gt=after)
+    rows = list(rows.values_list(*columns)[:limit + 1])
+
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    items = [
+        {field: value for field, value in zip(columns, row) if field in fields}
+        for row in rows[:limit]
+    ]
+    if next_cursor is None:
+        # Items still in the write-behind journal end the last page; they
+        # have no id yet.
+        items.extend(
+            {field: getattr(item, field) for field in fields}
+            for item in pending_items(int(list_id))
+        )
+    return _json_response({
+        'id': int(list_id),
+        'items': items,
+        'next': next_cursor,
+    })
+
+
+@require_safe
+def search(request):
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return _json_response({'error': 'q is required'}, status=400)
+    list_id = parse_cursor(request.GET.get('list'))
+    limit = _parse_limit(request.GET.get('limit'))
+    return _json_response({
+        'query': query,
+        'items': [
+            {'id': item_id, 'list': item_list_id, 'text': text}
+            for item_id, item_list_id, text in search_items(query, limit, list_id)
+        ],
+    })
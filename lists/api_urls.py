@@ -0,0 +1,7 @@
+from django.conf.urls import url
+from lists import api
+
+urlpatterns = [
+    url(r'^(\d+)/$', api.list_detail, name='api_list_detail'),
+    url(r'^search$', api.search, name='api_search'),
+]
@@ -3,3 +3,20 @@ from django.apps import AppConfig
 
 class ListsConfig(AppConfig):
     name = 'lists'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+        from lists.broker import publish_items
+        from lists.caching import invalidate_list_table
+        from lists.dedupe import update_item_index
+        from lists.db import configure_sqlite
+        from lists.search import index_items
+        from lists.sharding import reserve_item_ids
+        from lists.signals import items_created
+        items_created.connect(invalidate_list_table)
+        items_created.connect(publish_items)
+        items_created.connect(update_item_index)
+        items_created.connect(index_items)
+        connection_created.connect(configure_sqlite)
+        post_migrate.connect(reserve_item_ids, sender=self)
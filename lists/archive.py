@@ -0,0 +1,235 @@
+"""Compact archives of lists and items, for backups and moving databases.
+
+An archive is MAGIC followed by frames. Each frame is a FRAME header (flags,
+payload length, CRC-32 of the payload) and a payload: the JSON of one chunk
+of rows, stored column by column and zlib-compressed when the FRAME_ZLIB
+flag is set:
+
+    {"model": "item", "shard": "default", "id": [...], "list": [...], "text": [...]}
+
+Rows are written a shard and a model at a time, lists before their items,
+in id order, so the last frame of an archive says where an export stopped
+and `manage.py export_lists --resume` carries on from there. Item hashes
+aren't stored; they are worked out again on import.
+"""
+import json
+import struct
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+from lists.models import Item, List, ListLocation, hash_text
+from lists.sharding import (LOCATION_KEY, _cache, item_id_range, raise_item_sequence,
+                            raise_sequence)
+
+MAGIC = b'LSTA\x01'
+FRAME = struct.Struct('>BII')
+FRAME_ZLIB = 1
+
+# Rows per frame. Imports look up the directory for a frame's lists in one
+# query, which SQLite limits to 999 variables.
+CHUNK_SIZE = 500
+
+COLUMNS = OrderedDict([
+    ('list', ('id', 'item_count', 'updated_at')),
+    ('item', ('id', 'list', 'text')),
+])
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def write_frame(stream, chunk, compress=False):
+    payload = json.dumps(chunk, separators=(',', ':')).encode('utf-8')
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload)
+        flags |= FRAME_ZLIB
+    stream.write(FRAME.pack(flags, len(payload), zlib.crc32(payload)))
+    stream.write(payload)
+
+
+def read_frames(stream):
+    """Yields the chunks of the archive, and the offset each one ends at."""
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ArchiveError('Not a lists archive.')
+    offset = len(MAGIC)
+    while True:
+        header = stream.read(FRAME.size)
+        if not header:
+            return
+        if len(header) < FRAME.size:
+            raise ArchiveError('Frame header cut short at byte {}.'.format(offset))
+        flags, length, crc = FRAME.unpack(header)
+        payload = stream.read(length)
+        if len(payload) < length:
+            raise ArchiveError('Frame cut short at byte {}.'.format(offset))
+        if zlib.crc32(payload) != crc:
+            raise ArchiveError('Checksum mismatch in the frame at byte {}.'.format(offset))
+        if flags & FRAME_ZLIB:
+            payload = zlib.decompress(payload)
+        offset += FRAME.size + length
+        yield json.loads(payload.decode('utf-8')), offset
+
+
+def export_chunks(chunk_size=CHUNK_SIZE, after=None):
+    """Yields the chunks of every list and item on the shards, resuming
+    after the (shard, model, id) of the last chunk written when given."""
+    sections = [(shard, model) for shard in settings.LISTS_SHARDS for model in COLUMNS]
+    start, last_id = 0, 0
+    if after is not None:
+        shard, model, last_id = after
+        if (shard, model) not in sections:
+            raise ArchiveError('The archive ends on {} of {}, which is not a shard.'.format(
+                model, shard))
+        start = sections.index((shard, model))
+    for shard, model in sections[start:]:
+        columns = COLUMNS[model]
+        fields = ['list_id' if column == 'list' else column for column in columns]
+        queryset = (List if model == 'list' else Item).objects.using(shard).order_by('id')
+        while True:
+            rows = list(queryset.filter(id__gt=last_id).values_list(*fields)[:chunk_size])
+            if not rows:
+                break
+            chunk = OrderedDict([('model', model), ('shard', shard)])
+            for column, values in zip(columns, zip(*rows)):
+                if column == 'updated_at':
+                    values = [value.isoformat() for value in values]
+                chunk[column] = list(values)
+            yield chunk
+            last_id = rows[-1][0]
+        last_id = 0
+
+
+def resume_point(stream):
+    """Where an export into the archive should carry on: the offset after its
+    last whole frame, and the (shard, model, id) that frame ends on, or None
+    for an empty archive. A frame cut short by a crash is left out."""
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ArchiveError('Not a lists archive.')
+    stream.seek(0)
+    offset, after = len(MAGIC), None
+    try:
+        for chunk, end in read_frames(stream):
+            offset = end
+            after = (chunk['shard'], chunk['model'], chunk['id'][-1])
+    except ArchiveError:
+        pass
+    return offset, after
+
+
+def import_chunk(chunk):
+    """Saves the rows of the chunk and returns how many were new. Lists are
+    placed like new ones unless the directory already knows them, and keep
+    their ids. Items keep theirs when they are in the id range of their
+    list's shard; the others are numbered afresh there, in order. Rows that
+    are already there, or would repeat an item of their list, are
+    skipped."""
+    if chunk['model'] == 'list':
+        return _import_lists(chunk)
+    return _import_items(chunk)
+
+
+def _import_lists(chunk):
+    shards = list(settings.LISTS_SHARDS)
+    if len(shards) > 1:
+        located = _place_lists(chunk['id'], shards)
+    else:
+        located = dict.fromkeys(chunk['id'], shards[0])
+    by_shard = OrderedDict()
+    for list_id, item_count, updated_at in zip(
+            chunk['id'], chunk['item_count'], chunk['updated_at']):
+        by_shard.setdefault(located[list_id], []).append(
+            (list_id, item_count, parse_datetime(updated_at)))
+    imported = 0
+    for shard, rows in by_shard.items():
+        ops = connections[shard].ops
+        rows = [(list_id, item_count, ops.adapt_datetimefield_value(updated_at))
+                for list_id, item_count, updated_at in rows]
+        with transaction.atomic(using=shard):
+            imported += _insert_new(shard, List, ['id', 'item_count', 'updated_at'], rows)
+            if len(shards) == 1:
+                # Without a directory, new lists take their ids from the
+                # lists table, after the ones imported.
+                raise_sequence(shard, List._meta.db_table, max(row[0] for row in rows))
+    if len(shards) > 1:
+        _cache().delete_many([LOCATION_KEY.format(list_id) for list_id in chunk['id']])
+    return imported
+
+
+def _place_lists(list_ids, shards):
+    """{list id: shard} of the lists, recording those the directory doesn't
+    know yet where new lists would go."""
+    place = import_string(settings.LISTS_SHARD_PLACEMENT)
+    located = _locate(list_ids)
+    new_locations = []
+    for list_id in list_ids:
+        if list_id not in located:
+            located[list_id] = place(list_id, shards)
+            new_locations.append((list_id, located[list_id]))
+    if new_locations:
+        connection = connections[DEFAULT_DB_ALIAS]
+        with transaction.atomic(using=DEFAULT_DB_ALIAS), connection.cursor() as cursor:
+            _insert_new(DEFAULT_DB_ALIAS, ListLocation, ['id', 'shard'], new_locations)
+            # New list ids must come after the ones imported.
+            for sql in connection.ops.sequence_reset_sql(no_style(), [ListLocation]):
+                cursor.execute(sql)
+    return located
+
+
+def _import_items(chunk):
+    shards = settings.LISTS_SHARDS
+    located = _locate(set(chunk['list'])) if len(shards) > 1 else {}
+    by_shard = OrderedDict()
+    for item_id, list_id, text in zip(chunk['id'], chunk['list'], chunk['text']):
+        shard = located.get(list_id, shards[0])
+        by_shard.setdefault(shard, []).append((item_id, list_id, text, hash_text(text)))
+    imported = 0
+    for shard, rows in by_shard.items():
+        first, end = item_id_range(shard)
+        kept = [row for row in rows if first <= row[0] < end]
+        # Exported from another shard: their ids belong to its items.
+        renumbered = [row[1:] for row in rows if not first <= row[0] < end]
+        with transaction.atomic(using=shard):
+            imported += _insert_new(shard, Item, ['id', 'list', 'text', 'text_hash'], kept)
+            if kept:
+                # New items must sort after the ones imported.
+                raise_item_sequence(shard, max(row[0] for row in kept))
+            imported += _insert_new(shard, Item, ['list', 'text', 'text_hash'], renumbered)
+    return imported
+
+
+def _locate(list_ids):
+    """{list id: shard} of the lists the directory knows."""
+    return dict(
+        ListLocation.objects.using(DEFAULT_DB_ALIAS).filter(id__in=list(list_ids))
+        .values_list('id', 'shard')
+    )
+
+
+def _insert_new(alias, model, fields, rows):
+    """Inserts the rows in one statement per batch, skipping those that
+    clash with a primary key or unique constraint, and returns how many
+    were inserted."""
+    if not rows:
+        return 0
+    connection = connections[alias]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(field).column) for field in fields)
+    values = ', '.join(['%s'] * len(fields))
+    if connection.vendor == 'sqlite':
+        sql = 'INSERT OR IGNORE INTO {} ({}) VALUES ({})'
+    elif connection.vendor == 'postgresql':
+        sql = 'INSERT INTO {} ({}) VALUES ({}) ON CONFLICT DO NOTHING'
+    else:
+        raise NotImplementedError(
+            'Imports are not supported on {}.'.format(connection.vendor))
+    with connection.cursor() as cursor:
+        cursor.executemany(sql.format(quote(model._meta.db_table), columns, values), rows)
+        return cursor.rowcount
@@ -0,0 +1,34 @@
+from functools import lru_cache
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template.loader import get_template
+
+# Templates and static files every page needs, loaded by warm_up() when a
+# worker starts instead of on its first requests.
+PAGE_TEMPLATES = ('base.html', 'home.html', 'list.html', 'list_table.html')
+PAGE_ASSETS = (
+    'bootstrap/css/bootstrap.min.css',
+    'base.css',
+    'jquery/jquery.min.js',
+    'list.js',
+)
+
+
+@lru_cache(maxsize=None)
+def static_url(path):
+    return staticfiles_storage.url(path)
+
+
+@receiver(setting_changed)
+def _clear_static_urls(**kwargs):
+    if kwargs['setting'] in ('STATICFILES_STORAGE', 'STATIC_ROOT', 'STATIC_URL'):
+        static_url.cache_clear()
+
+
+def warm_up():
+    for name in PAGE_TEMPLATES:
+        get_template(name)
+    for path in PAGE_ASSETS:
+        static_url(path)
@@ -0,0 +1,186 @@
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.html import format_html
+
+from lists.pagination import ROW_HTML
+
+logger = logging.getLogger(__name__)
+
+# Keeps each datagram well below the default socket buffer size.
+MAX_DATAGRAM = 60000
+
+
+class Broker(object):
+    """Fans out item events to the subscribers of each list.
+
+    Subscribers are callables that get a list of events. Events published in
+    this process go straight to its own subscribers. With a directory, every
+    process that has subscribers also binds a unix datagram socket there, and
+    events are sent as JSON to the sockets of the other processes, so several
+    gunicorn workers share one channel without an external server.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.subscribers = {}
+        self.lock = threading.Lock()
+        self.sock = None
+        self.path = None
+
+    def subscribe(self, list_id, callback):
+        with self.lock:
+            self.subscribers.setdefault(list_id, []).append(callback)
+            if self.directory and self.sock is None:
+                self._bind()
+
+    def unsubscribe(self, list_id, callback):
+        with self.lock:
+            callbacks = self.subscribers.get(list_id)
+            if callbacks is not None and callback in callbacks:
+                callbacks.remove(callback)
+                if not callbacks:
+                    del self.subscribers[list_id]
+
+    def subscriber_count(self):
+        with self.lock:
+            return sum(len(callbacks) for callbacks in self.subscribers.values())
+
+    def publish(self, list_id, events):
+        self.deliver(list_id, events)
+        if self.directory:
+            for message in _encode(list_id, events):
+                self._send_to_peers(message)
+
+    def deliver(self, list_id, events):
+        with self.lock:
+            callbacks = list(self.subscribers.get(list_id, ()))
+        for callback in callbacks:
+            # One failing subscriber mustn't keep the events from the others,
+            # or fail the request that saved the items.
+            try:
+                callback(events)
+            except Exception:
+                logger.exception('List events subscriber %r failed', callback)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            _unlink_quietly(self.path)
+
+    def _bind(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(
+            self.directory, '{}-{:x}.sock'.format(os.getpid(), id(self)))
+        _unlink_quietly(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        atexit.register(self.close)
+        thread = threading.Thread(target=self._receive, args=(self.sock,), daemon=True)
+        thread.start()
+
+    def _receive(self, sock):
+        while True:
+            try:
+                data = sock.recv(MAX_DATAGRAM + 1024)
+            except OSError:
+                return
+            try:
+                message = json.loads(data.decode('utf-8'))
+                list_id, events = message['list'], message['events']
+            except (ValueError, TypeError, KeyError):
+                logger.warning('Ignored a malformed list events datagram: %r', data[:100])
+                continue
+            self.deliver(list_id, events)
+
+    def _send_to_peers(self, message):
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sender.setblocking(False)
+        try:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if not name.endswith('.sock') or path == self.path:
+                    continue
+                try:
+                    sender.sendto(message, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Left behind by a worker that died without cleaning up.
+                    _unlink_quietly(path)
+                except BlockingIOError:
+                    logger.warning('Dropped list events for busy subscriber %s', path)
+                except OSError:
+                    logger.exception('Could not send list events to %s', path)
+        except FileNotFoundError:
+            pass
+        finally:
+            sender.close()
+
+
+def _unlink_quietly(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _encode(list_id, events):
+    # Splits the events into as few datagrams as fit under MAX_DATAGRAM.
+    batch = []
+    size = 0
+    for event in events:
+        event_size = len(json.dumps(event))
+        if batch and size + event_size > MAX_DATAGRAM:
+            yield _message(list_id, batch)
+            batch, size = [], 0
+        batch.append(event)
+        size += event_size + 1
+    if batch:
+        yield _message(list_id, batch)
+
+
+def _message(list_id, events):
+    return json.dumps({'list': list_id, 'events': events}).encode('utf-8')
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = Broker(getattr(settings, 'LISTS_BROKER_DIR', None))
+        return _broker
+
+
+@receiver(setting_changed)
+def _reset_broker(**kwargs):
+    global _broker
+    if kwargs['setting'] == 'LISTS_BROKER_DIR':
+        with _broker_lock:
+            if _broker is not None:
+                _broker.close()
+            _broker = None
+
+
+def item_events(list_, items):
+    # Numbered like the table rows; the form has already bumped item_count.
+    first = list_.item_count - len(items) + 1
+    return [
+        {'id': item.id, 'html': format_html(ROW_HTML, first + i, item.text)}
+        for i, item in enumerate(items)
+    ]
+
+
+def publish_items(sender, **kwargs):
+    list_ = kwargs['list']
+    get_broker().publish(list_.id, item_events(list_, kwargs['items']))
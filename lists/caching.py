@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from lists.pagination import get_item_page
+
+VERSION_KEY = 'lists:table-version:{}'
+TABLE_KEY = 'lists:table:{}:{}:{}:{}:{}'
+
+# Per-process counters; each gunicorn worker keeps its own.
+table_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def _cache():
+    return caches[getattr(settings, 'LISTS_CACHE_ALIAS', 'default')]
+
+
+def _initial_version():
+    # Start from the clock rather than 0 so a version key that was evicted
+    # never points back at table fragments rendered before the eviction.
+    return int(time.time() * 1000)
+
+
+def get_list_version(list_id):
+    cache = _cache()
+    key = VERSION_KEY.format(list_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_list_version(list_id):
+    cache = _cache()
+    key = VERSION_KEY.format(list_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), timeout=None)
+
+
+def render_list_table(list_, cursor=None):
+    cache = _cache()
+    # The item count pins the fragment to the rows it was rendered from: a
+    # replica that has not caught up with a new item renders under the old
+    # count, where readers of the primary don't look. A page's offset
+    # follows from the item it starts after, whether the cursor carried it
+    # or it was counted.
+    live_updates = getattr(settings, 'LISTS_LIVE_UPDATES', False)
+    key = TABLE_KEY.format(
+        list_.id, get_list_version(list_.id), list_.item_count,
+        cursor.after if cursor else 0, int(live_updates))
+    html = cache.get(key)
+    if html is None:
+        table_cache_stats['misses'] += 1
+        html = render_to_string('list_table.html', {
+            'list': list_,
+            'page': get_item_page(list_, cursor),
+            'live_updates': live_updates,
+        })
+        cache.set(key, html, getattr(settings, 'LISTS_TABLE_CACHE_TIMEOUT', None))
+    else:
+        table_cache_stats['hits'] += 1
+    return mark_safe(html)
+
+
+def invalidate_list_table(sender, **kwargs):
+    bump_list_version(kwargs['list'].id)
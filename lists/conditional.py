@@ -0,0 +1,97 @@
+import datetime
+import hashlib
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils import timezone
+
+from lists.models import List
+from lists.writebehind import pending_items
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+
+def _page_mtimes():
+    """Modification times of the templates and of the static files manifest,
+    which names the hashed assets the pages link to."""
+    paths = [os.path.join(TEMPLATE_DIR, name) for name in os.listdir(TEMPLATE_DIR)]
+    manifest_name = getattr(staticfiles_storage, 'manifest_name', None)
+    if manifest_name and staticfiles_storage.exists(manifest_name):
+        paths.append(staticfiles_storage.path(manifest_name))
+    return sorted((path, os.path.getmtime(path)) for path in paths)
+
+
+# Pages change with the templates and the assets they link to, so a deploy
+# that touches either must not be answered with a 304 for the old markup.
+PAGES_VERSION = repr(_page_mtimes())
+PAGES_MODIFIED = datetime.datetime.fromtimestamp(
+    max(mtime for _, mtime in _page_mtimes()), timezone.utc)
+
+
+def _can_revalidate(request):
+    # Rendered pages embed the CSRF token, which is the value of the CSRF
+    # cookie, so a client without the cookie always gets a fresh page.
+    return (request.method in ('GET', 'HEAD') and
+            bool(request.COOKIES.get(settings.CSRF_COOKIE_NAME)))
+
+
+def _page_etag(request, *parts):
+    csrf_cookie = request.COOKIES[settings.CSRF_COOKIE_NAME]
+    key = '|'.join([PAGES_VERSION, csrf_cookie] + [str(part) for part in parts])
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def home_page_etag(request):
+    if not _can_revalidate(request):
+        return None
+    return _page_etag(request, 'home')
+
+
+def _list_fields(request, list_id):
+    # The ETag and Last-Modified functions both need these; fetch them once
+    # per request, from the lists table only.
+    fetched = request.__dict__.setdefault('_list_fields', {})
+    if list_id not in fetched:
+        fetched[list_id] = (
+            List.objects.filter(id=list_id)
+            .values_list('item_count', 'updated_at').first()
+        )
+    return fetched[list_id]
+
+
+def _pending_count(list_id):
+    return len(pending_items(int(list_id)))
+
+
+def list_state(request, list_id):
+    fields = _list_fields(request, list_id)
+    if fields is None:
+        return None
+    item_count, updated_at = fields
+    state = '{}-{}-{}'.format(list_id, item_count, updated_at.timestamp())
+    pending = _pending_count(list_id)
+    return '{}-{}'.format(state, pending) if pending else state
+
+
+def list_last_modified(request, list_id):
+    # Queued items don't touch updated_at, so only the ETag can tell
+    # whether a list with pending items has changed.
+    fields = _list_fields(request, list_id)
+    if not fields or _pending_count(list_id):
+        return None
+    return fields[1]
+
+
+def view_list_etag(request, list_id):
+    if not _can_revalidate(request):
+        return None
+    state = list_state(request, list_id)
+    return _page_etag(request, 'list', state) if state else None
+
+
+def view_list_last_modified(request, list_id):
+    if not _can_revalidate(request):
+        return None
+    last_modified = list_last_modified(request, list_id)
+    return max(last_modified, PAGES_MODIFIED) if last_modified else None
@@ -0,0 +1,68 @@
+import sqlite3
+
+from django.conf import settings
+
+# busy_timeout goes first so that switching the journal mode waits for
+# other connections instead of failing with "database is locked".
+PRAGMA_ORDER = ('busy_timeout', 'journal_mode', 'synchronous', 'mmap_size')
+
+# Tables before the indexes, triggers and views that refer to them.
+SCHEMA_ORDER = ('table', 'index', 'trigger', 'view')
+
+
+def apply_sqlite_pragmas(cursor, pragmas):
+    names = sorted(pragmas, key=lambda name: (
+        PRAGMA_ORDER.index(name) if name in PRAGMA_ORDER else len(PRAGMA_ORDER), name))
+    for name in names:
+        cursor.execute('PRAGMA {} = {}'.format(name, pragmas[name]))
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created receiver applying LISTS_SQLITE_PRAGMAS to every new
+    SQLite connection."""
+    pragmas = getattr(settings, 'LISTS_SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    cursor = connection.connection.cursor()
+    try:
+        apply_sqlite_pragmas(cursor, pragmas)
+    finally:
+        cursor.close()
+
+
+def copy_sqlite_database(source, target):
+    """Copies every table of the SQLite database at source into the one at
+    target, in a single transaction on both: readers of target see the old
+    copy or the new one, and the copy is a consistent snapshot of source.
+    The target's schema is recreated when it differs from the source's."""
+    connection = sqlite3.connect(target, timeout=5, isolation_level=None)
+    try:
+        connection.execute('ATTACH DATABASE ? AS source', (source,))
+        connection.execute('BEGIN')
+        schema = _schema(connection, 'source')
+        if schema != _schema(connection, 'main'):
+            for type_, name, sql in _schema(connection, 'main'):
+                if type_ in ('table', 'view'):
+                    connection.execute('DROP {} main."{}"'.format(type_.upper(), name))
+            for type_, name, sql in sorted(
+                    schema, key=lambda entry: SCHEMA_ORDER.index(entry[0])):
+                connection.execute(sql)
+        for type_, name, sql in schema:
+            if type_ == 'table':
+                connection.execute('DELETE FROM main."{}"'.format(name))
+                connection.execute(
+                    'INSERT INTO main."{0}" SELECT * FROM source."{0}"'.format(name))
+        connection.execute('COMMIT')
+    except Exception:
+        if connection.in_transaction:
+            connection.execute('ROLLBACK')
+        raise
+    finally:
+        connection.close()
+
+
+def _schema(connection, database):
+    return sorted(connection.execute(
+        "SELECT type, name, sql FROM {}.sqlite_master "
+        "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'".format(database)
+    ).fetchall())
@@ -0,0 +1,246 @@
+"""Item indexes: a Bloom filter per list over its items' text hashes, which
+lets ExistingListItemForm rule out most new texts without a query.
+
+An index is a HEADER (magic, capacity, item count) followed by the filter's
+bits. With LISTS_ITEM_INDEX_DIR they are files there, mapped into every
+worker: a save sets its items' bits in place under an exclusive flock, and
+a rebuilt index replaces the file whole, so reading one takes no lock.
+Without it each process keeps the indexes of its MEMORY_INDEXES most
+recently used lists.
+"""
+import fcntl
+import glob
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+MAGIC = b'LSTBLM01'
+HEADER = struct.Struct('<8sQQ')
+
+# About 1% false positives at full capacity.
+BITS_PER_ITEM = 10
+HASH_COUNT = 7
+MIN_CAPACITY = 1024
+
+MEMORY_INDEXES = 1000
+
+
+class BloomFilter(object):
+    """Bloom filter over item text hashes (hex SHA-1 digests). Bit positions
+    come from two 64-bit slices of the digest, by double hashing. The bits
+    are those of any writable buffer, from offset on."""
+
+    def __init__(self, capacity, bits=None, offset=0):
+        self.capacity = capacity
+        self.size = capacity * BITS_PER_ITEM
+        self.bits = bits if bits is not None else bytearray(filter_bytes(capacity))
+        self.offset = offset
+
+    def _positions(self, text_hash):
+        first = int(text_hash[:16], 16)
+        step = int(text_hash[16:32], 16) | 1
+        return ((first + i * step) % self.size for i in range(HASH_COUNT))
+
+    def add(self, text_hash):
+        bits, offset = self.bits, self.offset
+        for position in self._positions(text_hash):
+            bits[offset + (position >> 3)] |= 1 << (position & 7)
+
+    def __contains__(self, text_hash):
+        return all(
+            self.bits[self.offset + (position >> 3)] & (1 << (position & 7))
+            for position in self._positions(text_hash)
+        )
+
+
+def filter_bytes(capacity):
+    return (capacity * BITS_PER_ITEM + 7) // 8
+
+
+class ItemIndex(object):
+    """Membership index of one list's item texts, in buffer.
+
+    It answers "certainly not in the list" without a query; anything else is
+    checked against the database, whose unique constraint has the last word.
+    The index records how many items it covers and is only trusted while
+    that matches List.item_count, so an update lost to a concurrent save, or
+    items added around the forms, make it rebuild instead of miss items.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        capacity = HEADER.unpack_from(buffer)[1]
+        self.bloom = BloomFilter(capacity, buffer, HEADER.size)
+
+    @classmethod
+    def load(cls, buffer):
+        """The index in buffer, or None when it doesn't hold one."""
+        if len(buffer) < HEADER.size:
+            return None
+        magic, capacity, item_count = HEADER.unpack_from(buffer)
+        if magic != MAGIC or len(buffer) != HEADER.size + filter_bytes(capacity):
+            return None
+        return cls(buffer)
+
+    @classmethod
+    def build(cls, list_):
+        capacity = max(MIN_CAPACITY, 2 * list_.item_count)
+        buffer = bytearray(HEADER.size + filter_bytes(capacity))
+        HEADER.pack_into(buffer, 0, MAGIC, capacity, list_.item_count)
+        index = cls(buffer)
+        for text_hash in list_.item_set.values_list('text_hash', flat=True).iterator():
+            index.bloom.add(text_hash)
+        return index
+
+    @property
+    def item_count(self):
+        return HEADER.unpack_from(self.buffer)[2]
+
+    @item_count.setter
+    def item_count(self, item_count):
+        HEADER.pack_into(self.buffer, 0, MAGIC, self.bloom.capacity, item_count)
+
+    def add_items(self, list_, items):
+        """Adds items just saved to list_, whose item_count includes them.
+        Returns False when the index didn't cover the items before them, or
+        can't take them, and should be dropped."""
+        if (self.item_count != list_.item_count - len(items) or
+                list_.item_count > self.bloom.capacity):
+            return False
+        for item in items:
+            self.bloom.add(item.text_hash)
+        # Counted last: readers check the count before trusting the bits.
+        self.item_count = list_.item_count
+        return True
+
+
+class MemoryIndexes(object):
+
+    def __init__(self, limit=MEMORY_INDEXES):
+        self.limit = limit
+        self.indexes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def load(self, list_id):
+        with self.lock:
+            index = self.indexes.get(list_id)
+            if index is not None:
+                self.indexes.move_to_end(list_id)
+            return index
+
+    def store(self, list_id, index):
+        with self.lock:
+            self.indexes[list_id] = index
+            self.indexes.move_to_end(list_id)
+            while len(self.indexes) > self.limit:
+                self.indexes.popitem(last=False)
+
+    def update(self, list_id, change):
+        with self.lock:
+            index = self.indexes.get(list_id)
+            if index is not None and not change(index):
+                del self.indexes[list_id]
+
+    def clear(self):
+        with self.lock:
+            self.indexes.clear()
+
+
+class FileIndexes(object):
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, list_id):
+        return os.path.join(self.directory, '{}.bloom'.format(list_id))
+
+    def _map(self, fd):
+        size = os.fstat(fd).st_size
+        return ItemIndex.load(mmap.mmap(fd, size)) if size else None
+
+    def load(self, list_id):
+        try:
+            fd = os.open(self._path(list_id), os.O_RDWR)
+        except FileNotFoundError:
+            return None
+        try:
+            return self._map(fd)
+        finally:
+            os.close(fd)
+
+    def store(self, list_id, index):
+        path = self._path(list_id)
+        temp_path = '{}.{}-{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        with open(temp_path, 'wb') as temp:
+            temp.write(index.buffer)
+        os.replace(temp_path, path)
+
+    def update(self, list_id, change):
+        path = self._path(list_id)
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_ino != os.stat(path).st_ino:
+                    return  # rebuilt meanwhile; its count says what it covers
+            except FileNotFoundError:
+                return
+            index = self._map(fd)
+            if index is None or not change(index):
+                os.unlink(path)
+        finally:
+            os.close(fd)
+
+    def clear(self):
+        for path in glob.glob(os.path.join(glob.escape(self.directory), '*.bloom')):
+            os.unlink(path)
+
+
+_indexes = None
+_indexes_lock = threading.Lock()
+
+
+def get_indexes():
+    global _indexes
+    with _indexes_lock:
+        if _indexes is None:
+            directory = getattr(settings, 'LISTS_ITEM_INDEX_DIR', None)
+            _indexes = FileIndexes(directory) if directory else MemoryIndexes()
+        return _indexes
+
+
+@receiver(setting_changed)
+def _reset_indexes(**kwargs):
+    global _indexes
+    if kwargs['setting'] == 'LISTS_ITEM_INDEX_DIR':
+        with _indexes_lock:
+            _indexes = None
+
+
+def get_item_index(list_):
+    indexes = get_indexes()
+    index = indexes.load(list_.id)
+    if index is not None and index.item_count == list_.item_count:
+        return index
+    index = ItemIndex.build(list_)
+    indexes.store(list_.id, index)
+    return index
+
+
+def may_contain(list_, text_hash):
+    return text_hash in get_item_index(list_).bloom
+
+
+def update_item_index(sender, **kwargs):
+    list_, items = kwargs['list'], kwargs['items']
+    get_indexes().update(list_.id, lambda index: index.add_items(list_, items))
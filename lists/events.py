@@ -0,0 +1,92 @@
+import queue
+
+from django.conf import settings
+from django.utils.html import format_html
+
+from lists.broker import get_broker
+from lists.models import Item
+from lists.pagination import ROW_HTML
+
+RETRY_MS = 3000
+KEEPALIVE = ': keepalive\n\n'
+
+
+def format_event(event):
+    data = ''.join('data: {}\n'.format(line) for line in event['html'].split('\n'))
+    return 'id: {}\nevent: item\n{}\n'.format(event['id'], data)
+
+
+def format_new_events(events, sent):
+    """Formats the events with ids above ``sent``, which the client may
+    already have from the replay, and returns the text and the new last id."""
+    text = ''
+    for event in events:
+        if event['id'] > sent:
+            sent = event['id']
+            text += format_event(event)
+    return text, sent
+
+
+def parse_last_event_id(request_meta, query_after=None):
+    value = request_meta.get('HTTP_LAST_EVENT_ID') or query_after
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def missed_events(list_id, after):
+    """Items saved after the item with id ``after``, for clients that come
+    back with a Last-Event-ID. Capped at a page; a client that missed more
+    is told to reload."""
+    if not after:
+        return []
+    size = settings.LISTS_PAGE_SIZE
+    items = list(
+        Item.objects.filter(list_id=list_id, id__gt=after)
+        .values_list('id', 'text')[:size + 1]
+    )
+    if len(items) > size:
+        return None
+    number = Item.objects.filter(list_id=list_id, id__lte=after).count()
+    return [
+        {'id': id_, 'html': format_html(ROW_HTML, number + i + 1, text)}
+        for i, (id_, text) in enumerate(items)
+    ]
+
+
+def stream_header(events):
+    if events is None:
+        return 'retry: {}\n\nevent: reload\ndata: \n\n'.format(RETRY_MS)
+    return 'retry: {}\n\n'.format(RETRY_MS) + ''.join(map(format_event, events))
+
+
+def last_id(events, after):
+    return events[-1]['id'] if events else after
+
+
+def event_stream(list_id, after):
+    """Blocking SSE stream for WSGI servers. Every open stream holds a worker
+    thread, so busy sites should serve events through superlists.asgi,
+    which keeps idle subscribers on the event loop instead."""
+    broker = get_broker()
+    pending = queue.Queue()
+    deliver = pending.put
+    broker.subscribe(list_id, deliver)
+    try:
+        missed = missed_events(list_id, after)
+        yield stream_header(missed)
+        if missed is None:
+            return
+        sent = last_id(missed, after)
+        while True:
+            try:
+                events = pending.get(timeout=settings.LISTS_EVENTS_KEEPALIVE)
+            except queue.Empty:
+                yield KEEPALIVE
+                continue
+            text, sent = format_new_events(events, sent)
+            if text:
+                yield text
+    finally:
+        broker.unsubscribe(list_id, deliver)
@@ -1,7 +1,12 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 
-from lists.models import Item
+from lists.dedupe import may_contain
+from lists.models import Item, hash_text, save_new_items
+from lists.sharding import shard_for
+from lists.signals import items_created
+from lists.writebehind import get_journal, pending_items
 
 EMPTY_ITEM_ERROR = "You can't have an empty list item"
 DUPLICATE_ITEM_ERROR = "You've already got this in your list"
@@ -24,7 +29,26 @@ class ItemForm(forms.models.ModelForm):
 
     def save(self, for_list):
         self.instance.list = for_list
-        return super().save()
+        return self._save()
+
+    def _save(self):
+        list_ = self.instance.list
+        journal = get_journal()
+        if journal is not None:
+            # Write-behind: the item is saved by the next flush, and is
+            # returned unsaved.
+            journal.append(list_.id, self.instance.text)
+            return self.instance
+        try:
+            with transaction.atomic(using=shard_for(list_.id)):
+                item = forms.models.ModelForm.save(self)
+                list_.record_new_items(1)
+        except IntegrityError:
+            # Saved by a concurrent request since this form was validated.
+            self.add_error('text', DUPLICATE_ITEM_ERROR)
+            return None
+        items_created.send(sender=self.__class__, list=list_, items=[item])
+        return item
 
 
 class ExistingListItemForm(ItemForm):
@@ -33,11 +57,75 @@ class ExistingListItemForm(ItemForm):
         self.instance.list = for_list
 
     def save(self):
-        return forms.models.ModelForm.save(self)
+        return self._save()
 
     def validate_unique(self):
+        self.instance.text_hash = hash_text(self.instance.text)
         try:
-            self.instance.validate_unique()
+            # The list's item index rules out most new texts without a query.
+            if may_contain(self.instance.list, self.instance.text_hash):
+                self.instance.validate_unique()
+            self._validate_unique_in_journal()
         except ValidationError as e:
             e.error_dict = {'text': [DUPLICATE_ITEM_ERROR]}
             self._update_errors(e)
+
+    def _validate_unique_in_journal(self):
+        pending = pending_items(self.instance.list.id)
+        if any(item.text_hash == self.instance.text_hash for item in pending):
+            raise ValidationError(DUPLICATE_ITEM_ERROR)
+
+
+class BulkItemForm(object):
+    """Validates a batch of item texts for one list and saves the valid ones
+    with a single bulk insert. Rejected texts are reported per item, by their
+    position in the batch."""
+
+    def __init__(self, for_list, texts):
+        self.list = for_list
+        self.texts = texts
+        self.errors = []
+
+    def clean(self):
+        existing = set(
+            Item.objects.filter(list=self.list).values_list('text_hash', flat=True)
+        )
+        items = []
+        for index, text in enumerate(self.texts):
+            text = text.strip()
+            text_hash = hash_text(text)
+            if not text:
+                self.errors.append(
+                    {'index': index, 'text': text, 'error': EMPTY_ITEM_ERROR})
+            elif text_hash in existing:
+                self.errors.append(
+                    {'index': index, 'text': text, 'error': DUPLICATE_ITEM_ERROR})
+            else:
+                existing.add(text_hash)
+                items.append(Item(list=self.list, text=text, text_hash=text_hash))
+        return items
+
+    def save(self):
+        for attempt in range(2):
+            self.errors = []
+            items = self.clean()
+            if not items:
+                return items
+            try:
+                save_new_items(self.list, items)
+                break
+            except IntegrityError:
+                # Some texts were saved by a concurrent request since clean()
+                # looked; looking again reports them as duplicates.
+                continue
+        else:
+            # Still clashing: reported as duplicates, as ItemForm does.
+            texts = [text.strip() for text in self.texts]
+            self.errors.extend(
+                {'index': texts.index(item.text), 'text': item.text,
+                 'error': DUPLICATE_ITEM_ERROR}
+                for item in items)
+            self.errors.sort(key=lambda error: error['index'])
+            return []
+        items_created.send(sender=self.__class__, list=self.list, items=items)
+        return items
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F
+
+from lists.models import List
+
+
+class Command(BaseCommand):
+    help = ('Compares each List.item_count with the number of items in the list. '
+            'Items created without the item forms (e.g. in the shell) are not counted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Store the actual counts for lists that are off.')
+
+    def handle(self, *args, **options):
+        mismatched = []
+        for shard in settings.LISTS_SHARDS:
+            on_shard = list(
+                List.objects.using(shard).annotate(actual=Count('item'))
+                .exclude(item_count=F('actual'))
+                .values_list('id', 'item_count', 'actual')
+            )
+            for list_id, stored, actual in on_shard:
+                self.stdout.write('List {}: item_count is {}, has {} items'.format(
+                    list_id, stored, actual))
+                if options['fix']:
+                    List.objects.using(shard).filter(id=list_id).update(item_count=actual)
+            mismatched.extend(on_shard)
+
+        if not mismatched:
+            self.stdout.write('All item counts are consistent.')
+        elif options['fix']:
+            self.stdout.write('Fixed {} lists.'.format(len(mismatched)))
+        else:
+            raise CommandError('{} lists have inconsistent item counts.'.format(len(mismatched)))
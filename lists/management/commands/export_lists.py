@@ -0,0 +1,47 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lists.archive import (CHUNK_SIZE, MAGIC, ArchiveError, export_chunks,
+                           resume_point, write_frame)
+
+
+class Command(BaseCommand):
+    help = ('Writes every list and item to a compact archive (lists.archive) '
+            'a chunk at a time, for import_lists to load. With --resume, '
+            'carries on an export that was interrupted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archive to write.')
+        parser.add_argument('--compress', action='store_true',
+                            help='Compress each chunk with zlib.')
+        parser.add_argument('--resume', action='store_true',
+                            help='Append to the archive after its last whole chunk.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Rows per chunk (default {}).'.format(CHUNK_SIZE))
+
+    def handle(self, *args, **options):
+        path = options['path']
+        after = None
+        if options['resume'] and os.path.exists(path):
+            archive = open(path, 'r+b')
+            try:
+                offset, after = resume_point(archive)
+            except ArchiveError as error:
+                archive.close()
+                raise CommandError(error)
+            archive.seek(offset)
+            archive.truncate()
+        else:
+            archive = open(path, 'wb')
+            archive.write(MAGIC)
+        rows = 0
+        try:
+            for chunk in export_chunks(options['chunk_size'], after):
+                write_frame(archive, chunk, options['compress'])
+                rows += len(chunk['id'])
+        except ArchiveError as error:
+            raise CommandError(error)
+        finally:
+            archive.close()
+        self.stdout.write('Exported {} rows to {}.'.format(rows, path))
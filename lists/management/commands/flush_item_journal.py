@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lists.writebehind import get_journal
+
+
+class Command(BaseCommand):
+    help = ('Saves the items queued in the write-behind journal. Run it after '
+            'stopping the workers to drain the queue, or with --interval as '
+            'the only flusher.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Keep flushing every INTERVAL seconds.')
+
+    def handle(self, *args, **options):
+        journal = get_journal()
+        if journal is None:
+            raise CommandError('Write-behind is off; set LISTS_WRITE_BEHIND_JOURNAL.')
+        while True:
+            saved = journal.flush()
+            if options['interval'] is None:
+                self.stdout.write('Saved {} queued items.'.format(saved))
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lists.archive import ArchiveError, import_chunk, read_frames
+
+
+class Command(BaseCommand):
+    help = ('Loads the lists and items of an archive written by export_lists, '
+            'keeping their ids. Rows already in the database are skipped, so '
+            'an import that stopped can be run again; --skip saves re-reading '
+            'the chunks it got through. The item counts are the ones exported: '
+            'run check_list_counters --fix after importing into lists that '
+            'already had items.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archive to read.')
+        parser.add_argument('--skip', type=int, default=0,
+                            help='Skip the first SKIP chunks.')
+
+    def handle(self, *args, **options):
+        imported = {'list': 0, 'item': 0}
+        done = 0
+        with open(options['path'], 'rb') as archive:
+            try:
+                for index, (chunk, offset) in enumerate(read_frames(archive)):
+                    if index >= options['skip']:
+                        imported[chunk['model']] += import_chunk(chunk)
+                    done = index + 1
+            except ArchiveError as error:
+                raise CommandError(
+                    '{} Imported the first {} chunks; rerun with --skip {} to carry '
+                    'on from there.'.format(error, done, done))
+        self.stdout.write('Imported {} lists and {} items.'.format(
+            imported['list'], imported['item']))
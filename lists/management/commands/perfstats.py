@@ -0,0 +1,44 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from lists import perf
+
+
+class Command(BaseCommand):
+    help = 'Prints request timing percentiles and histograms collected by PerformanceMiddleware.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.LISTS_PERF_DUMP_DIR,
+                            help='Directory with the workers\' snapshots.')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the merged samples as JSON.')
+
+    def handle(self, *args, **options):
+        if not options['dir']:
+            raise CommandError('No snapshot directory; set LISTS_PERF_DUMP_DIR or pass --dir.')
+        merged = perf.merge(perf.load_snapshots(options['dir']))
+        if options['json']:
+            self.stdout.write(json.dumps(merged))
+            return
+
+        bounds = ['<={}'.format(bound) for bound in perf.HISTOGRAM_BOUNDS] + ['more']
+        for name, data in sorted(merged['views'].items()):
+            self.stdout.write('{} ({} requests)'.format(name, data['count']))
+            for metric in perf.METRICS:
+                values = data['samples'][metric]
+                if not values:
+                    continue
+                self.stdout.write('  {:<10} {}  max={:.1f}'.format(metric, '  '.join(
+                    'p{}={:.1f}'.format(pct, perf.percentile(values, pct))
+                    for pct in perf.PERCENTILES
+                ), max(values)))
+                if metric.endswith('_ms'):
+                    counts = perf.histogram(values)
+                    self.stdout.write('             ' + '  '.join(
+                        '{}:{}'.format(bound, count)
+                        for bound, count in zip(bounds, counts) if count
+                    ))
+        cache_stats = merged['table_cache']
+        self.stdout.write('table cache: {hits} hits, {misses} misses'.format(**cache_stats))
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from lists.ratelimit import RULES, get_buckets
+
+
+class Command(BaseCommand):
+    help = ('Prints how many writes each rate limit let through and turned '
+            'away, and the clients and lists turned away most.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10,
+                            help='Clients and lists to list (default 10).')
+        parser.add_argument('--reset', action='store_true',
+                            help='Refill every bucket and zero the counters.')
+
+    def handle(self, *args, **options):
+        if not settings.LISTS_RATE_LIMIT_FILE:
+            raise CommandError('The buckets are kept per process; set LISTS_RATE_LIMIT_FILE.')
+        buckets = get_buckets()
+        if options['reset']:
+            buckets.reset()
+            self.stdout.write('Reset the rate limits.')
+            return
+        stats = buckets.stats()
+        for rule in RULES:
+            self.stdout.write('{}: {allowed} allowed, {throttled} throttled'.format(
+                rule, **stats['rules'][rule]))
+        for key, throttled, tokens in stats['keys'][:options['top']]:
+            self.stdout.write('  {}  throttled {} times, {:.1f} tokens left'.format(
+                key, throttled, tokens))
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from lists.models import List, ListLocation
+from lists.sharding import move_list
+
+
+class Command(BaseCommand):
+    help = ('Moves lists between the shards in LISTS_SHARDS until their item '
+            'counts are even, and off databases that are no longer shards. '
+            'Run it with the workers stopped: items added to a list while it '
+            'moves would be left behind.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only print the moves.')
+        parser.add_argument('--list', type=int, dest='list_id',
+                            help='Move this list only, to the shard given with --to.')
+        parser.add_argument('--to', help='Shard to move --list to.')
+
+    def handle(self, *args, **options):
+        shards = list(settings.LISTS_SHARDS)
+        if options['list_id'] is not None:
+            if options['to'] not in shards:
+                raise CommandError('--to must be one of {}.'.format(', '.join(shards)))
+            moves = [(options['list_id'], options['to'])]
+        else:
+            moves = plan_moves(shards)
+        for list_id, target in moves:
+            if options['dry_run']:
+                self.stdout.write('Would move list {} to {}.'.format(list_id, target))
+            else:
+                moved = move_list(list_id, target)
+                self.stdout.write('Moved list {} ({} items) to {}.'.format(
+                    list_id, moved, target))
+        if not moves:
+            self.stdout.write('The shards are balanced.')
+
+
+def plan_moves(shards):
+    """(list id, shard) moves that leave no list off the shards and the item
+    counts of the shards within one list's size of each other."""
+    sizes = {
+        shard: dict(List.objects.using(shard).values_list('id', 'item_count'))
+        for shard in shards
+    }
+    totals = {shard: sum(lists.values()) for shard, lists in sizes.items()}
+    moves = []
+    stranded = (
+        ListLocation.objects.using(DEFAULT_DB_ALIAS).exclude(shard__in=shards)
+        .values_list('id', 'shard')
+    )
+    for list_id, shard in stranded:
+        size = List.objects.using(shard).filter(id=list_id).values_list(
+            'item_count', flat=True).first() or 0
+        target = min(shards, key=totals.get)
+        totals[target] += size
+        sizes[target][list_id] = size
+        moves.append((list_id, target))
+    while True:
+        fullest = max(shards, key=totals.get)
+        emptiest = min(shards, key=totals.get)
+        gap = totals[fullest] - totals[emptiest]
+        # The biggest list whose move narrows the gap without reversing it.
+        candidates = [(size, list_id) for list_id, size in sizes[fullest].items()
+                      if 0 < size <= gap // 2]
+        if not candidates:
+            return moves
+        size, list_id = max(candidates)
+        del sizes[fullest][list_id]
+        sizes[emptiest][list_id] = size
+        totals[fullest] -= size
+        totals[emptiest] += size
+        moves.append((list_id, emptiest))
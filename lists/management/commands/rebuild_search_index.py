@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lists.search import all_item_rows, get_search_index
+
+
+class Command(BaseCommand):
+    help = ('Indexes every item for search afresh. Run it after turning the '
+            'index on, and after loading items around the forms, e.g. with '
+            'import_lists.')
+
+    def handle(self, *args, **options):
+        index = get_search_index()
+        if index is None:
+            raise CommandError('Search has no index; set LISTS_SEARCH_INDEX.')
+        indexed = index.rebuild(all_item_rows())
+        self.stdout.write('Indexed {} items.'.format(indexed))
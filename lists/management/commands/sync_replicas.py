@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from lists.db import copy_sqlite_database
+
+
+class Command(BaseCommand):
+    help = ('Copies the primary SQLite database into the SQLite databases in '
+            'LISTS_REPLICAS, which stand in for replicas during development. '
+            'With --interval, keeps them current, lagging by up to INTERVAL '
+            'seconds.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Copy again every INTERVAL seconds.')
+
+    def handle(self, *args, **options):
+        if not settings.LISTS_REPLICAS:
+            raise CommandError('No replicas; set LISTS_REPLICAS.')
+        aliases = [DEFAULT_DB_ALIAS] + list(settings.LISTS_REPLICAS)
+        for alias in aliases:
+            if settings.DATABASES[alias]['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError(
+                    'Only SQLite databases can be copied; {} is not one.'.format(alias))
+        source = settings.DATABASES[DEFAULT_DB_ALIAS]['NAME']
+        while True:
+            for alias in settings.LISTS_REPLICAS:
+                copy_sqlite_database(source, settings.DATABASES[alias]['NAME'])
+            if options['interval'] is None:
+                self.stdout.write('Copied the database to {}.'.format(
+                    ', '.join(settings.LISTS_REPLICAS)))
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,173 @@
+import itertools
+import math
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.template.base import Template
+
+from lists import perf, routers
+from lists.ratelimit import get_buckets
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_COOKIE = 'lists_primary'
+
+# Views whose posts write lists and items, and whether their first argument
+# is a list id.
+RATE_LIMITED_VIEWS = {
+    'new_list': False,
+    'view_list': True,
+    'add_items_in_bulk': True,
+}
+
+_local = threading.local()
+_original_template_render = Template.render
+
+
+def _timed_template_render(self, context):
+    # Only the outermost render is timed; {% extends %} and {% include %}
+    # render nested templates inside it.
+    timer = getattr(_local, 'timer', None)
+    if timer is None or timer.rendering:
+        return _original_template_render(self, context)
+    timer.rendering = True
+    start = time.perf_counter()
+    try:
+        return _original_template_render(self, context)
+    finally:
+        timer.render_time += time.perf_counter() - start
+        timer.rendering = False
+
+
+class RequestTimer(object):
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.render_time = 0.0
+        self.rendering = False
+        self.query_logs = []
+        for connection in connections.all():
+            # Queries are only timed by the debug cursor, so force it on for
+            # sampled requests. The log is a deque that drops its oldest
+            # entries when full, so this request's entries are the ones after
+            # the entry that was newest when it started.
+            log = connection.queries_log
+            self.query_logs.append(
+                (connection, connection.force_debug_cursor, log[-1] if log else None))
+            connection.force_debug_cursor = True
+
+    def finish(self, response):
+        total_time = time.perf_counter() - self.start
+        queries, db_time = 0, 0.0
+        for connection, was_forced, last_entry in self.query_logs:
+            log = connection.queries_log
+            new_entries = list(itertools.takewhile(
+                lambda entry: entry is not last_entry, reversed(log)))
+            queries += len(new_entries)
+            db_time += sum(float(entry['time']) for entry in new_entries)
+            connection.force_debug_cursor = was_forced
+            if not connection.queries_logged:
+                # Nobody else is collecting queries; don't let the log grow.
+                for _ in new_entries:
+                    log.pop()
+        return {
+            'total_ms': 1000 * total_time,
+            'db_ms': 1000 * db_time,
+            'queries': queries,
+            'render_ms': 1000 * self.render_time,
+            'size_bytes': None if response.streaming else len(response.content),
+        }
+
+
+class PerformanceMiddleware(object):
+    """Times a sample of requests per view: wall time, database queries and
+    time, template render time and response size. The timings are sent back
+    in a Server-Timing header and kept in lists.perf."""
+
+    def __init__(self):
+        # Each handler makes its own instance; render is only wrapped once.
+        if Template.render is not _timed_template_render:
+            Template.render = _timed_template_render
+
+    def process_request(self, request):
+        _local.timer = None
+        if random.random() < settings.LISTS_PERF_SAMPLE_RATE:
+            _local.timer = request.perf_timer = RequestTimer()
+
+    def process_response(self, request, response):
+        timer = getattr(request, 'perf_timer', None)
+        if timer is None:
+            return response
+        _local.timer = None
+        sample = timer.finish(response)
+        response['Server-Timing'] = (
+            'total;dur={total_ms:.1f}, '
+            'db;dur={db_ms:.1f};desc="{queries} queries", '
+            'render;dur={render_ms:.1f}'.format(**sample)
+        )
+        resolver_match = getattr(request, 'resolver_match', None)
+        view_name = resolver_match.view_name if resolver_match else 'unresolved'
+        perf.record(view_name, sample)
+        return response
+
+
+class ReplicaMiddleware(object):
+    """Serves the reads of safe requests from one of LISTS_REPLICAS.
+
+    Other requests read and write the primary. When one succeeds it sets a
+    cookie that keeps the client on the primary for
+    LISTS_REPLICA_PIN_SECONDS, long enough for the replicas to catch up, so
+    the page a post redirects to always shows what was just saved.
+    """
+
+    def process_request(self, request):
+        replicas = settings.LISTS_REPLICAS
+        if (replicas and request.method in SAFE_METHODS and
+                PRIMARY_COOKIE not in request.COOKIES):
+            routers.read_from(random.choice(replicas))
+        else:
+            routers.read_from(None)
+
+    def process_response(self, request, response):
+        if (settings.LISTS_REPLICAS and request.method not in SAFE_METHODS and
+                response.status_code < 400):
+            response.set_cookie(
+                PRIMARY_COOKIE, '1', max_age=settings.LISTS_REPLICA_PIN_SECONDS,
+                httponly=True)
+        # Streamed content is produced after this, from the primary.
+        routers.read_from(None)
+        return response
+
+
+class RateLimitMiddleware(object):
+    """Turns away posts that write lists and items once their client, or
+    the list they add to, runs out of tokens (lists.ratelimit): a 429 with
+    Retry-After, answered before the view validates or queries anything.
+    The limits are LISTS_RATE_LIMIT_CLIENT and LISTS_RATE_LIMIT_LIST,
+    (requests a second, burst) pairs or None."""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method in SAFE_METHODS:
+            return None
+        has_list = RATE_LIMITED_VIEWS.get(request.resolver_match.url_name)
+        if has_list is None:
+            return None
+        client = request.META.get(settings.LISTS_CLIENT_ADDRESS_HEADER, '')
+        limits = [('client', client, settings.LISTS_RATE_LIMIT_CLIENT)]
+        if has_list:
+            limits.append(('list', view_args[0], settings.LISTS_RATE_LIMIT_LIST))
+        limits = [(rule, key) + tuple(limit)
+                  for rule, key, limit in limits if limit is not None]
+        if not limits:
+            return None
+        wait = get_buckets().take_all(limits)
+        if wait:
+            response = HttpResponse(
+                'Too many requests; try again in a moment.\n',
+                content_type='text/plain', status=429)
+            response['Retry-After'] = str(math.ceil(wait))
+            return response
+        return None
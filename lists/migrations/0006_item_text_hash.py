@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def fill_text_hashes(apps, schema_editor):
+    Item = apps.get_model('lists', 'Item')
+    last_id = 0
+    while True:
+        rows = list(
+            Item.objects.filter(id__gt=last_id)
+            .order_by('id').values_list('id', 'text')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        for item_id, text in rows:
+            text_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()
+            Item.objects.filter(id=item_id).update(text_hash=text_hash)
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0005_list_item_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='text_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_text_hashes, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='item',
+            unique_together=set([('list', 'text_hash')]),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.utils.timezone
+
+BATCH_SIZE = 1000
+
+
+def fill_item_counts(apps, schema_editor):
+    List = apps.get_model('lists', 'List')
+    last_id = 0
+    while True:
+        rows = list(
+            List.objects.filter(id__gt=last_id).order_by('id')
+            .annotate(actual=Count('item')).values_list('id', 'actual')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        for list_id, item_count in rows:
+            List.objects.filter(id=list_id).update(item_count=item_count)
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0006_item_text_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='list',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='list',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(fill_item_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.8 on 2026-10-18 09:03
+from __future__ import unicode_literals
+
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, migrations, models
+
+BATCH_SIZE = 1000
+
+
+def record_list_locations(apps, schema_editor):
+    # The directory only lives on 'default', where every list was until now.
+    if schema_editor.connection.alias != DEFAULT_DB_ALIAS:
+        return
+    List = apps.get_model('lists', 'List')
+    ListLocation = apps.get_model('lists', 'ListLocation')
+    last_id = 0
+    while True:
+        ids = list(
+            List.objects.using(DEFAULT_DB_ALIAS).filter(id__gt=last_id).order_by('id')
+            .values_list('id', flat=True)[:BATCH_SIZE]
+        )
+        if not ids:
+            break
+        ListLocation.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+            [ListLocation(id=list_id, shard=DEFAULT_DB_ALIAS) for list_id in ids])
+        last_id = ids[-1]
+    # New list ids come from the directory, after the existing ones.
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [ListLocation]):
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0007_list_item_count_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListLocation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.RunPython(record_list_locations, migrations.RunPython.noop),
+    ]
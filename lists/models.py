@@ -1,21 +1,110 @@
-from django.db import models
+import hashlib
+
+from django.db import connections, models, transaction
+from django.db.models import F
 from django.core.urlresolvers import reverse
+from django.utils import timezone
+
+from lists.sharding import (ItemQuerySet, ListQuerySet, allocate_list_id,
+                            shard_for)
+
+
+def hash_text(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class ListLocation(models.Model):
+    """Directory entry of a list: its id is the list's, handed out here so
+    that ids are unique across shards, and shard is the database alias that
+    holds the list. Kept in the 'default' database only."""
+    shard = models.CharField(max_length=100)
+
+
+def _has_update_returning(connection):
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return connection.vendor == 'postgresql'
 
 
 class List(models.Model):
+    # Denormalized from the list's items, so that the size and freshness of
+    # a list can be read without touching the items table.
+    item_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = ListQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        if self.pk is None:
+            self.id = allocate_list_id()
+        super().save(*args, **kwargs)
 
     def get_absolute_url(self):
         return reverse('view_list', args=[self.id])
 
+    def record_new_items(self, count):
+        # item_count becomes the count just written, which takes in items
+        # other requests have added since this list was loaded.
+        now = timezone.now()
+        connection = connections[shard_for(self.id)]
+        if not _has_update_returning(connection):
+            lists = List.objects.filter(id=self.id)
+            lists.update(item_count=F('item_count') + count, updated_at=now)
+            self.item_count = lists.values_list('item_count', flat=True).get()
+        else:
+            quote = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'UPDATE {table} SET {count} = {count} + %s, {updated} = %s '
+                    'WHERE {id} = %s RETURNING {count}'.format(
+                        table=quote(List._meta.db_table), count=quote('item_count'),
+                        updated=quote('updated_at'), id=quote('id')),
+                    [count, connection.ops.adapt_datetimefield_value(now), self.id])
+                self.item_count, = cursor.fetchone()
+        self.updated_at = now
+
 
 class Item(models.Model):
     text = models.TextField(default='')
+    # Uniqueness is enforced on a fixed-size digest of the text, so the
+    # unique index stays small however long the items get.
+    text_hash = models.CharField(max_length=40, blank=True, editable=False)
     list = models.ForeignKey(List, default=None)
 
+    objects = ItemQuerySet.as_manager()
+
     def __str__(self):
         return self.text
 
+    def validate_unique(self, exclude=None):
+        self.text_hash = hash_text(self.text)
+        super().validate_unique(exclude)
+
+    def save(self, *args, **kwargs):
+        self.text_hash = hash_text(self.text)
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ('id', )
-        unique_together = ('list', 'text')
+        unique_together = ('list', 'text_hash')
+
 
+def save_new_items(list_, items):
+    """Inserts unsaved items of one list in bulk and counts them on the list.
+    Returns the items with their ids, which bulk inserts on SQLite leave
+    unset."""
+    with transaction.atomic(using=shard_for(list_.id)):
+        Item.objects.bulk_create(items)
+        list_.record_new_items(len(items))
+        if items and items[0].pk is None:
+            # Looked up by text hash, which is unique within the list. The
+            # chunks stay under SQLite's limit of 999 query parameters.
+            hashes = [item.text_hash for item in items]
+            ids = {}
+            for start in range(0, len(hashes), 500):
+                ids.update(list_.item_set.filter(
+                    text_hash__in=hashes[start:start + 500]
+                ).values_list('text_hash', 'id'))
+            for item in items:
+                item.id = ids[item.text_hash]
+    return items
@@ -0,0 +1,95 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.html import format_html
+
+ItemPage = namedtuple('ItemPage', ['items', 'offset', 'next_cursor'])
+
+ROW_HTML = '<tr><td>{}: {}</td></tr>'
+
+
+# Hex digits of the signature that vouches for a cursor's offset.
+SIGNATURE_LENGTH = 12
+
+
+class PageCursor(namedtuple('PageCursor', ['after', 'offset'])):
+    """Where a page of a list starts: after the item with id after, which is
+    the offset-th item of the list. In URLs it reads
+    '<after>-<offset>-<signature>': the offset numbers the page's rows, so
+    only the ones the site handed out are taken."""
+
+    def __str__(self):
+        return '{}-{}-{}'.format(self.after, self.offset, _sign(self.after, self.offset))
+
+
+def _sign(after, offset):
+    value = '{}-{}'.format(after, offset)
+    return salted_hmac('lists.pagination.PageCursor', value).hexdigest()[:SIGNATURE_LENGTH]
+
+
+def parse_cursor(value):
+    try:
+        cursor = int(value)
+    except (TypeError, ValueError):
+        return None
+    return cursor if cursor > 0 else None
+
+
+def parse_page_cursor(value):
+    after, _, rest = (value or '').partition('-')
+    after = parse_cursor(after)
+    if after is None:
+        return None
+    offset, _, signature = rest.partition('-')
+    offset = parse_cursor(offset)
+    # Bare item ids, as in links from before cursors carried the offset,
+    # and offsets that aren't signed are counted again.
+    if offset is None or not constant_time_compare(signature, _sign(after, offset)):
+        return PageCursor(after, None)
+    return PageCursor(after, offset)
+
+
+def get_item_page(list_, cursor=None, size=None):
+    # Keyset pagination on Item.id, which is also the model's ordering, so
+    # each page is an index range scan whatever its depth in the list. The
+    # cursor carries the number of the page's first row along.
+    size = size or settings.LISTS_PAGE_SIZE
+    items = list_.item_set.all()
+    offset = 0
+    if cursor is not None:
+        offset = cursor.offset
+        if offset is None:
+            offset = items.filter(id__lte=cursor.after).count()
+        items = items.filter(id__gt=cursor.after)
+    items = list(items[:size + 1])
+    next_cursor = None
+    if len(items) > size:
+        next_cursor = PageCursor(items[size - 1].id, offset + size)
+    return ItemPage(items[:size], offset, next_cursor)
+
+
+def iter_item_chunks(list_, chunk_size=None, until=None):
+    chunk_size = chunk_size or settings.LISTS_STREAM_CHUNK_SIZE
+    items = list_.item_set.all()
+    if until is not None:
+        items = items.filter(id__lte=until)
+    last_id = 0
+    while True:
+        chunk = list(items.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size or chunk[-1].id == until:
+            return
+        last_id = chunk[-1].id
+
+
+def stream_table_rows(list_, chunk_size=None, until=None):
+    number = 0
+    for chunk in iter_item_chunks(list_, chunk_size, until):
+        rows = []
+        for item in chunk:
+            number += 1
+            rows.append(format_html(ROW_HTML, number, item.text))
+        yield ''.join(rows)
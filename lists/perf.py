@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+
+METRICS = ('total_ms', 'db_ms', 'queries', 'render_ms', 'size_bytes')
+PERCENTILES = (50, 90, 99)
+HISTOGRAM_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+_lock = threading.Lock()
+_views = {}
+_since_dump = 0
+
+
+class ViewStats(object):
+    """Rolling window of the most recent samples for one view."""
+
+    def __init__(self, window):
+        self.count = 0
+        self.samples = {metric: deque(maxlen=window) for metric in METRICS}
+
+    def add(self, sample):
+        self.count += 1
+        for metric, value in sample.items():
+            if value is not None:
+                self.samples[metric].append(value)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'samples': {metric: list(values) for metric, values in self.samples.items()},
+        }
+
+
+def record(view_name, sample):
+    global _since_dump
+    with _lock:
+        stats = _views.get(view_name)
+        if stats is None:
+            stats = _views[view_name] = ViewStats(settings.LISTS_PERF_WINDOW)
+        stats.add(sample)
+        _since_dump += 1
+        dump_due = _since_dump >= settings.LISTS_PERF_DUMP_EVERY
+        if dump_due:
+            _since_dump = 0
+    if dump_due and settings.LISTS_PERF_DUMP_DIR:
+        dump(settings.LISTS_PERF_DUMP_DIR)
+
+
+def snapshot():
+    from lists.caching import table_cache_stats
+    with _lock:
+        views = {name: stats.as_dict() for name, stats in _views.items()}
+    return {'pid': os.getpid(), 'views': views, 'table_cache': dict(table_cache_stats)}
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+def dump(directory):
+    # One file per worker process, replaced atomically so a reader never
+    # sees a partial snapshot.
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'perf-{}.json'.format(os.getpid()))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def load_snapshots(directory):
+    snapshots = []
+    for name in sorted(os.listdir(directory)):
+        if name.startswith('perf-') and name.endswith('.json'):
+            with open(os.path.join(directory, name)) as f:
+                snapshots.append(json.load(f))
+    return snapshots
+
+
+def merge(snapshots):
+    views = {}
+    table_cache = {'hits': 0, 'misses': 0}
+    for snap in snapshots:
+        for name, data in snap['views'].items():
+            merged = views.setdefault(
+                name, {'count': 0, 'samples': {metric: [] for metric in METRICS}})
+            merged['count'] += data['count']
+            for metric, values in data['samples'].items():
+                merged['samples'][metric].extend(values)
+        for key in table_cache:
+            table_cache[key] += snap.get('table_cache', {}).get(key, 0)
+    return {'views': views, 'table_cache': table_cache}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def histogram(values, bounds=HISTOGRAM_BOUNDS):
+    buckets = [0] * (len(bounds) + 1)
+    for value in values:
+        for i, bound in enumerate(bounds):
+            if value <= bound:
+                buckets[i] += 1
+                break
+        else:
+            buckets[-1] += 1
+    return buckets
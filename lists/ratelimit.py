@@ -0,0 +1,185 @@
+"""Token buckets for the rate limits of lists.middleware.RateLimitMiddleware.
+
+The buckets live in a fixed-size table: in memory, or, so that every worker
+draws on the same buckets, in a file mapped into each of them
+(LISTS_RATE_LIMIT_FILE) and changed under an exclusive flock. A key goes in
+one of PROBE slots picked by its CRC; when they are all taken, the bucket
+that has been idle longest makes way, which at worst refills it early. The
+table also counts the requests each rule let through and turned away, and
+how often each key was turned away, for `manage.py ratelimitstats`.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+RULES = ('client', 'list')
+
+MAGIC = b'LSTRATE1'
+# Magic, slot count, then requests allowed and throttled by each rule.
+HEADER = struct.Struct('<8sI4x' + 'QQ' * len(RULES))
+COUNTER = struct.Struct('<Q')
+COUNTERS_OFFSET = 16
+# Keys are cut to KEY_SIZE bytes; client addresses and list ids always fit.
+KEY_SIZE = 48
+# Key, tokens left, when they were counted, times turned away.
+SLOT = struct.Struct('<{}sddI4x'.format(KEY_SIZE))
+SLOT_COUNT = 4096
+PROBE = 8
+
+
+class TokenBuckets(object):
+
+    def __init__(self, path=None, slot_count=SLOT_COUNT):
+        self.path = path
+        self.slot_count = slot_count
+        self.size = HEADER.size + slot_count * SLOT.size
+        # flock doesn't keep apart the threads of one process.
+        self._lock = threading.Lock()
+        self._pid = None
+        if path is None:
+            self._fd = None
+            self._map = mmap.mmap(-1, self.size)
+            self._initialize()
+
+    def _mapped(self):
+        if self.path is not None and self._pid != os.getpid():
+            # Opened again after a fork, so that workers don't share the
+            # parent's lock.
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self._fd).st_size != self.size:
+                    os.ftruncate(self._fd, self.size)
+                self._map = mmap.mmap(self._fd, self.size)
+                if HEADER.unpack_from(self._map, 0)[:2] != (MAGIC, self.slot_count):
+                    self._initialize()
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            self._pid = os.getpid()
+        return self._map
+
+    def _initialize(self):
+        self._map[:] = bytes(self.size)
+        HEADER.pack_into(self._map, 0, MAGIC, self.slot_count, *([0] * 2 * len(RULES)))
+
+    def _locked(self, func, *args):
+        with self._lock:
+            buckets = self._mapped()
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                return func(buckets, *args)
+            finally:
+                if self._fd is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def take(self, rule, key, rate, burst, now=None):
+        """Takes a token from the bucket of key, which holds up to burst
+        tokens and gains rate of them a second. Returns 0 when there was one,
+        or else the seconds until there will be."""
+        return self.take_all([(rule, key, rate, burst)], now)
+
+    def take_all(self, limits, now=None):
+        """Like take, for several (rule, key, rate, burst) limits at once:
+        takes a token from each bucket only when every one of them has one,
+        so a request turned away by one limit costs nothing from the others.
+        Returns 0, or the seconds until all of them will have a token."""
+        now = time.time() if now is None else now
+        return self._locked(self._take_all, limits, now)
+
+    def _take_all(self, buckets, limits, now):
+        refilled = []
+        for rule, key, rate, burst in limits:
+            name = '{}:{}'.format(rule, key).encode('utf-8')[:KEY_SIZE]
+            offset = self._find_slot(buckets, name)
+            stored, tokens, updated, throttled = SLOT.unpack_from(buckets, offset)
+            if stored.rstrip(b'\0') != name:
+                tokens, updated, throttled = burst, now, 0
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            # Stored right away, so that the next limit's key can't be given
+            # the same slot.
+            SLOT.pack_into(buckets, offset, name, tokens, now, throttled)
+            refilled.append((rule, name, offset, 0.0 if tokens >= 1 else (1 - tokens) / rate))
+        wait = max(short for rule, name, offset, short in refilled)
+        for rule, name, offset, short in refilled:
+            stored, tokens, updated, throttled = SLOT.unpack_from(buckets, offset)
+            if stored.rstrip(b'\0') != name:
+                continue
+            if short:
+                throttled += 1
+            elif not wait:
+                tokens -= 1
+            SLOT.pack_into(buckets, offset, name, tokens, now, throttled)
+            # Limits that had a token for a request others turned away
+            # neither let it through nor throttled it.
+            if short or not wait:
+                counter = COUNTERS_OFFSET + COUNTER.size * (2 * RULES.index(rule) + bool(short))
+                count, = COUNTER.unpack_from(buckets, counter)
+                COUNTER.pack_into(buckets, counter, count + 1)
+        return wait
+
+    def _find_slot(self, buckets, name):
+        start = zlib.crc32(name) % self.slot_count
+        oldest = None
+        for probe in range(PROBE):
+            offset = HEADER.size + (start + probe) % self.slot_count * SLOT.size
+            stored, tokens, updated, throttled = SLOT.unpack_from(buckets, offset)
+            stored = stored.rstrip(b'\0')
+            if stored == name or not stored:
+                return offset
+            if oldest is None or updated < oldest[0]:
+                oldest = (updated, offset)
+        return oldest[1]
+
+    def stats(self):
+        """{'rules': {rule: {'allowed': n, 'throttled': n}}, 'keys': [(key,
+        times turned away, tokens left)]}, keys turned away most first."""
+        return self._locked(self._stats)
+
+    def _stats(self, buckets):
+        counts = HEADER.unpack_from(buckets, 0)[2:]
+        rules = {
+            rule: {'allowed': counts[2 * n], 'throttled': counts[2 * n + 1]}
+            for n, rule in enumerate(RULES)
+        }
+        keys = []
+        for n in range(self.slot_count):
+            stored, tokens, updated, throttled = SLOT.unpack_from(
+                buckets, HEADER.size + n * SLOT.size)
+            if throttled:
+                keys.append((stored.rstrip(b'\0').decode('utf-8', 'replace'),
+                             throttled, tokens))
+        keys.sort(key=lambda key: key[1], reverse=True)
+        return {'rules': rules, 'keys': keys}
+
+    def reset(self):
+        self._locked(lambda buckets: self._initialize())
+
+
+_buckets = None
+_buckets_lock = threading.Lock()
+
+
+def get_buckets():
+    global _buckets
+    with _buckets_lock:
+        if _buckets is None:
+            _buckets = TokenBuckets(getattr(settings, 'LISTS_RATE_LIMIT_FILE', None))
+        return _buckets
+
+
+@receiver(setting_changed)
+def _reset_buckets(**kwargs):
+    global _buckets
+    if kwargs['setting'].startswith('LISTS_RATE_LIMIT_'):
+        with _buckets_lock:
+            _buckets = None
@@ -0,0 +1,69 @@
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from lists import sharding
+
+_local = threading.local()
+
+
+def read_from(alias):
+    """Sends this thread's reads to the replica alias (None for the primary)."""
+    _local.replica = alias
+
+
+class ReplicaRouter(object):
+    """Sends writes, and reads by default, to the primary ('default').
+
+    Reads go to a replica only in a request lists.middleware.ReplicaMiddleware
+    picked one for. Everything else reads the primary: posts and the form
+    validation they run, management commands, the write-behind flusher and
+    event streams.
+    """
+
+    def db_for_read(self, model, **hints):
+        return getattr(_local, 'replica', None) or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold copies of the same rows.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ShardRouter(ReplicaRouter):
+    """Sends the queries for a list and its items to the shard holding the
+    list (lists.sharding); lists on 'default' may be read from its replicas.
+    The directory and the other apps stay on 'default'."""
+
+    def _shard(self, model, hints):
+        if model._meta.label_lower not in ('lists.list', 'lists.item'):
+            return None
+        list_id = hints.get('list_id')
+        instance = hints.get('instance')
+        if list_id is None and instance is not None:
+            if instance._meta.label_lower == 'lists.list':
+                list_id = instance.pk
+            else:
+                list_id = getattr(instance, 'list_id', None)
+        return sharding.shard_for(list_id) if list_id is not None else None
+
+    def db_for_read(self, model, **hints):
+        shard = self._shard(model, hints)
+        if shard is None or shard == DEFAULT_DB_ALIAS:
+            return super().db_for_read(model, **hints)
+        return shard
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints) or DEFAULT_DB_ALIAS
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS:
+            return True
+        return (db in settings.LISTS_SHARDS and app_label == 'lists' and
+                model_name != 'listlocation')
@@ -0,0 +1,186 @@
+"""Full-text search of items, across lists and shards.
+
+The index is an SQLite FTS5 table in a file of its own, LISTS_SEARCH_INDEX,
+keyed by item id. Items saved through the forms, the bulk endpoint and the
+write-behind flusher are added as they are saved (items_created);
+`manage.py rebuild_search_index` indexes the ones that came in some other
+way. Without an index, search falls back to scanning the items table.
+"""
+import logging
+import os
+import sqlite3
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from lists.models import Item
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS items USING fts5("
+    "text, list_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 1', "
+    "prefix = '2 3')"
+)
+
+# Only the newest RANK_WINDOW matches of a query are ranked: scoring every
+# item with a common word would take time in proportion to the table.
+RANK_WINDOW = 1000
+
+# Items indexed per transaction by a rebuild.
+REBUILD_CHUNK = 5000
+
+
+def parse_query(query):
+    """FTS5 query matching items with every word of the query; words ending
+    in * match as prefixes. Anything else is taken literally."""
+    terms = []
+    for word in query.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '""')
+        if word:
+            terms.append('"{}"{}'.format(word, '*' if prefix else ''))
+    return ' '.join(terms)
+
+
+class SearchIndex(object):
+    """The FTS5 index at path. Each thread has its own connection; writers
+    from other workers are waited for."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode = wal')
+            connection.execute(SCHEMA)
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def add(self, items):
+        rows = [(item.id, item.text, item.list_id) for item in items if item.id is not None]
+        with self._connect() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO items (rowid, text, list_id) VALUES (?, ?, ?)', rows)
+
+    def remove(self, item_ids):
+        with self._connect() as connection:
+            connection.executemany(
+                'DELETE FROM items WHERE rowid = ?', [(item_id,) for item_id in item_ids])
+
+    def search(self, query, limit, list_id=None):
+        """(item id, list id, text) of the best of the newest matches, best
+        first."""
+        match = parse_query(query)
+        if not match:
+            return []
+        sql = 'SELECT rowid, list_id, text, rank FROM items WHERE items MATCH ?'
+        params = [match]
+        if list_id is not None:
+            sql += ' AND list_id = ?'
+            params.append(list_id)
+        sql = ('SELECT rowid, list_id, text FROM ({} ORDER BY rowid DESC LIMIT ?) '
+               'ORDER BY rank LIMIT ?').format(sql)
+        params.extend([RANK_WINDOW, limit])
+        return self._connect().execute(sql, params).fetchall()
+
+    def rebuild(self, chunks):
+        """Replaces the index with the items of chunks, lists of (item id,
+        list id, text), in a single transaction: searches see the old index
+        until it is done. Returns how many items were indexed."""
+        indexed = 0
+        with self._connect() as connection:
+            connection.execute('DELETE FROM items')
+            for rows in chunks:
+                connection.executemany(
+                    'INSERT INTO items (rowid, list_id, text) VALUES (?, ?, ?)', rows)
+                indexed += len(rows)
+        with self._connect() as connection:
+            connection.execute("INSERT INTO items (items) VALUES ('optimize')")
+        return indexed
+
+
+def scan_items(query, limit, list_id=None):
+    """The search without an index: items containing every word of the
+    query, newest first, from each shard in turn."""
+    words = [word.rstrip('*') for word in query.split() if word.rstrip('*')]
+    if not words:
+        return []
+    results = []
+    for shard in settings.LISTS_SHARDS:
+        items = Item.objects.using(shard)
+        if list_id is not None:
+            items = items.filter(list_id=list_id)
+        for word in words:
+            items = items.filter(text__icontains=word)
+        results.extend(items.order_by('-id').values_list('id', 'list_id', 'text')[:limit])
+        if len(results) >= limit:
+            break
+    return results[:limit]
+
+
+def search_items(query, limit, list_id=None):
+    index = get_search_index()
+    if index is None:
+        return scan_items(query, limit, list_id)
+    return index.search(query, limit, list_id)
+
+
+def all_item_rows(chunk_size=REBUILD_CHUNK):
+    """(item id, list id, text) of every item on the shards, in chunks."""
+    for shard in settings.LISTS_SHARDS:
+        last_id = 0
+        while True:
+            rows = list(
+                Item.objects.using(shard).filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'list_id', 'text')[:chunk_size]
+            )
+            if not rows:
+                break
+            yield rows
+            last_id = rows[-1][0]
+
+
+def index_items(sender, **kwargs):
+    """items_created receiver adding the new items to the index. The items
+    are saved by now: an index that can't take them is left for a rebuild
+    rather than failing the request."""
+    index = get_search_index()
+    if index is None:
+        return
+    try:
+        index.add(kwargs['items'])
+    except sqlite3.Error:
+        logger.exception('Could not index %d items of list %s',
+                         len(kwargs['items']), kwargs['list'].id)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """The search index, or None when LISTS_SEARCH_INDEX is unset."""
+    global _index
+    path = getattr(settings, 'LISTS_SEARCH_INDEX', None)
+    if not path:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex(path)
+        return _index
+
+
+@receiver(setting_changed)
+def _reset_index(**kwargs):
+    global _index
+    if kwargs['setting'] == 'LISTS_SEARCH_INDEX':
+        with _index_lock:
+            _index = None
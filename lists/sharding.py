@@ -0,0 +1,276 @@
+"""Lists partitioned by id across the databases in LISTS_SHARDS.
+
+The directory, ListLocation in the 'default' database, hands out list ids and
+records which shard holds each list; a list's items live with it. Queries
+find their shard through lists.routers.ShardRouter, from the list id they
+filter on (ShardedQuerySet passes it along as a hint) or the instance they
+belong to. Locations are kept in the shared cache.
+
+With a single shard the directory is left alone: lists take the next id of
+their own table. Once there are more, the directory's ids carry on after
+those, and the lists it doesn't know are looked for on the first shard.
+
+Each shard hands out item ids from its own range, so they are unique across
+shards. A list moved by `manage.py rebalance_lists` takes new ids from the
+range of its new shard, in the same order; the page links and event cursors
+that clients hold for it are stale after the move.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+LOCATION_KEY = 'lists:shard:{}'
+
+# Item ids of the nth shard start at n * SHARD_ID_RANGE; they stay below
+# 2 ** 53, which JavaScript numbers hold exactly, for 8192 shards.
+SHARD_ID_RANGE = 2 ** 40
+
+# Moves copy a list's items in chunks of this many.
+MOVE_CHUNK = 500
+
+
+def _cache():
+    return caches[getattr(settings, 'LISTS_CACHE_ALIAS', 'default')]
+
+
+def shard_for(list_id):
+    """Alias of the database holding the list. Lists the directory doesn't
+    know are looked for on the first shard, where they won't be found."""
+    shards = settings.LISTS_SHARDS
+    if len(shards) == 1:
+        return shards[0]
+    key = LOCATION_KEY.format(list_id)
+    shard = _cache().get(key)
+    if shard is None:
+        from lists.models import ListLocation
+        shard = (
+            ListLocation.objects.using(DEFAULT_DB_ALIAS)
+            .filter(id=list_id).values_list('shard', flat=True).first()
+        )
+        if shard is None:
+            return shards[0]
+        _cache().set(key, shard, None)
+    return shard
+
+
+def place_by_id(list_id, shards):
+    return shards[list_id % len(shards)]
+
+
+def place_on_emptiest(list_id, shards):
+    """The shard holding the fewest lists."""
+    from lists.models import ListLocation
+    counts = dict(
+        ListLocation.objects.using(DEFAULT_DB_ALIAS).exclude(id=list_id)
+        .values_list('shard').annotate(models.Count('id'))
+    )
+    return min(shards, key=lambda shard: counts.get(shard, 0))
+
+
+def allocate_list_id():
+    """Records a new list in the directory, on the shard picked by
+    LISTS_SHARD_PLACEMENT, and returns its id. With a single shard there is
+    nothing to record: returns None, and the list gets the next id of the
+    lists table."""
+    from lists.models import ListLocation
+    shards = settings.LISTS_SHARDS
+    if len(shards) == 1:
+        return None
+    _continue_list_ids(shards[0])
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        location = ListLocation.objects.using(DEFAULT_DB_ALIAS).create(shard=shards[0])
+        location.shard = import_string(settings.LISTS_SHARD_PLACEMENT)(
+            location.id, list(shards))
+        ListLocation.objects.using(DEFAULT_DB_ALIAS).filter(
+            id=location.id).update(shard=location.shard)
+    _cache().set(LOCATION_KEY.format(location.id), location.shard, None)
+    return location.id
+
+
+# First shards whose lists this process has moved the directory's ids past.
+_continued = set()
+
+
+def _continue_list_ids(first_shard):
+    """Makes the directory's next list id greater than those of the lists
+    created while there was a single shard, once per process."""
+    if first_shard in _continued:
+        return
+    from lists.models import List, ListLocation
+    last_id = List.objects.using(first_shard).aggregate(models.Max('id'))['id__max']
+    if last_id:
+        raise_sequence(DEFAULT_DB_ALIAS, ListLocation._meta.db_table, last_id)
+    _continued.add(first_shard)
+
+
+@receiver(setting_changed)
+def _reset_continued(**kwargs):
+    if kwargs['setting'] == 'LISTS_SHARDS':
+        _continued.clear()
+
+
+def _list_id(value):
+    if isinstance(value, models.Model):
+        return value.pk
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ShardedQuerySet(models.QuerySet):
+    """Passes the list id a query filters on to the router as a hint."""
+    # Lookups that name a single list.
+    shard_lookups = ()
+
+    def _list_id(self, kwargs):
+        for lookup in self.shard_lookups:
+            if lookup in kwargs:
+                return _list_id(kwargs[lookup])
+        return None
+
+    def _for_list(self, list_id):
+        if list_id is None:
+            return self
+        clone = self._clone()
+        # Clones share their hints dict; give this one its own.
+        clone._hints = dict(self._hints, list_id=list_id)
+        return clone
+
+    def _filter_or_exclude(self, negate, *args, **kwargs):
+        clone = super()._filter_or_exclude(negate, *args, **kwargs)
+        if not negate and 'list_id' not in self._hints:
+            clone = clone._for_list(self._list_id(kwargs))
+        return clone
+
+    def create(self, **kwargs):
+        return super(ShardedQuerySet, self._for_list(self._list_id(kwargs))).create(**kwargs)
+
+    def bulk_create(self, objs, batch_size=None):
+        objs = list(objs)
+        clone = self._for_list(_list_id(objs[0].list_id)) if objs else self
+        return super(ShardedQuerySet, clone).bulk_create(objs, batch_size)
+
+
+class ListQuerySet(ShardedQuerySet):
+    shard_lookups = ('id', 'pk', 'id__exact', 'pk__exact')
+
+    def create(self, **kwargs):
+        if 'id' not in kwargs and 'pk' not in kwargs:
+            kwargs['id'] = allocate_list_id()
+        return super().create(**kwargs)
+
+    def bulk_create(self, objs, batch_size=None):
+        objs = list(objs)
+        clone = self._for_list(objs[0].id) if objs else self
+        return super(ShardedQuerySet, clone).bulk_create(objs, batch_size)
+
+
+class ItemQuerySet(ShardedQuerySet):
+    shard_lookups = ('list', 'list_id', 'list__id', 'list__pk', 'list__exact',
+                     'list_id__exact')
+
+
+def item_id_range(alias):
+    """(first, end) of the item ids the shard hands out."""
+    first = list(settings.LISTS_SHARDS).index(alias) * SHARD_ID_RANGE
+    return first, first + SHARD_ID_RANGE
+
+
+def raise_item_sequence(alias, value):
+    """Makes the shard's next item id greater than value, if it isn't."""
+    raise_sequence(alias, 'lists_item', value)
+
+
+def raise_sequence(alias, table, value):
+    """Makes the next id of the table greater than value, if it isn't."""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s",
+                [value, table])
+            if not cursor.rowcount:
+                cursor.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)",
+                    [table, value])
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+            sequence = cursor.fetchone()[0]
+            cursor.execute(
+                'SELECT setval(%s, GREATEST(%s, (SELECT last_value FROM {})))'.format(sequence),
+                [sequence, value])
+        else:
+            raise NotImplementedError(
+                'Id sequences are not supported on {}.'.format(connection.vendor))
+
+
+def reserve_item_ids(sender, using, **kwargs):
+    """post_migrate receiver starting each shard's item ids in its range."""
+    shards = list(settings.LISTS_SHARDS)
+    if using in shards and shards.index(using):
+        raise_item_sequence(using, shards.index(using) * SHARD_ID_RANGE)
+
+
+def move_list(list_id, target):
+    """Copies the list and its items to the target shard, points the
+    directory at it and deletes the old copy. The items are numbered afresh
+    on the target. Items written to the list while it moves stay behind, so
+    run it with the workers stopped."""
+    from lists.caching import bump_list_version
+    from lists.models import Item, List, ListLocation
+    from lists.search import get_search_index
+    # From the directory itself: the list may be on a database that is no
+    # longer a shard, which shard_for doesn't look at.
+    source = (
+        ListLocation.objects.using(DEFAULT_DB_ALIAS).filter(id=list_id)
+        .values_list('shard', flat=True).first()
+    ) or shard_for(list_id)
+    if source == target:
+        return 0
+    renumbered = []
+    with transaction.atomic(using=source):
+        list_ = List.objects.using(source).get(id=list_id)
+        with transaction.atomic(using=target):
+            # Left over from a move that failed before the directory changed.
+            Item.objects.using(target).filter(list_id=list_id).delete()
+            List.objects.using(target).filter(id=list_id).delete()
+            List.objects.using(target).bulk_create([list_])
+            items = Item.objects.using(source).filter(list_id=list_id).order_by('id')
+            last_id = 0
+            while True:
+                chunk = list(items.filter(id__gt=last_id)[:MOVE_CHUNK])
+                if not chunk:
+                    break
+                last_id = chunk[-1].id
+                old_ids = [item.id for item in chunk]
+                for item in chunk:
+                    item.id = None
+                # Inserted in order, so the new ids keep it. Looked up by text
+                # hash, which is unique within the list.
+                Item.objects.using(target).bulk_create(chunk)
+                ids = dict(
+                    Item.objects.using(target).filter(
+                        list_id=list_id, text_hash__in=[item.text_hash for item in chunk])
+                    .values_list('text_hash', 'id')
+                )
+                for item in chunk:
+                    item.id = ids[item.text_hash]
+                renumbered.append((old_ids, chunk))
+        # Lists made while there was a single shard aren't in the directory.
+        ListLocation.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+            id=list_id, defaults={'shard': target})
+        _cache().delete(LOCATION_KEY.format(list_id))
+        Item.objects.using(source).filter(list_id=list_id).delete()
+        List.objects.using(source).filter(id=list_id).delete()
+    # Cached tables link to pages by item id.
+    bump_list_version(list_id)
+    index = get_search_index()
+    if index is not None:
+        for old_ids, chunk in renumbered:
+            index.remove(old_ids)
+            index.add(chunk)
+    return sum(len(chunk) for _, chunk in renumbered)
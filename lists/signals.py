@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent whenever new items are saved to a list, whether one at a time through
+# the item forms or in a batch through BulkItemForm.
+items_created = Signal(providing_args=['list', 'items'])
@@ -1,3 +1,99 @@
+/*global $, window */
+
+var RATE_LIMITED_ERROR = 'Too many requests; try again in a moment.';
+var ADD_FAILED_ERROR = 'Could not save the item; reload the page and try again.';
+
+var showItemErrors = function (errors) {
+    var $list = $('<ul class="errorlist"></ul>');
+    $.each(errors, function (i, error) {
+        $list.append($('<li></li>').text(error));
+    });
+    $('.has-error').remove();
+    $('<div class="form-group has-error"><span class="help-block"></span></div>')
+        .find('.help-block').append($list).end()
+        .appendTo($('#id_text').closest('form'));
+};
+
+var appendRow = function (row) {
+    // A row can arrive both as the answer to our own post and over the
+    // event stream; row numbers are unique, so the text identifies it.
+    var $table = $('#id_list_table'), $row = $(row), text = $row.text();
+    if ($table.length === 0) {
+        $table = $('<table id="id_list_table" class="table"></table>');
+        $('#id_list_container').append($table);
+    }
+    var seen = $table.find('tr').filter(function () {
+        return $(this).text() === text;
+    });
+    if (seen.length === 0) {
+        $table.append($row);
+    }
+};
+
+var listenForItems = function () {
+    var url = $('#id_list_table').data('events-url');
+    if (!url || !window.EventSource) {
+        return;
+    }
+    var source = new window.EventSource(url);
+    source.addEventListener('item', function (event) {
+        appendRow(event.data);
+    });
+    source.addEventListener('reload', function () {
+        source.close();
+        window.location.reload();
+    });
+};
+
+var addItemRow = function (row, listUrl) {
+    appendRow(row);
+    $('#id_text').val('').closest('form').attr('action', listUrl);
+    $('h1').text('Your To-do list');
+    if (window.history.pushState && window.location.pathname !== listUrl) {
+        window.history.pushState(null, '', listUrl);
+    }
+};
+
+var itemAddFailed = function (xhr, $form) {
+    if (xhr.status === 400) {
+        showItemErrors($.parseJSON(xhr.responseText).errors);
+    } else if (xhr.status === 429) {
+        // Posting the form instead would only be turned away too; hold off
+        // for as long as the server asks.
+        var seconds = parseInt(xhr.getResponseHeader('Retry-After'), 10) || 1;
+        $form.data('retry-at', $.now() + 1000 * seconds);
+        showItemErrors([RATE_LIMITED_ERROR]);
+    } else if (xhr.status === 0 || xhr.status >= 500) {
+        // The server couldn't be reached or failed: a plain form post
+        // gets the full page, with whatever error it has.
+        $form[0].submit();
+    } else {
+        showItemErrors([ADD_FAILED_ERROR]);
+    }
+};
+
+listenForItems();
+
 $('input').on('keypress', function () {
     $('.has-error').hide();
-});
\ No newline at end of file
+});
+
+$('#id_text').closest('form').on('submit', function (event) {
+    var $form = $(this);
+    event.preventDefault();
+    $('.has-error').remove();
+    if ($.now() < ($form.data('retry-at') || 0)) {
+        showItemErrors([RATE_LIMITED_ERROR]);
+        return;
+    }
+    $.ajax({
+        url: $form.attr('action'),
+        type: 'POST',
+        data: $form.serialize(),
+        dataType: 'text'
+    }).done(function (row, status, xhr) {
+        addItemRow(row, xhr.getResponseHeader('Location'));
+    }).fail(function (xhr) {
+        itemAddFailed(xhr, $form);
+    });
+});
@@ -0,0 +1,27 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from lists.assets import static_url
+from lists.caching import render_list_table
+from lists.writebehind import pending_items, pending_rows
+
+PENDING_MARKER = '<!-- pending items -->'
+
+register = template.Library()
+
+
+@register.simple_tag
+def list_table(list_, cursor=None):
+    html = render_list_table(list_, cursor or None)
+    pending = pending_items(list_.id)
+    if pending:
+        # The cached table marks where queued items go on its last page.
+        html = mark_safe(html.replace(PENDING_MARKER, pending_rows(list_, pending), 1))
+    return html
+
+
+@register.simple_tag
+def static(path):
+    """Like staticfiles' {% static %}, but resolves each path only once per
+    process."""
+    return static_url(path)
@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+import pytest
+
+from lists.dedupe import get_indexes
+from lists.tests.querybudget import check_budget, load_budgets, record_queries
+
+
+def _clear_caches():
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    get_indexes().clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # Test databases hand out the same list ids again, so cached tables and
+    # item indexes from one test must not leak into the next.
+    _clear_caches()
+    yield
+    _clear_caches()
+
+
+@pytest.fixture
+def query_budget(monkeypatch):
+    """Context manager that fails the test when the queries made inside it
+    exceed the named budget in query_budgets.json:
+
+        with query_budget('view_list'):
+            client.get(list_url)
+    """
+    budgets = load_budgets()
+
+    @contextmanager
+    def within(name):
+        with record_queries(monkeypatch) as recorder:
+            yield recorder
+        check_budget(name, recorder, budgets)
+
+    return within
+
+
+@pytest.fixture
+def shard(settings, tmpdir):
+    """A second shard, 'shard1', in an SQLite file of its own. Unlike
+    'default', it is not rolled back after the test."""
+    alias = 'shard1'
+    connections.databases[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(tmpdir.join('shard1.sqlite3')),
+    }
+    settings.LISTS_SHARDS = [DEFAULT_DB_ALIAS, alias]
+    call_command('migrate', database=alias, verbosity=0)
+    yield alias
+    connections[alias].close()
+    del connections.databases[alias]
+    delattr(connections._connections, alias)
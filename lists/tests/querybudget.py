@@ -0,0 +1,118 @@
+"""Query budgets for the views: how many queries a request may make in
+total and inside each template it renders, checked in alongside the tests
+in query_budgets.json."""
+import json
+import os
+import traceback
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.utils import CursorWrapper
+from django.template.base import Template
+
+# Transaction bookkeeping, which differs between tests and production.
+IGNORED_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+BUDGETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_budgets.json')
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_budgets():
+    with open(BUDGETS_FILE) as f:
+        return json.load(f)
+
+
+def _origin():
+    # Frames from the project itself, innermost last; the test that made
+    # the request and Django's own frames are left out.
+    frames = [
+        frame for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(settings.BASE_DIR) and
+        not frame.filename.startswith(TESTS_DIR) and
+        'site-packages' not in frame.filename
+    ]
+    return ['{}:{} in {}'.format(
+        os.path.relpath(frame.filename, settings.BASE_DIR), frame.lineno, frame.name)
+        for frame in frames]
+
+
+class QueryRecorder(object):
+
+    def __init__(self):
+        self.queries = []
+        self.templates = []
+
+    def record(self, sql):
+        if sql.startswith(IGNORED_PREFIXES):
+            return
+        self.queries.append({
+            'sql': sql,
+            'template': self.templates[-1] if self.templates else None,
+            'origin': _origin(),
+        })
+
+    def count(self, template=None):
+        if template is None:
+            return len(self.queries)
+        return sum(1 for query in self.queries if query['template'] == template)
+
+    def by_template(self):
+        counts = {}
+        for query in self.queries:
+            if query['template'] is not None:
+                counts[query['template']] = counts.get(query['template'], 0) + 1
+        return counts
+
+    def report(self, queries=None):
+        lines = []
+        for number, query in enumerate(queries or self.queries, 1):
+            where = ' (in {})'.format(query['template']) if query['template'] else ''
+            lines.append('{}. {}{}'.format(number, query['sql'], where))
+            lines.extend('     ' + frame for frame in query['origin'])
+        return '\n'.join(lines)
+
+
+@contextmanager
+def record_queries(monkeypatch):
+    """Records every query, the template being rendered when it ran, and
+    where in the project it came from."""
+    recorder = QueryRecorder()
+    execute, executemany = CursorWrapper.execute, CursorWrapper.executemany
+    render = Template.render
+
+    def recording_execute(self, sql, params=None):
+        recorder.record(sql)
+        return execute(self, sql, params)
+
+    def recording_executemany(self, sql, param_list):
+        recorder.record(sql)
+        return executemany(self, sql, param_list)
+
+    def recording_render(self, context):
+        recorder.templates.append(self.name)
+        try:
+            return render(self, context)
+        finally:
+            recorder.templates.pop()
+
+    with monkeypatch.context() as patch:
+        patch.setattr(CursorWrapper, 'execute', recording_execute)
+        patch.setattr(CursorWrapper, 'executemany', recording_executemany)
+        patch.setattr(Template, 'render', recording_render)
+        yield recorder
+
+
+def check_budget(name, recorder, budgets=None):
+    budget = (budgets or load_budgets())[name]
+    problems = []
+    if recorder.count() > budget['queries']:
+        problems.append('{} made {} queries, its budget is {}'.format(
+            name, recorder.count(), budget['queries']))
+    template_budgets = budget.get('templates', {})
+    for template, count in sorted(recorder.by_template().items()):
+        allowed = template_budgets.get(template, 0)
+        if count > allowed:
+            problems.append('{} made {} queries while rendering {}, its budget is {}'.format(
+                name, count, template, allowed))
+    if problems:
+        raise AssertionError('\n'.join(problems) + '\n\n' + recorder.report())
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from lists.forms import ItemForm
+from lists.models import Item, List
+
+
+def get_json(response):
+    return json.loads(response.content.decode('utf-8'))
+
+
+@pytest.mark.django_db
+class TestListDetail:
+
+    @pytest.fixture()
+    def list_(self):
+        list_ = List.objects.create()
+        for n in range(1, 4):
+            Item.objects.create(list=list_, text='item {}'.format(n))
+        return list_
+
+    def test_returns_list_and_its_items(self, client, list_):
+        response = client.get('/api/lists/{}/'.format(list_.id))
+        assert response['Content-Type'] == 'application/json'
+        items = list(list_.item_set.all())
+        assert get_json(response) == {
+            'id': list_.id,
+            'items': [{'id': item.id, 'text': item.text} for item in items],
+            'next': None,
+        }
+
+    def test_does_not_include_other_lists(self, client, list_):
+        other_list = List.objects.create()
+        Item.objects.create(list=other_list, text='elsewhere')
+        payload = get_json(client.get('/api/lists/{}/'.format(list_.id)))
+        assert 'elsewhere' not in [item['text'] for item in payload['items']]
+
+    def test_cursor_pagination(self, client, list_):
+        url = '/api/lists/{}/'.format(list_.id)
+        first = get_json(client.get(url, {'limit': 2}))
+        assert [item['text'] for item in first['items']] == ['item 1', 'item 2']
+        second = get_json(client.get(url, {'limit': 2, 'after': first['next']}))
+        assert [item['text'] for item in second['items']] == ['item 3']
+        assert second['next'] is None
+
+    def test_limit_is_capped(self, client, list_, settings):
+        settings.LISTS_API_MAX_PAGE_SIZE = 1
+        payload = get_json(client.get('/api/lists/{}/'.format(list_.id), {'limit': 50}))
+        assert len(payload['items']) == 1
+        assert payload['next'] is not None
+
+    def test_fields_projection(self, client, list_):
+        payload = get_json(client.get(
+            '/api/lists/{}/'.format(list_.id), {'fields': 'text', 'limit': 1}))
+        assert payload['items'] == [{'text': 'item 1'}]
+        assert payload['next'] == list_.item_set.first().id
+
+    def test_unknown_fields_are_rejected(self, client, list_):
+        response = client.get('/api/lists/{}/'.format(list_.id), {'fields': 'list'})
+        assert response.status_code == 400
+
+    def test_missing_list_is_404(self, client):
+        response = client.get('/api/lists/999/')
+        assert response.status_code == 404
+        assert get_json(response) == {'error': 'List not found'}
+
+    def test_matching_etag_gets_304(self, client, list_, django_assert_num_queries):
+        url = '/api/lists/{}/'.format(list_.id)
+        etag = client.get(url)['ETag']
+        with django_assert_num_queries(1):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+    def test_new_item_changes_etag(self, client, list_):
+        url = '/api/lists/{}/'.format(list_.id)
+        etag = client.get(url)['ETag']
+        ItemForm(data={'text': 'item 4'}).save(for_list=list_)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+
+    def test_only_safe_methods(self, client, list_):
+        response = client.post('/api/lists/{}/'.format(list_.id))
+        assert response.status_code == 405
@@ -0,0 +1,159 @@
+import io
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+import pytest
+
+from lists.archive import (MAGIC, ArchiveError, export_chunks, read_frames,
+                           resume_point, write_frame)
+from lists.forms import ItemForm
+from lists.models import Item, List, ListLocation
+from lists.sharding import SHARD_ID_RANGE
+
+
+def make_lists(*sizes):
+    lists = []
+    for size in sizes:
+        list_ = List.objects.create()
+        for n in range(size):
+            ItemForm(data={'text': 'item {}'.format(n)}).save(for_list=list_)
+        lists.append(List.objects.get(id=list_.id))
+    return lists
+
+
+def snapshot():
+    return (
+        list(List.objects.order_by('id').values_list('id', 'item_count', 'updated_at')),
+        list(Item.objects.order_by('id').values_list('id', 'list_id', 'text', 'text_hash')),
+    )
+
+
+def wipe():
+    Item.objects.all().delete()
+    List.objects.all().delete()
+    ListLocation.objects.all().delete()
+
+
+def test_frames_round_trip_and_are_checked():
+    archive = io.BytesIO()
+    archive.write(MAGIC)
+    write_frame(archive, {'model': 'item', 'id': [1], 'text': ['plain']})
+    write_frame(archive, {'model': 'item', 'id': [2], 'text': ['zipped']}, compress=True)
+    archive.seek(0)
+    chunks = [chunk['text'] for chunk, offset in read_frames(archive)]
+    assert chunks == [['plain'], ['zipped']]
+    corrupted = bytearray(archive.getvalue())
+    corrupted[-1] ^= 0xff
+    with pytest.raises(ArchiveError):
+        list(read_frames(io.BytesIO(bytes(corrupted))))
+
+
+@pytest.mark.django_db
+class TestExportImport:
+
+    @pytest.mark.parametrize('compress', [False, True])
+    def test_round_trip_keeps_ids(self, tmpdir, compress):
+        make_lists(3, 0, 2)
+        before = snapshot()
+        path = str(tmpdir.join('lists.archive'))
+        call_command('export_lists', path, compress=compress, chunk_size=2)
+        wipe()
+        call_command('import_lists', path)
+        assert snapshot() == before
+        assert ItemForm(data={'text': 'later'}).save(
+            for_list=List.objects.first()).id > before[1][-1][0]
+        assert List.objects.create().id > before[0][-1][0]
+
+    def test_chunks_are_columns_of_one_shard_and_model(self):
+        list_, = make_lists(3)
+        chunks = list(export_chunks(chunk_size=2))
+        assert [(chunk['model'], len(chunk['id'])) for chunk in chunks] == [
+            ('list', 1), ('item', 2), ('item', 1)]
+        assert chunks[1]['list'] == [list_.id, list_.id]
+        assert 'text_hash' not in chunks[1]
+
+    def test_import_skips_rows_already_there(self, tmpdir, capsys):
+        make_lists(2)
+        path = str(tmpdir.join('lists.archive'))
+        call_command('export_lists', path)
+        call_command('import_lists', path)
+        assert 'Imported 0 lists and 0 items.' in capsys.readouterr().out
+        assert Item.objects.count() == 2
+
+    def test_import_respects_unique_items(self, tmpdir, capsys):
+        list_, = make_lists(1)
+        path = str(tmpdir.join('lists.archive'))
+        call_command('export_lists', path)
+        Item.objects.all().delete()
+        # Same text, another id: the archive's copy would repeat it.
+        Item.objects.create(list=list_, text='item 0')
+        call_command('import_lists', path)
+        assert 'Imported 0 lists and 0 items.' in capsys.readouterr().out
+        assert list(list_.item_set.values_list('text', flat=True)) == ['item 0']
+
+    def test_export_resumes_after_a_cut_short_chunk(self, tmpdir):
+        make_lists(5)
+        path = str(tmpdir.join('lists.archive'))
+        call_command('export_lists', path, chunk_size=2)
+        whole = open(path, 'rb').read()
+        with open(path, 'r+b') as archive:
+            offsets = [offset for chunk, offset in read_frames(archive)]
+            archive.truncate(offsets[1] + 3)
+            archive.seek(0)
+            second_item = Item.objects.order_by('id')[1].id
+            assert resume_point(archive) == (offsets[1], ('default', 'item', second_item))
+        call_command('export_lists', path, chunk_size=2, resume=True)
+        assert open(path, 'rb').read() == whole
+
+    def test_import_reports_where_to_resume(self, tmpdir):
+        make_lists(4)
+        path = str(tmpdir.join('lists.archive'))
+        call_command('export_lists', path, chunk_size=2)
+        with open(path, 'r+b') as archive:
+            offsets = [offset for chunk, offset in read_frames(archive)]
+            archive.truncate(offsets[1] + 3)
+        wipe()
+        with pytest.raises(CommandError) as error:
+            call_command('import_lists', path)
+        assert 'rerun with --skip 2' in str(error.value)
+        assert Item.objects.count() == 2
+
+    def test_import_places_lists_on_the_shards(self, tmpdir, shard, settings):
+        settings.LISTS_SHARDS = ['default']
+        lists = make_lists(1, 1)
+        path = str(tmpdir.join('lists.archive'))
+        call_command('export_lists', path)
+        wipe()
+        settings.LISTS_SHARDS = ['default', shard]
+        call_command('import_lists', path)
+        for list_ in lists:
+            location = ListLocation.objects.get(id=list_.id).shard
+            assert location == ('shard1' if list_.id % 2 else 'default')
+            assert Item.objects.using(location).filter(list_id=list_.id).count() == 1
+
+    def test_import_numbers_items_from_other_shards_afresh(self, tmpdir, shard, settings):
+        lists = make_lists(2, 2)
+        path = str(tmpdir.join('lists.archive'))
+        call_command('export_lists', path)
+        for alias in ('default', shard):
+            Item.objects.using(alias).all().delete()
+            List.objects.using(alias).all().delete()
+        ListLocation.objects.all().delete()
+        settings.LISTS_SHARDS = ['default']
+        call_command('import_lists', path)
+        ids = list(Item.objects.values_list('id', flat=True))
+        assert len(ids) == 4
+        assert max(ids) < SHARD_ID_RANGE
+        for list_ in lists:
+            texts = Item.objects.filter(list_id=list_.id).values_list('text', flat=True)
+            assert list(texts) == ['item 0', 'item 1']
+        new = ItemForm(data={'text': 'new'}).save(for_list=List.objects.get(id=lists[1].id))
+        assert new.id > max(ids)
+
+    def test_rejects_other_files(self, tmpdir):
+        path = tmpdir.join('not.archive')
+        path.write('{"model": "lists.item"}')
+        with pytest.raises(CommandError):
+            call_command('import_lists', str(path))
+        with pytest.raises(CommandError):
+            call_command('export_lists', str(path), resume=True)
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+from django.utils.html import escape
+import pytest
+
+from lists.forms import EMPTY_ITEM_ERROR
+from lists.models import Item, List
+from superlists.asgi import ASGIHandler, application
+
+
+def call_asgi(method, path, body=b'', query_string=b'', headers=(), app=application,
+              send=None):
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': [(b'host', b'testserver')] + list(headers),
+    }
+    messages = []
+    request_messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def receive():
+        return request_messages.pop(0)
+
+    async def record(message):
+        if send is not None:
+            send(message)
+        messages.append(message)
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(app(scope, receive, record))
+    finally:
+        loop.close()
+    start = messages[0]
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return start['status'], dict(start['headers']), body
+
+
+@pytest.fixture(autouse=True)
+def testserver_host(settings):
+    settings.ALLOWED_HOSTS = ['testserver']
+
+
+# Every request checks the connections of its thread, which the pool's
+# threads keep open to the in-memory test database, so even requests that
+# make no queries need the database.
+@pytest.mark.django_db
+def test_home_page_over_asgi():
+    status, headers, body = call_asgi('GET', '/')
+    assert status == 200
+    assert headers[b'content-type'].startswith(b'text/html')
+    assert b'Start a new To-Do list' in body
+
+
+@pytest.mark.django_db
+def test_form_validation_over_asgi():
+    token = b'a' * 32
+    status, _, body = call_asgi(
+        'POST', '/lists/new', body=b'text=',
+        headers=[
+            (b'content-type', b'application/x-www-form-urlencoded'),
+            (b'cookie', b'csrftoken=' + token),
+            (b'x-csrftoken', token),
+        ],
+    )
+    assert status == 200
+    assert escape(EMPTY_ITEM_ERROR) in body.decode('utf-8')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_streamed_list_over_asgi():
+    list_ = List.objects.create()
+    Item.objects.create(list=list_, text='itemey 1')
+    Item.objects.create(list=list_, text='itemey 2')
+    status, _, body = call_asgi(
+        'GET', '/lists/{}/'.format(list_.id), query_string=b'stream=1')
+    assert status == 200
+    assert b'1: itemey 1' in body
+    assert b'2: itemey 2' in body
+
+
+class StreamedResponse(object):
+    streaming = True
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.threads = set()
+        self.sent = 0
+        self.closed_on = None
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.threads.add(threading.get_ident())
+            self.sent += 1
+            yield chunk
+
+    def close(self):
+        self.closed_on = threading.get_ident()
+
+
+def streaming_app(response):
+    def wsgi_application(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return response
+    return ASGIHandler(wsgi_application, max_workers=4)
+
+
+def test_streams_a_response_from_one_thread():
+    response = StreamedResponse([b'chunk %d ' % n for n in range(50)])
+    status, _, body = call_asgi('GET', '/streamed', app=streaming_app(response))
+    assert status == 200
+    assert body == b''.join(response.chunks)
+    assert response.threads == {response.closed_on}
+
+
+def test_stops_streaming_when_the_client_goes_away():
+    response = StreamedResponse([b'chunk'] * 1000)
+
+    def send(message):
+        if message.get('more_body'):
+            raise ConnectionResetError
+
+    with pytest.raises(ConnectionResetError):
+        call_asgi('GET', '/streamed', app=streaming_app(response), send=send)
+    assert response.closed_on is not None
+    assert response.sent < 1000
@@ -0,0 +1,40 @@
+from django.template import engines
+
+from lists import assets
+
+
+def test_static_url_resolves_each_path_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(assets.staticfiles_storage, 'url',
+                        lambda path: calls.append(path) or '/s/' + path)
+    assets.static_url.cache_clear()
+    assert assets.static_url('base.css') == '/s/base.css'
+    assert assets.static_url('base.css') == '/s/base.css'
+    assert calls == ['base.css']
+    assets.static_url.cache_clear()
+
+
+def test_static_url_follows_settings_changes(settings):
+    assert assets.static_url('base.css') == '/static/base.css'
+    settings.STATIC_URL = '/assets/'
+    assert assets.static_url('base.css') == '/assets/base.css'
+
+
+def test_base_template_uses_static_url(client):
+    response = client.get('/')
+    assert b'href="/static/base.css"' in response.content
+
+
+def test_warm_up_fills_cached_loader(settings):
+    settings.TEMPLATES = [{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'OPTIONS': {
+            'loaders': [('django.template.loaders.cached.Loader', [
+                'django.template.loaders.app_directories.Loader',
+            ])],
+        },
+    }]
+    assets.warm_up()
+    cached_loader = engines['django'].engine.template_loaders[0]
+    cached_names = {key.split('-')[0] for key in cached_loader.get_template_cache}
+    assert set(assets.PAGE_TEMPLATES) <= cached_names
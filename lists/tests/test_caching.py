@@ -0,0 +1,93 @@
+import pytest
+
+from lists import caching
+from lists.forms import BulkItemForm, ExistingListItemForm, ItemForm
+from lists.models import Item, List
+
+
+@pytest.fixture(params=['locmem', 'filebased'])
+def cache_backend(request, settings, tmpdir):
+    if request.param == 'locmem':
+        backend = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    else:
+        backend = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmpdir.join('cache')),
+        }
+    settings.CACHES = {'default': backend}
+    return request.param
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    counters = {'hits': 0, 'misses': 0}
+    monkeypatch.setattr(caching, 'table_cache_stats', counters)
+    return counters
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('cache_backend')
+class TestListTableCache:
+
+    def test_renders_the_items_of_the_list(self, stats):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='itemey 1')
+        html = caching.render_list_table(list_)
+        assert '1: itemey 1' in html
+        assert stats == {'hits': 0, 'misses': 1}
+
+    def test_second_render_is_served_from_cache(self, stats, django_assert_num_queries):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='itemey 1')
+        first = caching.render_list_table(list_)
+        with django_assert_num_queries(0):
+            second = caching.render_list_table(list_)
+        assert first == second
+        assert stats == {'hits': 1, 'misses': 1}
+
+    def test_item_form_save_invalidates_table(self, stats):
+        list_ = List.objects.create()
+        caching.render_list_table(list_)
+        ItemForm(data={'text': 'new'}).save(for_list=list_)
+        assert '1: new' in caching.render_list_table(list_)
+        assert stats == {'hits': 0, 'misses': 2}
+
+    def test_existing_list_item_form_save_invalidates_table(self):
+        list_ = List.objects.create()
+        caching.render_list_table(list_)
+        form = ExistingListItemForm(for_list=list_, data={'text': 'new'})
+        form.is_valid()
+        form.save()
+        assert '1: new' in caching.render_list_table(list_)
+
+    def test_bulk_save_invalidates_table(self):
+        list_ = List.objects.create()
+        caching.render_list_table(list_)
+        BulkItemForm(for_list=list_, texts=['a', 'b']).save()
+        assert '2: b' in caching.render_list_table(list_)
+
+    def test_saving_to_one_list_keeps_other_tables_cached(self, stats):
+        list_ = List.objects.create()
+        other_list = List.objects.create()
+        caching.render_list_table(other_list)
+        ItemForm(data={'text': 'new'}).save(for_list=list_)
+        caching.render_list_table(other_list)
+        assert stats['hits'] == 1
+
+    def test_lost_version_does_not_resurrect_old_table(self):
+        list_ = List.objects.create()
+        caching.render_list_table(list_)
+        caching._cache().delete(caching.VERSION_KEY.format(list_.id))
+        Item.objects.create(list=list_, text='added behind our back')
+        assert 'added behind our back' in caching.render_list_table(list_)
+
+    def test_table_of_an_older_item_count_is_not_reused(self):
+        # A replica that hasn't caught up renders the table without the
+        # new item; readers of the primary must not be served that.
+        list_ = List.objects.create()
+        ItemForm(data={'text': 'first'}).save(for_list=list_)
+        lagging = List.objects.get(id=list_.id)
+        Item.objects.create(list=list_, text='second')
+        caching.render_list_table(lagging)
+        List.objects.filter(id=list_.id).update(item_count=2)
+        assert '2: second' in caching.render_list_table(List.objects.get(id=list_.id))
@@ -0,0 +1,47 @@
+from django.core.management import call_command
+from django.core.management.base import CommandError
+import pytest
+
+from lists.forms import ItemForm
+from lists.models import Item, List
+from lists.sharding import shard_for
+
+
+@pytest.mark.django_db
+class TestCheckListCounters:
+
+    def test_consistent_lists_pass(self, capsys):
+        list_ = List.objects.create()
+        ItemForm(data={'text': 'counted'}).save(for_list=list_)
+        call_command('check_list_counters')
+        assert 'All item counts are consistent.' in capsys.readouterr().out
+
+    def test_reports_lists_that_are_off(self, capsys):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='not counted')
+        with pytest.raises(CommandError):
+            call_command('check_list_counters')
+        assert 'List {}: item_count is 0, has 1 items'.format(list_.id) in capsys.readouterr().out
+
+    def test_fix_stores_actual_counts(self):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='not counted')
+        call_command('check_list_counters', fix=True)
+        assert List.objects.get(id=list_.id).item_count == 1
+
+    def test_checks_every_shard(self, shard, capsys):
+        list_ = List.objects.create()
+        while shard_for(list_.id) != shard:
+            list_ = List.objects.create()
+        Item.objects.create(list=list_, text='not counted')
+        with pytest.raises(CommandError):
+            call_command('check_list_counters')
+        assert 'List {}: item_count is 0'.format(list_.id) in capsys.readouterr().out
+        call_command('check_list_counters', fix=True)
+        assert List.objects.using(shard).get(id=list_.id).item_count == 1
+
+
+def test_sync_replicas_needs_replicas(settings):
+    settings.LISTS_REPLICAS = []
+    with pytest.raises(CommandError):
+        call_command('sync_replicas')
@@ -0,0 +1,80 @@
+import sqlite3
+from types import SimpleNamespace
+
+from lists.db import apply_sqlite_pragmas, configure_sqlite, copy_sqlite_database
+
+
+def pragma(conn, name):
+    return conn.execute('PRAGMA {}'.format(name)).fetchone()[0]
+
+
+def test_apply_sqlite_pragmas(tmpdir):
+    conn = sqlite3.connect(str(tmpdir.join('db.sqlite3')))
+    apply_sqlite_pragmas(conn.cursor(), {
+        'journal_mode': 'wal',
+        'busy_timeout': 1234,
+        'synchronous': 'normal',
+    })
+    assert pragma(conn, 'journal_mode') == 'wal'
+    assert pragma(conn, 'busy_timeout') == 1234
+    assert pragma(conn, 'synchronous') == 1
+
+
+def test_configure_sqlite_uses_settings(settings, tmpdir):
+    settings.LISTS_SQLITE_PRAGMAS = {'journal_mode': 'wal'}
+    conn = sqlite3.connect(str(tmpdir.join('db.sqlite3')))
+    configure_sqlite(sender=None, connection=SimpleNamespace(vendor='sqlite', connection=conn))
+    assert pragma(conn, 'journal_mode') == 'wal'
+
+
+def test_configure_sqlite_ignores_other_databases(settings):
+    settings.LISTS_SQLITE_PRAGMAS = {'journal_mode': 'wal'}
+    # Would fail on any attribute access beyond vendor.
+    configure_sqlite(sender=None, connection=SimpleNamespace(vendor='postgresql'))
+
+
+def make_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE IF NOT EXISTS item (id INTEGER PRIMARY KEY, text TEXT)')
+    conn.execute('CREATE INDEX IF NOT EXISTS item_text ON item (text)')
+    conn.executemany('INSERT INTO item (text) VALUES (?)', [(row,) for row in rows])
+    conn.commit()
+    return conn
+
+
+def item_texts(conn):
+    return [text for text, in conn.execute('SELECT text FROM item ORDER BY id')]
+
+
+class TestCopySqliteDatabase:
+
+    def test_copies_tables_and_indexes(self, tmpdir):
+        source, target = str(tmpdir.join('db.sqlite3')), str(tmpdir.join('replica.sqlite3'))
+        make_database(source, ['a', 'b'])
+        copy_sqlite_database(source, target)
+        replica = sqlite3.connect(target)
+        assert item_texts(replica) == ['a', 'b']
+        assert replica.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'").fetchall() == [('item_text',)]
+
+    def test_open_readers_see_the_next_copy(self, tmpdir):
+        source, target = str(tmpdir.join('db.sqlite3')), str(tmpdir.join('replica.sqlite3'))
+        primary = make_database(source, ['a'])
+        copy_sqlite_database(source, target)
+        replica = sqlite3.connect(target)
+        assert item_texts(replica) == ['a']
+        primary.execute("INSERT INTO item (text) VALUES ('b')")
+        primary.commit()
+        copy_sqlite_database(source, target)
+        assert item_texts(replica) == ['a', 'b']
+
+    def test_recreates_a_schema_that_changed(self, tmpdir):
+        source, target = str(tmpdir.join('db.sqlite3')), str(tmpdir.join('replica.sqlite3'))
+        primary = make_database(source, ['a'])
+        copy_sqlite_database(source, target)
+        primary.execute('ALTER TABLE item ADD COLUMN done BOOLEAN DEFAULT 0')
+        primary.execute("UPDATE item SET done = 1")
+        primary.commit()
+        copy_sqlite_database(source, target)
+        replica = sqlite3.connect(target)
+        assert replica.execute('SELECT text, done FROM item').fetchall() == [('a', 1)]
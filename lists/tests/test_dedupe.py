@@ -0,0 +1,118 @@
+import pytest
+
+from lists import dedupe
+from lists.dedupe import BloomFilter, get_indexes, get_item_index
+from lists.forms import DUPLICATE_ITEM_ERROR, BulkItemForm, ExistingListItemForm
+from lists.models import Item, List, hash_text
+
+
+def add_item(list_, text):
+    form = ExistingListItemForm(for_list=list_, data={'text': text})
+    assert form.is_valid(), form.errors
+    return form.save()
+
+
+class TestBloomFilter:
+
+    def test_has_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        hashes = [hash_text('item {}'.format(n)) for n in range(1000)]
+        for text_hash in hashes:
+            bloom.add(text_hash)
+        assert all(text_hash in bloom for text_hash in hashes)
+
+    def test_false_positive_rate_at_capacity_is_about_one_percent(self):
+        bloom = BloomFilter(1000)
+        for n in range(1000):
+            bloom.add(hash_text('item {}'.format(n)))
+        false_positives = sum(
+            hash_text('other {}'.format(n)) in bloom for n in range(10000))
+        assert false_positives < 200
+
+
+@pytest.fixture(params=['memory', 'files'])
+def indexes(request, settings, tmpdir):
+    if request.param == 'files':
+        settings.LISTS_ITEM_INDEX_DIR = str(tmpdir.join('indexes'))
+    return get_indexes()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('indexes')
+class TestItemIndex:
+
+    def test_new_text_is_validated_without_queries(self, django_assert_num_queries):
+        list_ = List.objects.create()
+        add_item(list_, 'first')
+        get_item_index(list_)
+        form = ExistingListItemForm(for_list=list_, data={'text': 'second'})
+        with django_assert_num_queries(0):
+            assert form.is_valid()
+
+    def test_duplicate_is_still_caught(self):
+        list_ = List.objects.create()
+        add_item(list_, 'twice')
+        form = ExistingListItemForm(for_list=list_, data={'text': 'twice'})
+        assert not form.is_valid()
+        assert form.errors['text'] == [DUPLICATE_ITEM_ERROR]
+
+    def test_saves_keep_the_index_up_to_date(self):
+        list_ = List.objects.create()
+        get_item_index(list_)
+        add_item(list_, 'one')
+        BulkItemForm(for_list=list_, texts=['two', 'three']).save()
+        index = get_item_index(list_)
+        assert index.item_count == 3
+        assert all(hash_text(text) in index.bloom for text in ('one', 'two', 'three'))
+
+    def test_index_behind_the_item_count_is_rebuilt(self):
+        list_ = List.objects.create()
+        get_item_index(list_)
+        Item.objects.create(list=list_, text='around the forms')
+        list_.record_new_items(1)
+        assert hash_text('around the forms') in get_item_index(list_).bloom
+
+    def test_lost_update_drops_the_index(self):
+        list_ = List.objects.create()
+        get_item_index(list_)
+        list_.record_new_items(1)  # as if another worker saved an item
+        item = Item.objects.create(list=list_, text='late')
+        list_.record_new_items(1)
+        dedupe.update_item_index(None, list=list_, items=[item])
+        assert dedupe.get_indexes().load(list_.id) is None
+
+    def test_duplicate_missed_by_the_index_is_caught_on_save(self):
+        list_ = List.objects.create()
+        get_item_index(list_)
+        # Saved without the forms, so neither the index nor the count know.
+        Item.objects.create(list=list_, text='sneaky')
+        form = ExistingListItemForm(for_list=list_, data={'text': 'sneaky'})
+        assert form.is_valid()
+        assert form.save() is None
+        assert form.errors['text'] == [DUPLICATE_ITEM_ERROR]
+        assert List.objects.get(id=list_.id).item_count == 0
+
+
+@pytest.mark.django_db
+class TestFileIndexes:
+
+    @pytest.fixture(autouse=True)
+    def index_dir(self, settings, tmpdir):
+        settings.LISTS_ITEM_INDEX_DIR = str(tmpdir.join('indexes'))
+        return tmpdir.join('indexes')
+
+    def test_saves_set_bits_in_the_file_in_place(self, index_dir):
+        list_ = List.objects.create()
+        get_item_index(list_)
+        inode = index_dir.join('{}.bloom'.format(list_.id)).stat().ino
+        add_item(list_, 'one')
+        assert index_dir.join('{}.bloom'.format(list_.id)).stat().ino == inode
+        index = get_indexes().load(list_.id)
+        assert index.item_count == 1
+        assert hash_text('one') in index.bloom
+
+    def test_damaged_file_is_rebuilt(self, index_dir):
+        list_ = List.objects.create()
+        add_item(list_, 'one')
+        index_dir.join('{}.bloom'.format(list_.id)).write_binary(b'junk')
+        assert hash_text('one') in get_item_index(list_).bloom
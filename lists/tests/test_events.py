@@ -0,0 +1,252 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from lists import broker as list_broker
+from lists.broker import Broker
+from lists.events import format_event, missed_events
+from lists.forms import BulkItemForm, ExistingListItemForm
+from lists.models import Item, List
+from superlists.asgi import application
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def broker(settings):
+    settings.LISTS_BROKER_DIR = None
+    yield list_broker.get_broker()
+    settings.LISTS_BROKER_DIR = None
+
+
+def add_item(list_, text):
+    form = ExistingListItemForm(for_list=list_, data={'text': text})
+    assert form.is_valid()
+    return form.save()
+
+
+class TestBroker:
+
+    def test_delivers_to_subscribers_of_the_list_only(self):
+        broker = Broker()
+        received, other = [], []
+        broker.subscribe(1, received.append)
+        broker.subscribe(2, other.append)
+        broker.publish(1, [{'id': 1, 'html': 'row'}])
+        assert received == [[{'id': 1, 'html': 'row'}]]
+        assert other == []
+
+    def test_unsubscribed_callbacks_get_nothing(self):
+        broker = Broker()
+        received = []
+        broker.subscribe(1, received.append)
+        broker.unsubscribe(1, received.append)
+        broker.publish(1, [{'id': 1, 'html': 'row'}])
+        assert received == []
+        assert broker.subscriber_count() == 0
+
+    def test_events_reach_subscribers_of_other_brokers_in_the_directory(self, tmpdir):
+        publisher = Broker(str(tmpdir))
+        subscriber = Broker(str(tmpdir))
+        received = []
+        subscriber.subscribe(1, received.append)
+        try:
+            publisher.publish(1, [{'id': 1, 'html': 'row'}])
+            assert wait_for(lambda: received)
+            assert received == [[{'id': 1, 'html': 'row'}]]
+        finally:
+            subscriber.close()
+
+    def test_large_batches_are_split_into_several_datagrams(self, tmpdir):
+        publisher = Broker(str(tmpdir))
+        subscriber = Broker(str(tmpdir))
+        received = []
+        subscriber.subscribe(1, received.extend)
+        events = [{'id': i, 'html': 'x' * 1000} for i in range(200)]
+        try:
+            publisher.publish(1, events)
+            assert wait_for(lambda: len(received) == 200)
+            assert received == events
+        finally:
+            subscriber.close()
+
+    def test_failing_subscribers_dont_stop_the_others(self, tmpdir):
+        publisher = Broker(str(tmpdir))
+        subscriber = Broker(str(tmpdir))
+        received = []
+
+        def fail(events):
+            raise ValueError('subscriber bug')
+
+        subscriber.subscribe(1, fail)
+        subscriber.subscribe(1, received.append)
+        try:
+            publisher.publish(1, [{'id': 1, 'html': 'row'}])
+            assert wait_for(lambda: received)
+            publisher.publish(1, [{'id': 2, 'html': 'row'}])
+            assert wait_for(lambda: len(received) == 2)
+        finally:
+            subscriber.close()
+
+    def test_malformed_datagrams_are_skipped(self, tmpdir):
+        subscriber = Broker(str(tmpdir))
+        received = []
+        subscriber.subscribe(1, received.append)
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sender.sendto(b'not json', subscriber.path)
+            sender.sendto(b'{"list": 1}', subscriber.path)
+            Broker(str(tmpdir)).publish(1, [{'id': 1, 'html': 'row'}])
+            assert wait_for(lambda: received)
+        finally:
+            sender.close()
+            subscriber.close()
+
+    def test_stale_sockets_are_removed(self, tmpdir):
+        stale = Broker(str(tmpdir))
+        stale.subscribe(1, lambda events: None)
+        stale.sock.close()
+        Broker(str(tmpdir)).publish(1, [{'id': 1, 'html': 'row'}])
+        assert tmpdir.listdir() == []
+
+
+@pytest.mark.django_db
+class TestPublishing:
+
+    def test_saved_item_is_published_as_a_numbered_row(self, broker):
+        list_ = List.objects.create()
+        received = []
+        broker.subscribe(list_.id, received.extend)
+        add_item(list_, 'first')
+        item = add_item(list_, 'second & last')
+        assert received[-1] == {
+            'id': item.id, 'html': '<tr><td>2: second &amp; last</td></tr>'
+        }
+
+    def test_bulk_saves_are_published_in_one_batch(self, broker):
+        list_ = List.objects.create()
+        received = []
+        broker.subscribe(list_.id, received.append)
+        BulkItemForm(for_list=list_, texts=['a', 'b']).save()
+        assert [[event['html'] for event in batch] for batch in received] == [
+            ['<tr><td>1: a</td></tr>', '<tr><td>2: b</td></tr>']
+        ]
+
+
+@pytest.mark.django_db
+class TestMissedEvents:
+
+    def test_nothing_to_replay_without_a_last_event_id(self):
+        list_ = List.objects.create()
+        add_item(list_, 'a')
+        assert missed_events(list_.id, 0) == []
+
+    def test_replays_items_after_the_last_event_id(self):
+        list_ = List.objects.create()
+        first = add_item(list_, 'a')
+        second = add_item(list_, 'b')
+        assert missed_events(list_.id, first.id) == [
+            {'id': second.id, 'html': '<tr><td>2: b</td></tr>'}
+        ]
+
+    def test_too_many_missed_items_means_reload(self, settings):
+        settings.LISTS_PAGE_SIZE = 2
+        list_ = List.objects.create()
+        first = add_item(list_, 'a')
+        for text in 'bcd':
+            add_item(list_, text)
+        assert missed_events(list_.id, first.id) is None
+
+
+def test_multiline_items_become_multiline_event_data():
+    assert format_event({'id': 3, 'html': 'a\nb'}) == (
+        'id: 3\nevent: item\ndata: a\ndata: b\n\n'
+    )
+
+
+@pytest.mark.django_db
+class TestEventStreamView:
+
+    def test_streams_new_items(self, client, broker, settings):
+        settings.LISTS_LIVE_UPDATES = True
+        settings.LISTS_EVENTS_KEEPALIVE = 0.05
+        list_ = List.objects.create()
+        response = client.get('/lists/{}/events'.format(list_.id))
+        assert response['Content-Type'] == 'text/event-stream'
+        stream = iter(response.streaming_content)
+        assert next(stream).startswith(b'retry:')
+        assert next(stream) == b': keepalive\n\n'
+        add_item(list_, 'live item')
+        assert b'data: <tr><td>1: live item</td></tr>' in next(stream)
+        response.close()
+        assert broker.subscriber_count() == 0
+
+    def test_unknown_list_is_not_found(self, client, settings):
+        settings.LISTS_LIVE_UPDATES = True
+        assert client.get('/lists/999/events').status_code == 404
+
+    def test_list_pages_only_subscribe_with_live_updates(self, client, settings):
+        list_ = List.objects.create()
+        for stream in ('', '?stream=1'):
+            response = client.get('/lists/{}/{}'.format(list_.id, stream))
+            assert b'data-events-url' not in b''.join(
+                response.streaming_content if response.streaming else [response.content])
+        assert client.get('/lists/{}/events'.format(list_.id)).status_code == 404
+        settings.LISTS_LIVE_UPDATES = True
+        content = client.get('/lists/{}/'.format(list_.id)).content.decode()
+        assert 'data-events-url="/lists/{}/events?after="'.format(list_.id) in content
+
+
+@pytest.mark.django_db(transaction=True)
+def test_event_stream_over_asgi(broker, settings):
+    settings.ALLOWED_HOSTS = ['testserver']
+    list_ = List.objects.create()
+    messages = []
+    requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    loop = asyncio.new_event_loop()
+    disconnected = asyncio.Event(loop=loop)
+
+    async def receive():
+        if requests:
+            return requests.pop(0)
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+
+    async def client():
+        scope = {
+            'type': 'http', 'method': 'GET',
+            'path': '/lists/{}/events'.format(list_.id),
+            'query_string': b'', 'headers': [(b'host', b'testserver')],
+        }
+        stream = asyncio.ensure_future(application(scope, receive, send))
+        while broker.subscriber_count() == 0:
+            await asyncio.sleep(0.01)
+        while len(messages) < 2:
+            await asyncio.sleep(0.01)
+        saver = threading.Thread(target=add_item, args=(list_, 'pushed'))
+        saver.start()
+        while len(messages) < 3:
+            await asyncio.sleep(0.01)
+        disconnected.set()
+        await asyncio.wait_for(stream, 2)
+        saver.join()
+
+    try:
+        loop.run_until_complete(client())
+    finally:
+        loop.close()
+    assert messages[0]['status'] == 200
+    assert b'1: pushed' in messages[2]['body']
+    assert broker.subscriber_count() == 0
+    assert Item.objects.count() == 1
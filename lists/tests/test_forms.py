@@ -1,7 +1,7 @@
 import pytest
 
 from lists.forms import (EMPTY_ITEM_ERROR, DUPLICATE_ITEM_ERROR,
-                         ExistingListItemForm, ItemForm)
+                         BulkItemForm, ExistingListItemForm, ItemForm)
 from lists.models import Item, List
 
 
@@ -27,6 +27,13 @@ def test_form_save_handles_saving_to_a_list():
     assert new_item.list == list_
 
 
+@pytest.mark.django_db
+def test_form_save_counts_item_on_the_list():
+    list_ = List.objects.create()
+    ItemForm(data={'text': 'do me'}).save(for_list=list_)
+    assert List.objects.get(id=list_.id).item_count == 1
+
+
 @pytest.mark.django_db
 class TestExistingListItemForm:
 
@@ -36,6 +43,13 @@ class TestExistingListItemForm:
         new_item = form.save()
         assert new_item == Item.objects.all()[0]
 
+    def test_form_save_counts_item_on_the_list(self):
+        list_ = List.objects.create()
+        form = ExistingListItemForm(for_list=list_, data={'text': 'hi'})
+        form.is_valid()
+        form.save()
+        assert List.objects.get(id=list_.id).item_count == 1
+
     def test_form_renders_item_text_input(self):
         list_ = List.objects.create()
         form = ExistingListItemForm(for_list=list_)
@@ -54,3 +68,79 @@ class TestExistingListItemForm:
         assert not form.is_valid()
         assert form.errors['text'] == [DUPLICATE_ITEM_ERROR]
 
+
+@pytest.mark.django_db
+class TestBulkItemForm:
+
+    def test_save_creates_all_items_for_the_list(self):
+        list_ = List.objects.create()
+        form = BulkItemForm(for_list=list_, texts=['one', 'two', 'three'])
+        form.save()
+        assert [item.text for item in list_.item_set.all()] == ['one', 'two', 'three']
+        assert form.errors == []
+
+    def test_saved_items_have_their_ids(self):
+        list_ = List.objects.create()
+        items = BulkItemForm(for_list=list_, texts=['one', 'two']).save()
+        assert [item.id for item in items] == [
+            item.id for item in list_.item_set.all()
+        ]
+
+    def test_save_counts_only_saved_items(self):
+        list_ = List.objects.create()
+        BulkItemForm(for_list=list_, texts=['one', '', 'two', 'one']).save()
+        assert List.objects.get(id=list_.id).item_count == 2
+
+    def test_reports_empty_items_by_position(self):
+        list_ = List.objects.create()
+        form = BulkItemForm(for_list=list_, texts=['one', '  ', 'two'])
+        items = form.save()
+        assert len(items) == 2
+        assert form.errors == [{'index': 1, 'text': '', 'error': EMPTY_ITEM_ERROR}]
+
+    def test_reports_items_already_in_the_list(self):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='no twins!')
+        form = BulkItemForm(for_list=list_, texts=['no twins!', 'fresh'])
+        form.save()
+        assert form.errors == [
+            {'index': 0, 'text': 'no twins!', 'error': DUPLICATE_ITEM_ERROR}
+        ]
+        assert Item.objects.count() == 2
+
+    def test_reports_duplicates_within_the_batch(self):
+        list_ = List.objects.create()
+        form = BulkItemForm(for_list=list_, texts=['same', 'same'])
+        form.save()
+        assert form.errors == [
+            {'index': 1, 'text': 'same', 'error': DUPLICATE_ITEM_ERROR}
+        ]
+        assert Item.objects.count() == 1
+
+    def test_reports_items_saved_concurrently(self, monkeypatch):
+        list_ = List.objects.create()
+        clean = BulkItemForm.clean
+
+        def clean_then_race(form):
+            items = clean(form)
+            if not Item.objects.filter(text='raced').exists():
+                Item.objects.create(list=list_, text='raced')
+            return items
+
+        monkeypatch.setattr(BulkItemForm, 'clean', clean_then_race)
+        form = BulkItemForm(for_list=list_, texts=['fresh', 'raced'])
+        items = form.save()
+        assert [item.text for item in items] == ['fresh']
+        assert form.errors == [
+            {'index': 1, 'text': 'raced', 'error': DUPLICATE_ITEM_ERROR}
+        ]
+        assert list_.item_set.count() == 2
+
+    def test_same_text_is_allowed_in_other_lists(self):
+        other_list = List.objects.create()
+        Item.objects.create(list=other_list, text='shared')
+        list_ = List.objects.create()
+        form = BulkItemForm(for_list=list_, texts=['shared'])
+        form.save()
+        assert form.errors == []
+        assert list_.item_set.count() == 1
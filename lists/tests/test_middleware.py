@@ -0,0 +1,212 @@
+import re
+
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.http import HttpResponse
+from django.template.base import Template
+import pytest
+
+from lists import perf
+from lists.middleware import (PRIMARY_COOKIE, PerformanceMiddleware, RequestTimer,
+                              _timed_template_render)
+from lists.models import Item, List
+from lists.routers import ReplicaRouter
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats():
+    perf.reset()
+    yield
+    perf.reset()
+
+
+def parse_server_timing(header):
+    return {
+        match.group(1): float(match.group(2))
+        for match in re.finditer(r'(\w+);dur=([\d.]+)', header)
+    }
+
+
+@pytest.mark.django_db
+class TestPerformanceMiddleware:
+
+    def test_adds_server_timing_header(self, client):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='itemey')
+        response = client.get('/lists/{}/'.format(list_.id))
+        timings = parse_server_timing(response['Server-Timing'])
+        assert set(timings) == {'total', 'db', 'render'}
+        assert timings['total'] >= timings['render']
+        assert 'queries"' in response['Server-Timing']
+
+    def test_records_samples_per_view(self, client):
+        list_ = List.objects.create()
+        client.get('/')
+        client.get('/lists/{}/'.format(list_.id))
+        client.get('/lists/{}/'.format(list_.id))
+        views = perf.snapshot()['views']
+        assert views['home']['count'] == 1
+        assert views['view_list']['count'] == 2
+        samples = views['view_list']['samples']
+        assert samples['queries'][0] >= 1
+        assert samples['render_ms'][0] > 0
+        assert samples['size_bytes'][0] > 0
+
+    def test_unsampled_requests_are_not_timed(self, client, settings):
+        settings.LISTS_PERF_SAMPLE_RATE = 0
+        response = client.get('/')
+        assert not response.has_header('Server-Timing')
+        assert perf.snapshot()['views'] == {}
+
+    def test_does_not_leave_query_logging_on(self, client):
+        client.get('/lists/{}/'.format(List.objects.create().id))
+        assert not connection.force_debug_cursor
+        assert len(connection.queries_log) == 0
+
+    def test_counts_queries_once_the_query_log_is_full(self):
+        connection.queries_log.extend(
+            {'sql': 'SELECT 1', 'time': '0.000'} for _ in range(connection.queries_limit))
+        try:
+            timer = RequestTimer()
+            List.objects.count()
+            List.objects.count()
+            assert timer.finish(HttpResponse())['queries'] == 2
+            assert len(connection.queries_log) == connection.queries_limit - 2
+        finally:
+            connection.queries_log.clear()
+
+    def test_wraps_template_render_once(self):
+        PerformanceMiddleware()
+        PerformanceMiddleware()
+        assert Template.render is _timed_template_render
+
+
+@pytest.mark.django_db
+def test_perfstats_reports_dumped_snapshots(client, settings, tmpdir, capsys):
+    settings.LISTS_PERF_DUMP_DIR = str(tmpdir)
+    settings.LISTS_PERF_DUMP_EVERY = 1
+    client.get('/')
+    call_command('perfstats')
+    out = capsys.readouterr().out
+    assert 'home (1 requests)' in out
+    assert 'total_ms' in out
+    assert 'p99=' in out
+
+
+def test_histogram_buckets():
+    assert perf.histogram([0.5, 1.5, 3, 10000], bounds=(1, 2, 5)) == [1, 1, 1, 1]
+
+
+@pytest.fixture
+def reads(monkeypatch, settings):
+    """Aliases the router picked for each read; the test database answers
+    them all, standing in for the replica."""
+    settings.LISTS_REPLICAS = ['replica']
+    settings.LISTS_REPLICA_PIN_SECONDS = 7
+    picked = []
+    db_for_read = ReplicaRouter.db_for_read
+
+    def recording_db_for_read(self, model, **hints):
+        picked.append(db_for_read(self, model, **hints))
+        return DEFAULT_DB_ALIAS
+
+    monkeypatch.setattr(ReplicaRouter, 'db_for_read', recording_db_for_read)
+    return picked
+
+
+@pytest.mark.django_db
+class TestReplicaMiddleware:
+
+    def test_get_reads_from_a_replica(self, client, reads):
+        list_ = List.objects.create()
+        reads.clear()
+        client.get('/lists/{}/'.format(list_.id))
+        assert reads and set(reads) == {'replica'}
+
+    def test_post_reads_from_the_primary_and_pins_the_client(self, client, reads):
+        list_ = List.objects.create()
+        reads.clear()
+        response = client.post('/lists/{}/'.format(list_.id), data={'text': 'new'})
+        assert reads and set(reads) == {DEFAULT_DB_ALIAS}
+        assert response.cookies[PRIMARY_COOKIE]['max-age'] == 7
+
+    def test_rejected_post_does_not_pin_the_client(self, client, reads):
+        list_ = List.objects.create()
+        response = client.post('/lists/{}/'.format(list_.id), data={'text': ''},
+                               HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        assert response.status_code == 400
+        assert PRIMARY_COOKIE not in response.cookies
+
+    def test_pinned_client_reads_its_writes_from_the_primary(self, client, reads):
+        response = client.post('/lists/new', data={'text': 'new'}, follow=True)
+        assert 'new' in response.content.decode()
+        reads.clear()
+        client.get(response.redirect_chain[-1][0])
+        assert reads and set(reads) == {DEFAULT_DB_ALIAS}
+
+    def test_reads_after_the_response_go_to_the_primary(self, client, reads):
+        client.get('/')
+        assert ReplicaRouter().db_for_read(List) == DEFAULT_DB_ALIAS
+
+    def test_does_nothing_without_replicas(self, client, settings):
+        settings.LISTS_REPLICAS = []
+        list_ = List.objects.create()
+        response = client.post('/lists/{}/'.format(list_.id), data={'text': 'new'})
+        assert PRIMARY_COOKIE not in response.cookies
+
+
+@pytest.fixture
+def rate_limits(settings):
+    settings.LISTS_RATE_LIMIT_CLIENT = (1.0, 2)
+    settings.LISTS_RATE_LIMIT_LIST = (1.0, 3)
+    settings.LISTS_RATE_LIMIT_FILE = None
+
+
+@pytest.mark.django_db
+class TestRateLimitMiddleware:
+
+    def test_client_over_its_limit_gets_a_429_without_queries(
+            self, client, rate_limits, django_assert_num_queries):
+        for n in range(2):
+            assert client.post('/lists/new', data={'text': str(n)}).status_code == 302
+        with django_assert_num_queries(0):
+            response = client.post('/lists/new', data={'text': 'one too many'})
+        assert response.status_code == 429
+        assert response['Retry-After'] == '1'
+        assert List.objects.count() == 2
+
+    def test_clients_have_their_own_buckets(self, client, rate_limits):
+        for n in range(2):
+            client.post('/lists/new', data={'text': str(n)})
+        response = client.post('/lists/new', data={'text': 'b'}, REMOTE_ADDR='10.0.0.2')
+        assert response.status_code == 302
+
+    def test_list_has_a_limit_across_clients(self, client, rate_limits):
+        list_ = List.objects.create()
+        url = '/lists/{}/'.format(list_.id)
+        statuses = [
+            client.post(url, data={'text': str(n)}, REMOTE_ADDR='10.0.0.{}'.format(n)).status_code
+            for n in range(4)
+        ]
+        assert statuses == [302, 302, 302, 429]
+        assert Item.objects.filter(list=list_).count() == 3
+
+    def test_posts_turned_away_by_the_list_cost_the_client_nothing(
+            self, client, rate_limits, settings):
+        settings.LISTS_RATE_LIMIT_LIST = (0.01, 1)
+        list_ = List.objects.create()
+        url = '/lists/{}/'.format(list_.id)
+        assert client.post(url, data={'text': 'first'}).status_code == 302
+        for n in range(3):
+            assert client.post(url, data={'text': str(n)}).status_code == 429
+        # The client still has the second token of its burst.
+        assert client.post('/lists/new', data={'text': 'elsewhere'}).status_code == 302
+
+    def test_reads_are_not_limited(self, client, rate_limits):
+        list_ = List.objects.create()
+        for _ in range(4):
+            assert client.get('/lists/{}/'.format(list_.id)).status_code == 200
+
+    def test_no_limits_by_default(self, client):
+        for n in range(5):
+            assert client.post('/lists/new', data={'text': str(n)}).status_code == 302
@@ -1,7 +1,8 @@
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 import pytest
 
-from lists.models import Item, List
+from lists.models import Item, List, hash_text
 
 
 @pytest.mark.django_db
@@ -46,6 +47,27 @@ class TestItemModel:
         item3 = Item.objects.create(text='item 3', list=list_)
         assert list(Item.objects.all()) == [item1, item2, item3]
 
+    def test_save_stores_hash_of_text(self):
+        list_ = List.objects.create()
+        item = Item.objects.create(text='some text', list=list_)
+        assert item.text_hash == hash_text('some text')
+        assert len(item.text_hash) == 40
+
+    def test_editing_text_updates_hash(self):
+        list_ = List.objects.create()
+        item = Item.objects.create(text='before', list=list_)
+        item.text = 'after'
+        item.save()
+        assert Item.objects.get(id=item.id).text_hash == hash_text('after')
+
+    def test_database_rejects_duplicate_hash_in_a_list(self):
+        list_ = List.objects.create()
+        Item.objects.create(text='First', list=list_)
+        with pytest.raises(IntegrityError):
+            Item.objects.bulk_create([
+                Item(text='First', text_hash=hash_text('First'), list=list_)
+            ])
+
     def test_string_representation(self):
         item = Item(text='some text')
         assert str(item) == 'some text'
@@ -57,4 +79,33 @@ class TestListModel:
     def test_get_absolute_url(self):
         list_ = List.objects.create()
         expected_url = '/lists/{}/'.format(list_.id)
-        assert list_.get_absolute_url() == expected_url
\ No newline at end of file
+        assert list_.get_absolute_url() == expected_url
+
+    def test_new_list_has_no_items(self):
+        list_ = List.objects.create()
+        assert list_.item_count == 0
+        assert list_.updated_at is not None
+
+    def test_record_new_items_updates_counter_and_timestamp(self):
+        list_ = List.objects.create()
+        created = list_.updated_at
+        list_.record_new_items(3)
+        stored = List.objects.get(id=list_.id)
+        assert stored.item_count == 3
+        assert stored.updated_at > created
+        assert list_.item_count == 3
+
+    def test_record_new_items_adds_to_stored_count(self):
+        list_ = List.objects.create()
+        stale_copy = List.objects.get(id=list_.id)
+        list_.record_new_items(1)
+        stale_copy.record_new_items(1)
+        assert List.objects.get(id=list_.id).item_count == 2
+        assert stale_copy.item_count == 2
+
+    def test_record_new_items_without_update_returning(self, monkeypatch):
+        monkeypatch.setattr('lists.models._has_update_returning', lambda connection: False)
+        list_ = List.objects.create()
+        List.objects.get(id=list_.id).record_new_items(1)
+        list_.record_new_items(2)
+        assert list_.item_count == 3
@@ -0,0 +1,89 @@
+import pytest
+
+from lists.models import Item, List
+from lists.pagination import (PageCursor, get_item_page, iter_item_chunks,
+                              parse_cursor, parse_page_cursor, stream_table_rows)
+
+
+@pytest.fixture
+def list_with_items():
+    list_ = List.objects.create()
+    for n in range(1, 6):
+        Item.objects.create(list=list_, text='item {}'.format(n))
+    return list_
+
+
+def test_parse_cursor_ignores_junk():
+    assert parse_cursor('12') == 12
+    assert parse_cursor('abc') is None
+    assert parse_cursor('-3') is None
+    assert parse_cursor(None) is None
+
+
+def test_parse_page_cursor():
+    assert parse_page_cursor(str(PageCursor(12, 40))) == PageCursor(12, 40)
+    assert str(PageCursor(12, 40)).startswith('12-40-')
+    assert parse_page_cursor('12') == PageCursor(12, None)
+    assert parse_page_cursor('x-40') is None
+    assert parse_page_cursor(None) is None
+
+
+def test_offsets_that_arent_signed_are_dropped():
+    signature = str(PageCursor(12, 40)).rsplit('-', 1)[1]
+    assert parse_page_cursor('12-40') == PageCursor(12, None)
+    assert parse_page_cursor('12-3-{}'.format(signature)) == PageCursor(12, None)
+    assert parse_page_cursor('13-40-{}'.format(signature)) == PageCursor(13, None)
+
+
+@pytest.mark.django_db
+class TestItemPage:
+
+    def test_first_page(self, list_with_items):
+        page = get_item_page(list_with_items, size=2)
+        assert [item.text for item in page.items] == ['item 1', 'item 2']
+        assert page.offset == 0
+        assert page.next_cursor == PageCursor(page.items[-1].id, 2)
+
+    def test_following_page_knows_its_offset(self, list_with_items):
+        first = get_item_page(list_with_items, size=2)
+        second = get_item_page(list_with_items, first.next_cursor, size=2)
+        assert [item.text for item in second.items] == ['item 3', 'item 4']
+        assert second.offset == 2
+        assert second.next_cursor.offset == 4
+
+    def test_cursor_without_offset_counts_the_rows_before_it(self, list_with_items):
+        first = get_item_page(list_with_items, size=2)
+        second = get_item_page(
+            list_with_items, PageCursor(first.next_cursor.after, None), size=2)
+        assert second.offset == 2
+
+    def test_last_page_has_no_next_cursor(self, list_with_items):
+        first = get_item_page(list_with_items, size=3)
+        last = get_item_page(list_with_items, first.next_cursor, size=3)
+        assert [item.text for item in last.items] == ['item 4', 'item 5']
+        assert last.next_cursor is None
+
+    def test_exactly_full_page_has_no_next_cursor(self, list_with_items):
+        assert get_item_page(list_with_items, size=5).next_cursor is None
+
+
+@pytest.mark.django_db
+class TestStreaming:
+
+    def test_chunks_cover_all_items_in_order(self, list_with_items):
+        chunks = list(iter_item_chunks(list_with_items, chunk_size=2))
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert [item.text for chunk in chunks for item in chunk] == [
+            'item {}'.format(n) for n in range(1, 6)
+        ]
+
+    def test_rows_are_numbered_across_chunks(self, list_with_items):
+        rows = ''.join(stream_table_rows(list_with_items, chunk_size=2))
+        assert '<tr><td>3: item 3</td></tr>' in rows
+        assert '<tr><td>5: item 5</td></tr>' in rows
+
+    def test_rows_are_escaped(self):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='<b>bold</b>')
+        rows = ''.join(stream_table_rows(list_))
+        assert '&lt;b&gt;bold&lt;/b&gt;' in rows
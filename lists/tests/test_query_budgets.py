@@ -0,0 +1,79 @@
+import pytest
+
+from lists.forms import BulkItemForm
+from lists.models import List
+
+pytestmark = [pytest.mark.django_db, pytest.mark.query_budget]
+
+# Across the first page boundary (LISTS_PAGE_SIZE is 100), so queries that
+# grow with the list show up as a budget overrun.
+LIST_SIZES = [0, 1, 150]
+
+
+@pytest.fixture(params=LIST_SIZES)
+def list_(request):
+    list_ = List.objects.create()
+    BulkItemForm(for_list=list_, texts=[
+        'item {}'.format(n) for n in range(request.param)]).save()
+    return list_
+
+
+@pytest.fixture
+def csrf_client(client):
+    # With the CSRF cookie set, the pages also compute their ETags.
+    client.get('/')
+    return client
+
+
+def test_home_page(csrf_client, query_budget):
+    with query_budget('home_page'):
+        csrf_client.get('/')
+
+
+def test_new_list(client, query_budget):
+    with query_budget('new_list'):
+        client.post('/lists/new', data={'text': 'A new list item'})
+
+
+def test_new_list_with_invalid_item(client, query_budget):
+    with query_budget('new_list invalid'):
+        client.post('/lists/new', data={'text': ''})
+
+
+def test_view_list(csrf_client, list_, query_budget):
+    with query_budget('view_list'):
+        csrf_client.get(list_.get_absolute_url())
+
+
+def test_view_list_revalidated(csrf_client, list_, query_budget):
+    etag = csrf_client.get(list_.get_absolute_url())['ETag']
+    with query_budget('view_list not modified'):
+        response = csrf_client.get(list_.get_absolute_url(), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+
+def test_view_list_later_page(csrf_client, list_, query_budget):
+    with query_budget('view_list later page'):
+        csrf_client.get(list_.get_absolute_url() + '?after=1')
+
+
+def test_view_list_streamed(csrf_client, list_, query_budget):
+    with query_budget('view_list streamed'):
+        response = csrf_client.get(list_.get_absolute_url() + '?stream=1')
+        b''.join(response.streaming_content)
+
+
+def test_add_item(client, list_, query_budget):
+    with query_budget('view_list add item'):
+        client.post(list_.get_absolute_url(), data={'text': 'new item'})
+
+
+def test_add_duplicate_item(client, list_, query_budget):
+    client.post(list_.get_absolute_url(), data={'text': 'twice'})
+    with query_budget('view_list duplicate item'):
+        client.post(list_.get_absolute_url(), data={'text': 'twice'})
+
+
+def test_api_list_detail(client, list_, query_budget):
+    with query_budget('api list_detail'):
+        client.get('/api/lists/{}/'.format(list_.id))
@@ -0,0 +1,85 @@
+import os
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+import pytest
+
+from lists.ratelimit import TokenBuckets
+
+
+def test_bucket_allows_a_burst_then_refills():
+    buckets = TokenBuckets()
+    assert [buckets.take('client', 'a', 1.0, 3, now=100) for _ in range(3)] == [0, 0, 0]
+    assert buckets.take('client', 'a', 1.0, 3, now=100) == pytest.approx(1.0)
+    assert buckets.take('client', 'a', 1.0, 3, now=100.5) == pytest.approx(0.5)
+    assert buckets.take('client', 'a', 1.0, 3, now=101) == 0
+    assert buckets.take('client', 'b', 1.0, 3, now=101) == 0
+
+
+def test_take_all_takes_nothing_unless_every_bucket_has_a_token():
+    buckets = TokenBuckets()
+    limits = [('client', 'a', 1.0, 3), ('list', '7', 1.0, 1)]
+    assert buckets.take_all(limits, now=100) == 0
+    assert buckets.take_all(limits, now=100) == pytest.approx(1.0)
+    assert buckets.take_all(limits, now=100) == pytest.approx(1.0)
+    # Two of the client's three tokens are left.
+    assert buckets.take('client', 'a', 1.0, 3, now=100) == 0
+    assert buckets.take('client', 'a', 1.0, 3, now=100) == 0
+    assert buckets.take('client', 'a', 1.0, 3, now=100) > 0
+    rules = buckets.stats()['rules']
+    assert rules['list'] == {'allowed': 1, 'throttled': 2}
+    assert rules['client'] == {'allowed': 3, 'throttled': 1}
+
+
+def test_stats_count_what_was_throttled():
+    buckets = TokenBuckets()
+    for _ in range(3):
+        buckets.take('client', '10.0.0.1', 1.0, 1, now=100)
+    buckets.take('list', '7', 1.0, 1, now=100)
+    stats = buckets.stats()
+    assert stats['rules'] == {
+        'client': {'allowed': 1, 'throttled': 2},
+        'list': {'allowed': 1, 'throttled': 0},
+    }
+    assert stats['keys'] == [('client:10.0.0.1', 2, pytest.approx(0.0))]
+
+
+def test_idle_buckets_make_way_when_the_table_is_full():
+    buckets = TokenBuckets(slot_count=2)
+    buckets.take('client', 'a', 0.01, 1, now=100)
+    buckets.take('client', 'b', 0.01, 1, now=101)
+    buckets.take('client', 'c', 0.01, 1, now=102)
+    # 'a' was idle longest, so 'c' took its slot and it starts afresh.
+    assert buckets.take('client', 'b', 0.01, 1, now=102) > 0
+    assert buckets.take('client', 'a', 0.01, 1, now=102) == 0
+
+
+def test_processes_share_buckets_through_the_file(tmpdir):
+    path = str(tmpdir.join('ratelimit', 'buckets'))
+    TokenBuckets(path).take('client', 'a', 1.0, 1, now=100)
+    pid = os.fork()
+    if pid == 0:
+        # A worker forked from the parent, then another process opening it.
+        wait = TokenBuckets(path).take('client', 'a', 1.0, 1, now=100)
+        os._exit(0 if wait else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+    assert TokenBuckets(path).stats()['rules']['client'] == {'allowed': 1, 'throttled': 1}
+
+
+def test_ratelimitstats(settings, tmpdir, capsys):
+    settings.LISTS_RATE_LIMIT_FILE = str(tmpdir.join('buckets'))
+    buckets = TokenBuckets(settings.LISTS_RATE_LIMIT_FILE)
+    buckets.take('client', '10.0.0.1', 1.0, 1, now=100)
+    buckets.take('client', '10.0.0.1', 1.0, 1, now=100)
+    call_command('ratelimitstats')
+    out = capsys.readouterr().out
+    assert 'client: 1 allowed, 1 throttled' in out
+    assert 'client:10.0.0.1  throttled 1 times' in out
+    call_command('ratelimitstats', reset=True)
+    assert buckets.stats()['rules']['client'] == {'allowed': 0, 'throttled': 0}
+
+
+def test_ratelimitstats_needs_the_file(settings):
+    settings.LISTS_RATE_LIMIT_FILE = None
+    with pytest.raises(CommandError):
+        call_command('ratelimitstats')
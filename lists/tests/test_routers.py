@@ -0,0 +1,37 @@
+from django.db import DEFAULT_DB_ALIAS
+import pytest
+
+from lists import routers
+from lists.models import Item, List
+from lists.routers import ReplicaRouter
+
+
+@pytest.fixture(autouse=True)
+def reset_routing():
+    routers.read_from(None)
+    yield
+    routers.read_from(None)
+
+
+def test_reads_and_writes_go_to_the_primary_by_default():
+    router = ReplicaRouter()
+    assert router.db_for_read(List) == DEFAULT_DB_ALIAS
+    assert router.db_for_write(List) == DEFAULT_DB_ALIAS
+
+
+def test_reads_go_to_the_chosen_replica():
+    routers.read_from('replica')
+    assert ReplicaRouter().db_for_read(Item) == 'replica'
+    assert ReplicaRouter().db_for_write(Item) == DEFAULT_DB_ALIAS
+
+
+def test_reads_go_back_to_the_primary():
+    routers.read_from('replica')
+    routers.read_from(None)
+    assert ReplicaRouter().db_for_read(List) == DEFAULT_DB_ALIAS
+
+
+def test_only_the_primary_is_migrated():
+    router = ReplicaRouter()
+    assert router.allow_migrate(DEFAULT_DB_ALIAS, 'lists')
+    assert not router.allow_migrate('replica', 'lists')
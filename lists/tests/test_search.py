@@ -0,0 +1,76 @@
+import json
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+import pytest
+
+from lists.forms import BulkItemForm, ItemForm
+from lists.models import Item, List
+from lists.search import get_search_index, parse_query, scan_items
+
+
+def search(client, **params):
+    response = client.get('/api/lists/search', params)
+    return [(item['list'], item['text'])
+            for item in json.loads(response.content.decode('utf-8'))['items']]
+
+
+@pytest.fixture
+def index(settings, tmpdir):
+    settings.LISTS_SEARCH_INDEX = str(tmpdir.join('search.sqlite3'))
+    return get_search_index()
+
+
+def test_queries_are_taken_literally():
+    assert parse_query('buy milk*') == '"buy" "milk"*'
+    assert parse_query('say "NEAR" * -x') == '"say" """NEAR""" "-x"'
+    assert parse_query(' * ') == ''
+
+
+@pytest.mark.django_db
+class TestSearch:
+
+    def test_items_saved_through_the_forms_are_found(self, client, index):
+        list_ = List.objects.create()
+        ItemForm(data={'text': 'Buy peacock feathers'}).save(for_list=list_)
+        BulkItemForm(list_, ['Use feathers to make a fly', 'Go fishing']).save()
+        assert search(client, q='feathers') == [
+            (list_.id, 'Buy peacock feathers'), (list_.id, 'Use feathers to make a fly')]
+        assert search(client, q='fish*') == [(list_.id, 'Go fishing')]
+        assert search(client, q='feathers fly') == [(list_.id, 'Use feathers to make a fly')]
+
+    def test_results_are_ranked(self, client, index):
+        list_ = List.objects.create()
+        for text in ('milk and eggs and bread and butter and jam', 'milk', 'milk milk tea'):
+            ItemForm(data={'text': text}).save(for_list=list_)
+        assert [text for list_id, text in search(client, q='milk')] == [
+            'milk milk tea', 'milk', 'milk and eggs and bread and butter and jam']
+
+    def test_search_within_a_list_and_limit(self, client, index):
+        first, second = List.objects.create(), List.objects.create()
+        for list_ in (first, second, second):
+            ItemForm(data={'text': 'tea {}'.format(list_.item_count)}).save(for_list=list_)
+        assert search(client, q='tea', list=first.id) == [(first.id, 'tea 0')]
+        assert len(search(client, q='tea', limit=2)) == 2
+
+    def test_rebuild_indexes_items_saved_around_the_forms(self, client, index, capsys):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='imported')
+        assert search(client, q='imported') == []
+        call_command('rebuild_search_index')
+        assert 'Indexed 1 items.' in capsys.readouterr().out
+        assert search(client, q='imported') == [(list_.id, 'imported')]
+
+    def test_without_an_index_items_are_scanned(self, client, settings):
+        settings.LISTS_SEARCH_INDEX = None
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='Scanned item')
+        Item.objects.create(list=list_, text='other')
+        assert search(client, q='scanned ITEM') == [(list_.id, 'Scanned item')]
+        assert scan_items('*', 10) == []
+        with pytest.raises(CommandError):
+            call_command('rebuild_search_index')
+
+    def test_query_is_required(self, client):
+        assert client.get('/api/lists/search').status_code == 400
+        assert client.get('/api/lists/search', {'q': ' '}).status_code == 400
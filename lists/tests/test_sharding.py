@@ -0,0 +1,169 @@
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS
+import pytest
+
+from lists import sharding
+from lists.forms import DUPLICATE_ITEM_ERROR, ExistingListItemForm, ItemForm
+from lists.models import Item, List, ListLocation
+from lists.routers import ShardRouter
+from lists.search import search_items
+
+
+def new_list_on(shard):
+    while True:
+        list_ = List.objects.create()
+        if sharding.shard_for(list_.id) == shard:
+            return list_
+
+
+def on_shard(shard, model, **lookups):
+    return model.objects.using(shard).filter(**lookups).exists()
+
+
+@pytest.mark.django_db
+class TestSharding:
+
+    def test_new_lists_are_placed_by_id(self, shard):
+        lists = [List.objects.create() for _ in range(4)]
+        for list_ in lists:
+            expected = shard if list_.id % 2 else DEFAULT_DB_ALIAS
+            assert ListLocation.objects.get(id=list_.id).shard == expected
+            assert on_shard(expected, List, id=list_.id)
+        assert List.objects.get(id=lists[1].id) == lists[1]
+
+    def test_a_single_shard_leaves_the_directory_alone(self):
+        List.objects.create()
+        assert not ListLocation.objects.exists()
+
+    def test_directory_ids_follow_lists_made_with_a_single_shard(self, shard, settings):
+        settings.LISTS_SHARDS = [DEFAULT_DB_ALIAS]
+        old_ids = [List.objects.create().id for _ in range(3)]
+        settings.LISTS_SHARDS = [DEFAULT_DB_ALIAS, shard]
+        new_list = List.objects.create()
+        assert new_list.id > max(old_ids)
+        assert [sharding.shard_for(list_id) for list_id in old_ids] == [DEFAULT_DB_ALIAS] * 3
+        assert List.objects.get(id=old_ids[0]).id == old_ids[0]
+        sharding.move_list(old_ids[0], shard)
+        assert sharding.shard_for(old_ids[0]) == shard
+        assert List.objects.get(id=old_ids[0]).id == old_ids[0]
+
+    def test_placement_is_pluggable(self, shard, settings):
+        settings.LISTS_SHARD_PLACEMENT = 'lists.sharding.place_on_emptiest'
+        shards = [sharding.shard_for(List.objects.create().id) for _ in range(4)]
+        assert sorted(shards) == [DEFAULT_DB_ALIAS] * 2 + [shard] * 2
+
+    def test_items_are_saved_and_validated_on_the_lists_shard(self, shard):
+        list_ = new_list_on(shard)
+        ItemForm(data={'text': 'sharded'}).save(for_list=list_)
+        assert on_shard(shard, Item, list_id=list_.id, text='sharded')
+        assert not on_shard(DEFAULT_DB_ALIAS, Item, list_id=list_.id)
+        assert List.objects.get(id=list_.id).item_count == 1
+        form = ExistingListItemForm(for_list=list_, data={'text': 'sharded'})
+        assert not form.is_valid()
+        assert form.errors['text'] == [DUPLICATE_ITEM_ERROR]
+
+    def test_item_ids_come_from_the_shards_range(self, shard):
+        list_ = new_list_on(shard)
+        item = ItemForm(data={'text': 'ranged'}).save(for_list=list_)
+        assert item.id > sharding.SHARD_ID_RANGE
+
+    def test_views_find_the_list_on_its_shard(self, client, shard):
+        response = client.post('/lists/new', data={'text': 'first'})
+        while sharding.shard_for(ListLocation.objects.latest('id').id) != shard:
+            response = client.post('/lists/new', data={'text': 'first'})
+        list_url = response['Location']
+        client.post(list_url, data={'text': 'second'})
+        content = client.get(list_url).content.decode()
+        assert '1: first' in content
+        assert '2: second' in content
+
+    def test_move_list_keeps_items_in_order(self, shard):
+        list_ = new_list_on(DEFAULT_DB_ALIAS)
+        for text in 'ab':
+            ItemForm(data={'text': text}).save(for_list=list_)
+        assert sharding.move_list(list_.id, shard) == 2
+        assert sharding.shard_for(list_.id) == shard
+        assert not on_shard(DEFAULT_DB_ALIAS, List, id=list_.id)
+        assert not on_shard(DEFAULT_DB_ALIAS, Item, list_id=list_.id)
+        moved = List.objects.get(id=list_.id)
+        assert moved.item_count == 2
+        ItemForm(data={'text': 'c'}).save(for_list=moved)
+        assert list(moved.item_set.values_list('text', flat=True)) == ['a', 'b', 'c']
+        assert all(item_id > sharding.SHARD_ID_RANGE
+                   for item_id in moved.item_set.values_list('id', flat=True))
+
+    def test_items_made_after_a_move_down_keep_distinct_ids(self, shard):
+        list_ = new_list_on(shard)
+        ItemForm(data={'text': 'moved'}).save(for_list=list_)
+        sharding.move_list(list_.id, DEFAULT_DB_ALIAS)
+        staying = new_list_on(shard)
+        new_ids = [
+            ItemForm(data={'text': 'new'}).save(for_list=list_).id,
+            ItemForm(data={'text': 'new'}).save(for_list=staying).id,
+        ]
+        ids = list(Item.objects.using(DEFAULT_DB_ALIAS).values_list('id', flat=True))
+        ids += Item.objects.using(shard).values_list('id', flat=True)
+        assert len(set(ids)) == len(ids) == 3
+        assert new_ids[0] < sharding.SHARD_ID_RANGE < new_ids[1]
+        other = new_list_on(shard)
+        ItemForm(data={'text': 'other'}).save(for_list=other)
+        assert sharding.move_list(other.id, DEFAULT_DB_ALIAS) == 1
+
+    def test_move_list_reindexes_its_items(self, shard, settings, tmpdir):
+        settings.LISTS_SEARCH_INDEX = str(tmpdir.join('search.sqlite3'))
+        list_ = new_list_on(shard)
+        ItemForm(data={'text': 'zeppelin one'}).save(for_list=list_)
+        sharding.move_list(list_.id, DEFAULT_DB_ALIAS)
+        ItemForm(data={'text': 'zeppelin two'}).save(for_list=new_list_on(shard))
+        item = Item.objects.get(list_id=list_.id)
+        assert (item.id, list_.id, 'zeppelin one') in search_items('zeppelin', 10)
+        assert len(search_items('zeppelin', 10)) == 2
+
+
+@pytest.mark.django_db
+class TestRebalanceLists:
+
+    def test_evens_out_item_counts(self, shard, settings, capsys):
+        settings.LISTS_SHARDS = [DEFAULT_DB_ALIAS]
+        for size in (1, 2, 3, 4):
+            list_ = List.objects.create()
+            for n in range(size):
+                ItemForm(data={'text': str(n)}).save(for_list=list_)
+        settings.LISTS_SHARDS = [DEFAULT_DB_ALIAS, shard]
+        call_command('rebalance_lists')
+        assert 'Moved list' in capsys.readouterr().out
+        totals = [sum(List.objects.using(alias).values_list('item_count', flat=True))
+                  for alias in (DEFAULT_DB_ALIAS, shard)]
+        assert totals == [5, 5]
+        call_command('rebalance_lists')
+        assert 'The shards are balanced.' in capsys.readouterr().out
+
+    def test_dry_run_moves_nothing(self, shard, settings, capsys):
+        settings.LISTS_SHARDS = [DEFAULT_DB_ALIAS]
+        list_ = List.objects.create()
+        ItemForm(data={'text': 'a'}).save(for_list=list_)
+        ItemForm(data={'text': 'b'}).save(for_list=list_)
+        other = List.objects.create()
+        settings.LISTS_SHARDS = [DEFAULT_DB_ALIAS, shard]
+        call_command('rebalance_lists', list_id=other.id, to=shard, dry_run=True)
+        assert 'Would move list {} to shard1.'.format(other.id) in capsys.readouterr().out
+        assert sharding.shard_for(other.id) == DEFAULT_DB_ALIAS
+
+    def test_drains_databases_that_are_no_longer_shards(self, shard, settings):
+        list_ = new_list_on(shard)
+        settings.LISTS_SHARDS = [DEFAULT_DB_ALIAS]
+        sharding._cache().clear()
+        call_command('rebalance_lists')
+        settings.LISTS_SHARDS = [DEFAULT_DB_ALIAS, shard]
+        assert sharding.shard_for(list_.id) == DEFAULT_DB_ALIAS
+        assert on_shard(DEFAULT_DB_ALIAS, List, id=list_.id)
+        assert not on_shard(shard, List, id=list_.id)
+
+
+def test_router_keeps_the_directory_and_other_apps_off_the_shards(settings):
+    settings.LISTS_SHARDS = [DEFAULT_DB_ALIAS, 'shard1']
+    router = ShardRouter()
+    assert router.allow_migrate('shard1', 'lists', model_name='item')
+    assert not router.allow_migrate('shard1', 'lists', model_name='listlocation')
+    assert not router.allow_migrate('shard1', 'auth', model_name='user')
+    assert router.allow_migrate(DEFAULT_DB_ALIAS, 'lists', model_name='listlocation')
@@ -0,0 +1,72 @@
+import os
+import re
+
+from django.core.management import call_command
+import pytest
+
+from lists.assets import static_url
+from lists.conditional import TEMPLATE_DIR, _page_mtimes
+
+STATIC_TAG_RE = re.compile(r'{%\s*static\s+"([^"]+)"\s*%}')
+HASHED_RE = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+
+
+def template_static_paths():
+    paths = set()
+    for name in os.listdir(TEMPLATE_DIR):
+        with open(os.path.join(TEMPLATE_DIR, name)) as f:
+            paths.update(STATIC_TAG_RE.findall(f.read()))
+    return paths
+
+
+@pytest.fixture(scope='module')
+def collected(tmpdir_factory):
+    return str(tmpdir_factory.mktemp('static'))
+
+
+@pytest.fixture
+def static_root(settings, collected):
+    settings.STATIC_ROOT = collected
+    settings.STATICFILES_STORAGE = 'lists.storage.CompressedManifestStaticFilesStorage'
+    if not os.path.exists(os.path.join(collected, 'staticfiles.json')):
+        call_command('collectstatic', interactive=False, verbosity=0)
+    return collected
+
+
+def test_templates_reference_assets_only_through_static_tag():
+    for name in os.listdir(TEMPLATE_DIR):
+        with open(os.path.join(TEMPLATE_DIR, name)) as f:
+            content = f.read()
+        assert 'src="/static' not in content
+        assert 'href="/static' not in content
+        assert 'src="http' not in content, '{} loads a script from the network'.format(name)
+
+
+def test_every_template_reference_resolves_to_a_hashed_asset(static_root):
+    paths = template_static_paths()
+    assert 'jquery/jquery.min.js' in paths
+    for path in paths:
+        url = static_url(path)
+        assert HASHED_RE.search(url), url
+        assert os.path.exists(os.path.join(static_root, url[len('/static/'):]))
+
+
+def test_hashed_text_assets_have_gzip_variants(static_root):
+    for path in template_static_paths():
+        hashed = os.path.join(static_root, static_url(path)[len('/static/'):])
+        # Tiny files don't shrink and are left uncompressed.
+        if os.path.getsize(hashed) > 1024:
+            assert os.path.exists(hashed + '.gz'), hashed
+
+
+def test_rendered_page_links_hashed_assets(client, static_root):
+    content = client.get('/').content.decode()
+    urls = re.findall(r'(?:src|href)="(/static/[^"]+)"', content)
+    assert len(urls) == 4
+    for url in urls:
+        assert HASHED_RE.search(url), url
+
+
+def test_page_versions_follow_the_static_manifest(static_root):
+    manifest = os.path.join(static_root, 'staticfiles.json')
+    assert manifest in dict(_page_mtimes())
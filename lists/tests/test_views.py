@@ -1,9 +1,13 @@
+import json
+import re
+
 from django.utils.html import escape
 import pytest
 
 from lists.models import Item, List
 from lists.forms import (DUPLICATE_ITEM_ERROR, EMPTY_ITEM_ERROR,
                          ExistingListItemForm, ItemForm)
+from lists.pagination import PageCursor
 
 
 class TestHomePage:
@@ -50,6 +54,28 @@ class TestNewList:
         response = client.post('/lists/new', data={'text': ''})
         assert isinstance(response.context['form'], ItemForm)
 
+    def test_ajax_POST_returns_first_row_and_list_location(self, client):
+        response = client.post(
+            '/lists/new',
+            data={'text': 'A new list item'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        new_list = List.objects.first()
+        assert response.status_code == 201
+        assert response['Location'] == '/lists/{}/'.format(new_list.id)
+        assert response.content.decode() == '<tr><td>1: A new list item</td></tr>'
+
+    def test_ajax_POST_of_empty_input_returns_json_errors(self, client):
+        response = client.post(
+            '/lists/new', data={'text': ''},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        assert response.status_code == 400
+        assert json.loads(response.content.decode()) == {
+            'errors': [EMPTY_ITEM_ERROR]
+        }
+        assert List.objects.count() == 0
+
     def test_invalid_list_items_are_not_saved(self, client):
         client.post('/lists/new', data={'text': ''})
         assert List.objects.count() == 0
@@ -139,9 +165,244 @@ class TestListView:
         assert 'list.html' in response.templates[0].name
         assert Item.objects.all().count() == 1
 
+    def test_ajax_POST_returns_new_row_instead_of_redirect(self, client):
+        list_ = List.objects.create()
+        Item.objects.create(text='First', list=list_)
+        list_.record_new_items(1)
+        response = client.post(
+            '/lists/{}/'.format(list_.id),
+            data={'text': 'Second & last'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        assert response.status_code == 201
+        assert response['Location'] == '/lists/{}/'.format(list_.id)
+        assert response.content.decode() == '<tr><td>2: Second &amp; last</td></tr>'
+        assert Item.objects.count() == 2
+
+    def test_ajax_POST_numbers_the_row_after_items_added_meanwhile(self, client, monkeypatch):
+        list_ = List.objects.create()
+        original_is_valid = ExistingListItemForm.is_valid
+
+        def is_valid_while_another_item_is_added(form):
+            Item.objects.create(text='Meanwhile', list=list_)
+            List.objects.get(id=list_.id).record_new_items(1)
+            return original_is_valid(form)
+
+        monkeypatch.setattr(ExistingListItemForm, 'is_valid', is_valid_while_another_item_is_added)
+        response = client.post(
+            '/lists/{}/'.format(list_.id),
+            data={'text': 'Mine'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        assert response.content.decode() == '<tr><td>2: Mine</td></tr>'
+
+    def test_ajax_POST_of_duplicate_returns_json_errors(self, client):
+        list_ = List.objects.create()
+        Item.objects.create(text='sametext', list=list_)
+        response = client.post(
+            '/lists/{}/'.format(list_.id),
+            data={'text': 'sametext'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        assert response.status_code == 400
+        assert json.loads(response.content.decode()) == {
+            'errors': [DUPLICATE_ITEM_ERROR]
+        }
+
     def test_displays_item_form(self, client):
         list_ = List.objects.create()
         response = client.get('/lists/{}/'.format(list_.id))
         assert isinstance(response.context['form'], ExistingListItemForm)
         assert b'name="text"' in response.content
 
+
+@pytest.mark.django_db
+class TestBulkItems:
+
+    def test_newline_delimited_batch_is_saved(self, client):
+        list_ = List.objects.create()
+        response = client.post(
+            '/lists/{}/items/bulk'.format(list_.id),
+            data='first\nsecond\n',
+            content_type='text/plain'
+        )
+        assert response.status_code == 201
+        assert json.loads(response.content.decode()) == {'created': 2, 'errors': []}
+        assert [item.text for item in list_.item_set.all()] == ['first', 'second']
+
+    def test_json_batch_is_saved(self, client):
+        list_ = List.objects.create()
+        response = client.post(
+            '/lists/{}/items/bulk'.format(list_.id),
+            data=json.dumps(['first', 'second']),
+            content_type='application/json'
+        )
+        assert response.status_code == 201
+        assert list_.item_set.count() == 2
+
+    def test_invalid_items_are_reported_and_valid_ones_saved(self, client):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='old')
+        response = client.post(
+            '/lists/{}/items/bulk'.format(list_.id),
+            data=json.dumps(['old', '', 'new']),
+            content_type='application/json'
+        )
+        payload = json.loads(response.content.decode())
+        assert payload['created'] == 1
+        assert [error['error'] for error in payload['errors']] == [
+            DUPLICATE_ITEM_ERROR, EMPTY_ITEM_ERROR
+        ]
+        assert list_.item_set.count() == 2
+
+    def test_batch_with_nothing_to_save_is_a_bad_request(self, client):
+        list_ = List.objects.create()
+        response = client.post(
+            '/lists/{}/items/bulk'.format(list_.id),
+            data=json.dumps(['']),
+            content_type='application/json'
+        )
+        assert response.status_code == 400
+        assert Item.objects.count() == 0
+
+    def test_malformed_json_is_a_bad_request(self, client):
+        list_ = List.objects.create()
+        response = client.post(
+            '/lists/{}/items/bulk'.format(list_.id),
+            data='{"text": "not a list"}',
+            content_type='application/json'
+        )
+        assert response.status_code == 400
+
+    def test_only_accepts_POST(self, client):
+        list_ = List.objects.create()
+        response = client.get('/lists/{}/items/bulk'.format(list_.id))
+        assert response.status_code == 405
+
+    def test_missing_list_is_404(self, client):
+        response = client.post(
+            '/lists/999/items/bulk', data='first', content_type='text/plain')
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+
+    @pytest.fixture()
+    def client(self, client):
+        client.cookies['csrftoken'] = 'a' * 32
+        return client
+
+    def test_home_page_answers_matching_etag_with_304(self, client):
+        etag = client.get('/')['ETag']
+        response = client.get('/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response.content == b''
+
+    def test_home_page_etag_depends_on_csrf_cookie(self, client):
+        etag = client.get('/')['ETag']
+        client.cookies['csrftoken'] = 'b' * 32
+        response = client.get('/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+
+    def test_no_etag_without_csrf_cookie(self, client):
+        del client.cookies['csrftoken']
+        assert not client.get('/').has_header('ETag')
+
+    def test_list_page_answers_matching_etag_with_304_before_rendering(
+            self, client, django_assert_num_queries):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='itemey 1')
+        url = '/lists/{}/'.format(list_.id)
+        etag = client.get(url)['ETag']
+        with django_assert_num_queries(1):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert set(response['Cache-Control'].split(', ')) == {'no-cache', 'private'}
+
+    def test_new_item_changes_list_etag(self, client):
+        list_ = List.objects.create()
+        url = '/lists/{}/'.format(list_.id)
+        etag = client.get(url)['ETag']
+        client.post(url, data={'text': 'new item'})
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert b'new item' in response.content
+
+    def test_list_page_answers_if_modified_since(self, client):
+        list_ = List.objects.create()
+        url = '/lists/{}/'.format(list_.id)
+        last_modified = client.get(url)['Last-Modified']
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+
+    def test_POST_is_not_conditional(self, client):
+        list_ = List.objects.create()
+        url = '/lists/{}/'.format(list_.id)
+        etag = client.get(url)['ETag']
+        response = client.post(url, data={'text': ''}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert not response.has_header('ETag')
+
+
+@pytest.mark.django_db
+class TestLargeLists:
+
+    @pytest.fixture()
+    def long_list(self, settings):
+        settings.LISTS_PAGE_SIZE = 2
+        settings.LISTS_STREAM_CHUNK_SIZE = 2
+        list_ = List.objects.create()
+        for n in range(1, 6):
+            Item.objects.create(list=list_, text='item {}'.format(n))
+        return list_
+
+    def test_list_page_shows_first_page_and_link_to_next(self, client, long_list):
+        response = client.get('/lists/{}/'.format(long_list.id))
+        content = response.content.decode()
+        assert '2: item 2' in content
+        assert 'item 3' not in content
+        second_id = long_list.item_set.all()[1].id
+        assert '?after={}"'.format(PageCursor(second_id, 2)) in content
+
+    def test_numbering_continues_on_later_pages_without_counting(
+            self, client, long_list, django_assert_num_queries):
+        second_id = long_list.item_set.all()[1].id
+        url = '/lists/{}/?after={}'.format(long_list.id, PageCursor(second_id, 2))
+        with django_assert_num_queries(2):
+            response = client.get(url)
+        content = response.content.decode()
+        assert '3: item 3' in content
+        assert '4: item 4' in content
+        assert 'item 2' not in content
+        assert '?after={}"'.format(PageCursor(long_list.item_set.all()[3].id, 4)) in content
+
+    def test_bare_item_id_cursors_still_number_rows(self, client, long_list):
+        second_id = long_list.item_set.all()[1].id
+        response = client.get('/lists/{}/?after={}'.format(long_list.id, second_id))
+        assert '3: item 3' in response.content.decode()
+
+    def test_forged_offsets_dont_number_rows(self, client, long_list):
+        second_id = long_list.item_set.all()[1].id
+        for after in ('{}-40'.format(second_id), '{}-40-000000000000'.format(second_id)):
+            response = client.get('/lists/{}/?after={}'.format(long_list.id, after))
+            assert '3: item 3' in response.content.decode()
+
+    def test_streamed_page_contains_every_item(self, client, long_list):
+        response = client.get('/lists/{}/?stream=1'.format(long_list.id))
+        assert response.streaming
+        content = b''.join(response.streaming_content).decode()
+        assert 'Your To-do list' in content
+        assert 'name="text"' in content
+        assert '5: item 5' in content
+        assert content.count('<tr>') == 5
+
+    def test_streamed_table_matches_the_rendered_last_page(self, client, long_list, settings):
+        settings.LISTS_PAGE_SIZE = 10
+        settings.LISTS_LIVE_UPDATES = True
+        rendered = client.get('/lists/{}/'.format(long_list.id)).content.decode()
+        response = client.get('/lists/{}/?stream=1'.format(long_list.id))
+        streamed = b''.join(response.streaming_content).decode()
+        table = re.compile(r'<table id="id_list_table"[^>]*>')
+        assert table.search(streamed).group() == table.search(rendered).group()
+        assert 'data-events-url' in table.search(streamed).group()
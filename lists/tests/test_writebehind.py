@@ -0,0 +1,184 @@
+import json
+import os
+
+from django.core.management import call_command
+from django.utils.html import escape
+import pytest
+
+from lists.forms import DUPLICATE_ITEM_ERROR, ExistingListItemForm
+from lists.models import Item, List
+from lists.signals import items_created
+from lists.writebehind import ItemJournal, get_journal
+
+
+@pytest.fixture
+def journal(settings, tmpdir):
+    settings.LISTS_WRITE_BEHIND_JOURNAL = str(tmpdir.join('journal', 'items.jsonl'))
+    settings.LISTS_WRITE_BEHIND_INTERVAL = None
+    return get_journal()
+
+
+def add_item(list_, text):
+    form = ExistingListItemForm(for_list=list_, data={'text': text})
+    assert form.is_valid(), form.errors
+    return form.save()
+
+
+@pytest.mark.django_db
+class TestItemJournal:
+
+    def test_form_save_queues_item_without_saving_it(self, journal):
+        list_ = List.objects.create()
+        item = add_item(list_, 'queued')
+        assert item.pk is None
+        assert Item.objects.count() == 0
+        assert [item.text for item in journal.pending(list_.id)] == ['queued']
+
+    def test_flush_saves_queued_items_in_order_and_counts_them(self, journal):
+        list_ = List.objects.create()
+        other_list = List.objects.create()
+        add_item(list_, 'first')
+        add_item(other_list, 'elsewhere')
+        add_item(list_, 'second')
+        assert journal.flush() == 3
+        assert [item.text for item in list_.item_set.all()] == ['first', 'second']
+        assert List.objects.get(id=list_.id).item_count == 2
+        assert journal.pending(list_.id) == []
+        assert journal.segments() == []
+
+    def test_flush_sends_items_created_with_saved_items(self, journal):
+        list_ = List.objects.create()
+        add_item(list_, 'queued')
+        received = []
+
+        def receiver(sender, **kwargs):
+            received.extend(item.id for item in kwargs['items'])
+
+        items_created.connect(receiver)
+        try:
+            journal.flush()
+        finally:
+            items_created.disconnect(receiver)
+        assert received == [Item.objects.get().id]
+
+    def test_duplicate_of_a_queued_item_is_rejected(self, journal):
+        list_ = List.objects.create()
+        add_item(list_, 'twice')
+        form = ExistingListItemForm(for_list=list_, data={'text': 'twice'})
+        assert not form.is_valid()
+        assert form.errors['text'] == [DUPLICATE_ITEM_ERROR]
+
+    def test_flush_skips_items_already_saved(self, journal):
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='saved')
+        journal.append(list_.id, 'saved')
+        journal.append(list_.id, 'new')
+        journal.append(list_.id, 'new')
+        assert journal.flush() == 1
+        assert sorted(item.text for item in list_.item_set.all()) == ['new', 'saved']
+
+    def test_segment_left_by_a_crashed_flush_is_saved_by_the_next(self, journal):
+        list_ = List.objects.create()
+        journal.append(list_.id, 'orphaned')
+        os.rename(journal.path, journal.path + '.0000000001.000000-1.flushing')
+        with open(journal.path + '.0000000001.000000-1.flushing', 'a') as f:
+            f.write('{"list": ')  # cut short, never acknowledged
+        assert [item.text for item in journal.pending(list_.id)] == ['orphaned']
+        assert journal.flush() == 1
+        assert journal.segments() == []
+
+    def test_items_of_deleted_lists_are_dropped(self, journal):
+        journal.append(999, 'lost')
+        assert journal.flush() == 0
+        assert journal.segments() == []
+
+    def test_append_after_rotation_goes_to_the_new_journal(self, tmpdir):
+        journal = ItemJournal(str(tmpdir.join('items.jsonl')), fsync=False)
+        journal.append(1, 'before')
+        journal._rotate()
+        journal.append(1, 'after')
+        with open(journal.path) as f:
+            assert [json.loads(line)['text'] for line in f] == ['after']
+
+
+@pytest.mark.django_db
+class TestViewsWithWriteBehind:
+
+    def test_list_page_shows_queued_items_after_saved_ones(self, client, journal):
+        list_ = List.objects.create()
+        client.post('/lists/{}/'.format(list_.id), data={'text': 'one'})
+        journal.flush()
+        response = client.post(
+            '/lists/{}/'.format(list_.id), data={'text': 'two'}, follow=True)
+        content = response.content.decode()
+        assert '1: one' in content
+        assert '2: two' in content
+
+    def test_streamed_page_shows_queued_items_after_saved_ones(self, client, journal):
+        list_ = List.objects.create()
+        client.post('/lists/{}/'.format(list_.id), data={'text': 'one'})
+        journal.flush()
+        client.post('/lists/{}/'.format(list_.id), data={'text': 'two'})
+        response = client.get('/lists/{}/?stream=1'.format(list_.id))
+        content = b''.join(response.streaming_content).decode()
+        assert '1: one' in content
+        assert '2: two' in content
+
+    def test_new_list_redirects_to_list_showing_queued_item(self, client, journal):
+        response = client.post('/lists/new', data={'text': 'queued'}, follow=True)
+        assert '1: queued' in response.content.decode()
+        assert Item.objects.count() == 0
+
+    def test_duplicate_of_queued_item_shows_error(self, client, journal):
+        list_ = List.objects.create()
+        client.post('/lists/{}/'.format(list_.id), data={'text': 'same'})
+        response = client.post('/lists/{}/'.format(list_.id), data={'text': 'same'})
+        assert escape(DUPLICATE_ITEM_ERROR) in response.content.decode()
+
+    def test_ajax_row_is_numbered_after_queued_items(self, client, journal):
+        list_ = List.objects.create()
+        client.post('/lists/{}/'.format(list_.id), data={'text': 'one'})
+        response = client.post(
+            '/lists/{}/'.format(list_.id), data={'text': 'two'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        assert response.content.decode() == '<tr><td>2: two</td></tr>'
+
+    def test_journal_is_read_once_per_request(self, client, journal, monkeypatch):
+        list_ = List.objects.create()
+        client.post('/lists/{}/'.format(list_.id), data={'text': 'one'})
+        reads = []
+        read_pending = ItemJournal.pending
+        monkeypatch.setattr(ItemJournal, 'pending',
+                            lambda self, list_id: reads.append(list_id) or read_pending(self, list_id))
+        response = client.get('/lists/{}/'.format(list_.id))
+        assert '1: one' in response.content.decode()
+        assert reads == [list_.id]
+        response = client.post(
+            '/lists/{}/'.format(list_.id), data={'text': 'two'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        assert response.content.decode() == '<tr><td>2: two</td></tr>'
+        assert reads == [list_.id, list_.id]
+
+    def test_queued_item_changes_the_list_etag(self, client, journal):
+        list_ = List.objects.create()
+        client.get('/')
+        etag = client.get('/lists/{}/'.format(list_.id))['ETag']
+        client.post('/lists/{}/'.format(list_.id), data={'text': 'queued'})
+        response = client.get('/lists/{}/'.format(list_.id), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert 'Last-Modified' not in response
+
+    def test_api_lists_queued_items_without_ids(self, client, journal):
+        list_ = List.objects.create()
+        client.post('/lists/{}/'.format(list_.id), data={'text': 'queued'})
+        data = json.loads(client.get('/api/lists/{}/'.format(list_.id)).content.decode())
+        assert data['items'] == [{'id': None, 'text': 'queued'}]
+
+
+@pytest.mark.django_db
+def test_flush_item_journal_command(journal, capsys):
+    list_ = List.objects.create()
+    journal.append(list_.id, 'queued')
+    call_command('flush_item_journal')
+    assert 'Saved 1 queued items.' in capsys.readouterr().out
+    assert Item.objects.get().text == 'queued'
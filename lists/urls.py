@@ -4,4 +4,6 @@ from lists import views
 urlpatterns = [
     url(r'^new$', views.new_list, name='new_list'),
     url(r'^(\d+)/$', views.view_list, name='view_list'),
+    url(r'^(\d+)/events$', views.list_events, name='list_events'),
+    url(r'^(\d+)/items/bulk$', views.add_items_in_bulk, name='add_items_in_bulk'),
 ]
@@ -1,29 +1,159 @@
-from django.shortcuts import redirect, render
+import json
 
-from lists.forms import ExistingListItemForm, ItemForm
+from django.conf import settings
+from django.core.urlresolvers import reverse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.utils.html import format_html
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import (condition, etag, require_POST,
+                                          require_safe)
+from django.views.decorators.vary import vary_on_cookie
+
+from lists.conditional import (home_page_etag, view_list_etag,
+                               view_list_last_modified)
+from lists.events import event_stream, parse_last_event_id
+from lists.forms import BulkItemForm, ExistingListItemForm, ItemForm
 from lists.models import List
+from lists.pagination import ROW_HTML, parse_page_cursor, stream_table_rows
+from lists.writebehind import pending_items, pending_rows
+
+TABLE_PLACEHOLDER = '<!-- list table -->'
 
 
+@cache_control(private=True, no_cache=True)
+@vary_on_cookie
+@etag(home_page_etag)
 def home_page(request):
     return render(request, 'home.html', {'form': ItemForm()})
 
 
+@cache_control(private=True, no_cache=True)
+@vary_on_cookie
+@condition(etag_func=view_list_etag, last_modified_func=view_list_last_modified)
 def view_list(request, list_id):
     list_ = List.objects.get(id=list_id)
     form = ExistingListItemForm(for_list=list_)
     if request.method == 'POST':
         form = ExistingListItemForm(for_list=list_, data=request.POST)
-        if form.is_valid():
-            form.save()
+        item = form.save() if form.is_valid() else None
+        if item is not None:
+            if request.is_ajax():
+                return _item_row_response(list_, item)
             return redirect(list_)
-    return render(request, 'list.html', {'list': list_, 'form': form})
+        if request.is_ajax():
+            return _item_errors_response(form)
+    elif request.GET.get('stream'):
+        return _stream_list(request, list_, form)
+    return render(request, 'list.html', {
+        'list': list_,
+        'form': form,
+        'cursor': parse_page_cursor(request.GET.get('after')),
+    })
+
+
+def _stream_list(request, list_, form):
+    page = render_to_string('list.html', {
+        'list': list_,
+        'form': form,
+        'table_placeholder': TABLE_PLACEHOLDER,
+    }, request=request)
+    head, tail = page.split(TABLE_PLACEHOLDER, 1)
+
+    def content():
+        yield head
+        # The rows streamed are the items up to the newest one now, which is
+        # where the table's live updates carry on from, as in list_table.html.
+        last_id = list_.item_set.order_by('-id').values_list('id', flat=True).first()
+        if settings.LISTS_LIVE_UPDATES:
+            yield format_html(
+                '<table id="id_list_table" class="table" data-events-url="{}?after={}">',
+                reverse('list_events', args=[list_.id]), last_id or '')
+        else:
+            yield '<table id="id_list_table" class="table">'
+        if last_id is not None:
+            for rows in stream_table_rows(list_, until=last_id):
+                yield rows
+        pending = pending_items(list_.id)
+        if pending:
+            yield pending_rows(list_, pending)
+        yield '</table>'
+        yield tail
+
+    return StreamingHttpResponse(content())
+
+
+@require_safe
+def list_events(request, list_id):
+    # Pages rendered before live updates were turned off may still ask.
+    if not settings.LISTS_LIVE_UPDATES:
+        raise Http404
+    list_ = get_object_or_404(List, id=list_id)
+    after = parse_last_event_id(request.META, request.GET.get('after'))
+    response = StreamingHttpResponse(
+        event_stream(list_.id, after), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 def new_list(request):
     form = ItemForm(data=request.POST)
     if form.is_valid():
         list_ = List.objects.create()
-        form.save(for_list=list_)
+        item = form.save(for_list=list_)
+        if request.is_ajax():
+            return _item_row_response(list_, item)
         return redirect(list_)
+    elif request.is_ajax():
+        return _item_errors_response(form)
     else:
         return render(request, 'home.html', {'form': form})
+
+
+def _item_row_response(list_, item):
+    # Answers an XHR add from list.js with just the new table row, saving the
+    # redirect and the full page render that a browser form post costs.
+    # Location tells the script which list the item went to.
+    number = list_.item_count
+    if item.pk is None:
+        # Queued by the write-behind journal, as the newest pending item.
+        number += len(pending_items(list_.id))
+    row = format_html(ROW_HTML, number, item.text)
+    response = HttpResponse(row, status=201)
+    response['Location'] = list_.get_absolute_url()
+    return response
+
+
+def _item_errors_response(form):
+    return JsonResponse({'errors': form.errors['text']}, status=400)
+
+
+def _parse_bulk_texts(request):
+    body = request.body.decode(request.encoding or 'utf-8')
+    content_type = request.META.get('CONTENT_TYPE', '').split(';')[0]
+    if content_type == 'application/json':
+        texts = json.loads(body)
+        if not isinstance(texts, list) or not all(
+                isinstance(text, str) for text in texts):
+            raise ValueError('Expected a JSON array of strings')
+        return texts
+    return body.splitlines()
+
+
+@csrf_exempt
+@require_POST
+def add_items_in_bulk(request, list_id):
+    list_ = get_object_or_404(List, id=list_id)
+    try:
+        texts = _parse_bulk_texts(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    form = BulkItemForm(for_list=list_, texts=texts)
+    items = form.save()
+    return JsonResponse(
+        {'created': len(items), 'errors': form.errors},
+        status=201 if items else 400
+    )
@@ -0,0 +1,302 @@
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started, setting_changed
+from django.db import IntegrityError, close_old_connections, transaction
+from django.dispatch import receiver
+from django.utils.html import format_html
+
+from lists.models import Item, List, hash_text, save_new_items
+from lists.pagination import ROW_HTML
+from lists.sharding import shard_for
+from lists.signals import items_created
+
+logger = logging.getLogger(__name__)
+
+# SQLite allows 999 variables per statement.
+HASH_QUERY_CHUNK = 500
+
+# A queued item; it has no id until it is flushed.
+PendingItem = namedtuple('PendingItem', ['id', 'text', 'text_hash'])
+
+
+class ItemJournal(object):
+    """Append-only file of validated items waiting to be written to the
+    database.
+
+    Workers append under an exclusive flock and answer straight away. A flush
+    renames the journal to a segment, so appends carry on into a fresh file,
+    then saves the segment's items in batched transactions and deletes it.
+    Segments left behind by a flusher that died are picked up by the next
+    flush. Items already in the database are skipped, which keeps the
+    unique constraint intact and makes replaying a segment harmless.
+    """
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def append(self, list_id, text):
+        line = (json.dumps({'list': list_id, 'text': text}) + '\n').encode('utf-8')
+        while True:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                # A flush may have renamed the file while we waited for the
+                # lock; then write to the new journal instead.
+                if _is_current(fd, self.path):
+                    os.write(fd, line)
+                    # Others may append while we wait for the disk; the
+                    # data is synced wherever a flush has moved the file.
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    if self.fsync:
+                        os.fsync(fd)
+                    _remember_queued(list_id, text)
+                    return
+            finally:
+                os.close(fd)
+
+    def segments(self):
+        return sorted(glob.glob(glob.escape(self.path) + '.*.flushing'))
+
+    def pending(self, list_id):
+        """Items queued for the list and not saved yet, oldest first."""
+        # The journal is read before the segments: a flush that renames it
+        # in between moves its items into a segment we are yet to read.
+        journal = _list_texts(_read_entries(self.path), list_id)
+        flushing = []
+        for path in self.segments():
+            flushing.extend(_list_texts(_read_entries(path), list_id))
+        if flushing:
+            # A segment stays on disk for a moment after it was saved.
+            saved = _saved_hashes(list_id, [hash_text(text) for text in flushing])
+        else:
+            saved = set()
+        items = []
+        for text in flushing + journal:
+            text_hash = hash_text(text)
+            if text_hash not in saved:
+                saved.add(text_hash)
+                items.append(PendingItem(None, text, text_hash))
+        return items
+
+    def flush(self, batch_size=None):
+        """Saves the queued items and returns how many were new."""
+        batch_size = batch_size or settings.LISTS_WRITE_BEHIND_BATCH_SIZE
+        self._rotate()
+        saved = 0
+        for path in self.segments():
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # another flusher is on it
+                if not os.path.exists(path):
+                    continue
+                saved += _save_entries(_read_entries(path), batch_size)
+                os.unlink(path)
+            finally:
+                os.close(fd)
+        return saved
+
+    def _rotate(self):
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if _is_current(fd, self.path) and os.fstat(fd).st_size:
+                os.rename(self.path, '{}.{:017.6f}-{}.flushing'.format(
+                    self.path, time.time(), os.getpid()))
+        finally:
+            os.close(fd)
+
+
+def _is_current(fd, path):
+    try:
+        return os.fstat(fd).st_ino == os.stat(path).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _read_entries(path):
+    try:
+        with open(path, 'rb') as f:
+            lines = f.read().decode('utf-8').splitlines()
+    except FileNotFoundError:
+        return []
+    entries = []
+    for line in lines:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            pass  # a line cut short by a crash was never acknowledged
+    return entries
+
+
+def _list_texts(entries, list_id):
+    return [entry['text'] for entry in entries if entry['list'] == list_id]
+
+
+def _saved_hashes(list_id, hashes):
+    hashes = list(hashes)
+    saved = set()
+    for start in range(0, len(hashes), HASH_QUERY_CHUNK):
+        saved.update(
+            Item.objects.filter(
+                list_id=list_id, text_hash__in=hashes[start:start + HASH_QUERY_CHUNK]
+            ).values_list('text_hash', flat=True)
+        )
+    return saved
+
+
+def _save_entries(entries, batch_size):
+    shards = {}
+    by_shard = OrderedDict()
+    for entry in entries:
+        if entry['list'] not in shards:
+            shards[entry['list']] = shard_for(entry['list'])
+        by_shard.setdefault(shards[entry['list']], []).append(entry)
+    saved = 0
+    for shard, shard_entries in by_shard.items():
+        for start in range(0, len(shard_entries), batch_size):
+            batch = shard_entries[start:start + batch_size]
+            # Items added through the bulk API can race the duplicate check;
+            # a retry finds them and skips them.
+            for attempt in range(3):
+                try:
+                    created = _save_batch(batch, shard)
+                    break
+                except IntegrityError:
+                    if attempt == 2:
+                        raise
+            for list_, items in created:
+                items_created.send(sender=ItemJournal, list=list_, items=items)
+                saved += len(items)
+    return saved
+
+
+def _save_batch(entries, shard):
+    texts_by_list = OrderedDict()
+    for entry in entries:
+        texts_by_list.setdefault(entry['list'], []).append(entry['text'])
+    lists = List.objects.using(shard).in_bulk(list(texts_by_list))
+    new_items = []
+    for list_id, texts in texts_by_list.items():
+        list_ = lists.get(list_id)
+        if list_ is None:
+            logger.warning('Dropped %d queued items of deleted list %s',
+                           len(texts), list_id)
+            continue
+        hashes = [hash_text(text) for text in texts]
+        seen = _saved_hashes(list_id, hashes)
+        items = []
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in seen:
+                seen.add(text_hash)
+                items.append(Item(list=list_, text=text, text_hash=text_hash))
+        if items:
+            new_items.append((list_, items))
+    # The transaction only writes: on SQLite, one that read first could
+    # not wait for the write lock and would fail as soon as it is busy.
+    with transaction.atomic(using=shard):
+        for list_, items in new_items:
+            save_new_items(list_, items)
+    return new_items
+
+
+def pending_rows(list_, items):
+    # Queued items are numbered after the saved ones.
+    return ''.join(
+        format_html(ROW_HTML, list_.item_count + n, item.text)
+        for n, item in enumerate(items, 1)
+    )
+
+
+def flush_periodically(journal, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            journal.flush()
+        except Exception:
+            logger.exception('Flushing the item journal failed')
+        finally:
+            close_old_connections()
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    """The item journal, or None when write-behind is off. The first call in
+    a process starts its flusher thread when LISTS_WRITE_BEHIND_INTERVAL is
+    set; every worker flushes, and the segment locks keep them apart."""
+    global _journal
+    path = getattr(settings, 'LISTS_WRITE_BEHIND_JOURNAL', None)
+    if not path:
+        return None
+    with _journal_lock:
+        if _journal is None:
+            _journal = ItemJournal(path, settings.LISTS_WRITE_BEHIND_FSYNC)
+            interval = settings.LISTS_WRITE_BEHIND_INTERVAL
+            if interval:
+                threading.Thread(
+                    target=flush_periodically, args=(_journal, interval), daemon=True
+                ).start()
+        return _journal
+
+
+@receiver(setting_changed)
+def _reset_journal(**kwargs):
+    global _journal
+    if kwargs['setting'].startswith('LISTS_WRITE_BEHIND_'):
+        with _journal_lock:
+            _journal = None
+
+
+# Pending items by list for the request this thread is handling, which
+# looks them up for its ETag, to validate a new item and to render the
+# table. Outside requests every lookup reads the journal.
+_request = threading.local()
+
+
+@receiver(request_started)
+def _start_request(**kwargs):
+    _request.pending = {}
+
+
+@receiver(request_finished)
+def _finish_request(**kwargs):
+    _request.pending = None
+
+
+def pending_items(list_id):
+    journal = get_journal()
+    if journal is None:
+        return []
+    pending = getattr(_request, 'pending', None)
+    if pending is None:
+        return journal.pending(list_id)
+    if list_id not in pending:
+        pending[list_id] = journal.pending(list_id)
+    return pending[list_id]
+
+
+def _remember_queued(list_id, text):
+    pending = getattr(_request, 'pending', None)
+    if pending is not None and list_id in pending:
+        pending[list_id] = pending[list_id] + [PendingItem(None, text, hash_text(text))]
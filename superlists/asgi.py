@@ -0,0 +1,318 @@
+"""
+ASGI config for superlists project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+for servers such as uvicorn (see deploy_tools/gunicorn-asgi-upstart.template.conf).
+
+Django 1.9 has no async views, so the views run in a thread pool of
+SUPERLISTS_ASGI_THREADS threads. Reading request bodies and sending
+responses happens on the event loop, so slow clients don't hold a thread,
+except that a streamed response keeps its thread until it ends, working at
+most STREAM_BUFFER chunks ahead of the client.
+
+Live list event streams (/lists/<id>/events) are served here directly rather
+than through Django, so an idle subscriber is a coroutine waiting on a queue
+and costs no thread at all.
+"""
+
+import asyncio
+import functools
+import io
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections
+
+from lists.broker import get_broker
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "superlists.settings")
+
+EVENTS_PATH = re.compile(r'^/lists/(\d+)/events$')
+KEEPALIVE = object()
+# Chunks of a streamed response produced ahead of the client.
+STREAM_BUFFER = 8
+
+
+class ASGIHandler(object):
+
+    def __init__(self, wsgi_application, max_workers):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.event_queues = {}
+        self.event_callbacks = {}
+        self.keepalive_timers = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            match = EVENTS_PATH.match(scope['path'])
+            if match and scope['method'] == 'GET':
+                await self.events(scope, receive, send, int(match.group(1)))
+            else:
+                await self.http(scope, receive, send)
+        else:
+            raise ValueError('Unsupported ASGI scope type: {}'.format(scope['type']))
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        environ = self.build_environ(scope, body)
+        loop = asyncio.get_event_loop()
+        messages = asyncio.Queue(maxsize=STREAM_BUFFER)
+        stopped = threading.Event()
+        producer = loop.run_in_executor(
+            self.executor, self.run_application, environ, loop, messages, stopped)
+        finished = False
+        try:
+            while True:
+                message = await messages.get()
+                if message is None:
+                    finished = True
+                    break
+                await send(message)
+        finally:
+            if not finished:
+                # The client went away: stop the thread, and take what it
+                # was still handing over so it isn't left waiting.
+                stopped.set()
+                while (await messages.get()) is not None:
+                    pass
+            await producer
+
+    def run_application(self, environ, loop, messages, stopped):
+        # Runs in the thread pool. The response is produced by this one
+        # thread from start to end, so a streamed response's queries run on
+        # the connections of the thread that closes them when it ends. The
+        # messages for the client go through a small queue, which holds the
+        # thread back while a slow client catches up, and end with None.
+        def put(message):
+            asyncio.run_coroutine_threadsafe(messages.put(message), loop).result()
+
+        try:
+            status, headers, response = self.call_application(environ)
+            start = {'type': 'http.response.start', 'status': status, 'headers': headers}
+            try:
+                if not getattr(response, 'streaming', False):
+                    content = b''.join(response)
+                    put(start)
+                    put({'type': 'http.response.body', 'body': content})
+                    return
+                put(start)
+                for chunk in response:
+                    if stopped.is_set():
+                        return
+                    put({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                put({'type': 'http.response.body', 'body': b''})
+            finally:
+                # Sends request_finished, which closes this thread's connections.
+                self.close_response(response)
+        finally:
+            put(None)
+
+    async def events(self, scope, receive, send, list_id):
+        loop = asyncio.get_event_loop()
+        pending = asyncio.Queue()
+        await self.read_body(receive)
+        environ = self.build_environ(scope, b'')
+        after = list_events.parse_last_event_id(
+            environ, _query_param(environ['QUERY_STRING'], 'after'))
+        self.add_event_queue(loop, list_id, pending)
+        try:
+            missed = await loop.run_in_executor(
+                self.executor, self.find_missed_events, list_id, after)
+            if missed is False:
+                await send({
+                    'type': 'http.response.start',
+                    'status': 404,
+                    'headers': [(b'content-type', b'text/plain')],
+                })
+                await send({'type': 'http.response.body', 'body': b'Not Found'})
+                return
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await self.send_event_text(send, list_events.stream_header(missed))
+            if missed is None:
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+            sent = list_events.last_id(missed, after)
+            watcher = asyncio.ensure_future(self.watch_disconnect(receive, pending))
+            try:
+                while True:
+                    events = await pending.get()
+                    if events is None:
+                        return
+                    if events is KEEPALIVE:
+                        text = list_events.KEEPALIVE
+                    else:
+                        text, sent = list_events.format_new_events(events, sent)
+                    if text:
+                        await self.send_event_text(send, text)
+            finally:
+                watcher.cancel()
+        finally:
+            self.remove_event_queue(loop, list_id, pending)
+
+    # The broker calls back from whichever thread saved the item. Each list
+    # has a single broker subscription per event loop, which hands the
+    # events over to the loop once; the fan-out to the streams' queues then
+    # happens on the loop, instead of one thread switch per subscriber. A
+    # timer per list sends the keepalives the same way, so a waiting stream
+    # is just a coroutine blocked on its queue.
+
+    def add_event_queue(self, loop, list_id, pending):
+        key = (loop, list_id)
+        queues = self.event_queues.get(key)
+        if queues is None:
+            queues = self.event_queues[key] = set()
+            callback = functools.partial(self.schedule_events, loop, key)
+            self.event_callbacks[key] = callback
+            get_broker().subscribe(list_id, callback)
+            self.schedule_keepalive(loop, key)
+        queues.add(pending)
+
+    def remove_event_queue(self, loop, list_id, pending):
+        key = (loop, list_id)
+        queues = self.event_queues[key]
+        queues.discard(pending)
+        if not queues:
+            del self.event_queues[key]
+            get_broker().unsubscribe(list_id, self.event_callbacks.pop(key))
+            self.keepalive_timers.pop(key).cancel()
+
+    def schedule_keepalive(self, loop, key):
+        self.keepalive_timers[key] = loop.call_later(
+            settings.LISTS_EVENTS_KEEPALIVE, self.send_keepalives, loop, key)
+
+    def send_keepalives(self, loop, key):
+        self.fan_out_events(key, KEEPALIVE)
+        self.schedule_keepalive(loop, key)
+
+    def schedule_events(self, loop, key, events):
+        try:
+            loop.call_soon_threadsafe(self.fan_out_events, key, events)
+        except RuntimeError:
+            pass  # the loop closed while its last stream was ending
+
+    def fan_out_events(self, key, events):
+        for pending in self.event_queues.get(key, ()):
+            pending.put_nowait(events)
+
+    async def watch_disconnect(self, receive, pending):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        pending.put_nowait(None)
+
+    def find_missed_events(self, list_id, after):
+        # Runs in the thread pool; False means there is no such list.
+        try:
+            if not List.objects.filter(id=list_id).exists():
+                return False
+            return list_events.missed_events(list_id, after)
+        finally:
+            close_old_connections()
+
+    async def send_event_text(self, send, text):
+        await send({
+            'type': 'http.response.body',
+            'body': text.encode('utf-8'),
+            'more_body': True,
+        })
+
+    async def read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    def build_environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            # WSGI carries the raw path bytes as latin-1.
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+            'REMOTE_ADDR': client[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.version': (1, 0),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_LENGTH':
+                continue
+            key = name if name == 'CONTENT_TYPE' else 'HTTP_' + name
+            if key in environ:
+                value = environ[key] + ',' + value
+            environ[key] = value
+        return environ
+
+    def call_application(self, environ):
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in response_headers
+            ]
+
+        response = self.wsgi_application(environ, start_response)
+        return started['status'], started['headers'], response
+
+    def close_response(self, response):
+        if hasattr(response, 'close'):
+            response.close()
+
+
+def _query_param(query_string, name):
+    values = parse_qs(query_string).get(name)
+    return values[0] if values else None
+
+
+application = ASGIHandler(
+    get_wsgi_application(),
+    max_workers=int(os.environ.get('SUPERLISTS_ASGI_THREADS', '8')),
+)
+
+from lists import events as list_events  # noqa: E402
+from lists.assets import warm_up  # noqa: E402
+from lists.models import List  # noqa: E402
+warm_up()
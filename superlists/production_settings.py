@@ -0,0 +1,130 @@
+"""
+Production settings for superlists.
+
+Use with DJANGO_SETTINGS_MODULE=superlists.production_settings. Keeps
+database connections open between requests and runs SQLite in WAL mode,
+so readers are not blocked while gunicorn workers insert items. Set
+SUPERLISTS_DB_ENGINE=postgresql to use Postgres behind a connection pool
+such as PgBouncer instead.
+"""
+
+import os
+
+from superlists.settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get('SUPERLISTS_ALLOWED_HOSTS', 'localhost').split(',')
+
+SECRET_KEY = os.environ.get('SUPERLISTS_SECRET_KEY', SECRET_KEY)
+
+
+# Database
+
+if os.environ.get('SUPERLISTS_DB_ENGINE') == 'postgresql':
+    # Point HOST/PORT at the pool (PgBouncer listens on 6432 by default);
+    # each worker keeps one connection to it.
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql_psycopg2',
+            'NAME': os.environ.get('SUPERLISTS_DB_NAME', 'superlists'),
+            'USER': os.environ.get('SUPERLISTS_DB_USER', 'superlists'),
+            'PASSWORD': os.environ.get('SUPERLISTS_DB_PASSWORD', ''),
+            'HOST': os.environ.get('SUPERLISTS_DB_HOST', '127.0.0.1'),
+            'PORT': os.environ.get('SUPERLISTS_DB_PORT', '6432'),
+            'CONN_MAX_AGE': 600,
+        }
+    }
+    # Streaming replicas (or pools in front of them) that serve the reads of
+    # GET requests; see LISTS_REPLICAS in superlists/settings.py.
+    LISTS_REPLICAS = []
+    for number, host in enumerate(
+            filter(None, os.environ.get('SUPERLISTS_DB_REPLICA_HOSTS', '').split(',')), 1):
+        alias = 'replica{}'.format(number)
+        DATABASES[alias] = dict(DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'})
+        LISTS_REPLICAS.append(alias)
+else:
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        # Seconds the sqlite3 driver waits for a lock before giving up.
+        'OPTIONS': {'timeout': 5},
+    })
+
+LISTS_SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+
+# Templates
+#
+# Parsed templates are kept by the cached loader for the life of the worker;
+# superlists.wsgi / superlists.asgi load them at boot (lists.assets.warm_up).
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'OPTIONS': {
+            'context_processors': TEMPLATES[0]['OPTIONS']['context_processors'],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+]
+
+
+# Static files
+#
+# collectstatic writes content-hashed copies plus .gz/.br variants, which
+# nginx serves with far-future cache headers (deploy_tools/nginx.template.conf).
+
+STATICFILES_STORAGE = 'lists.storage.CompressedManifestStaticFilesStorage'
+
+
+# Cache shared by all gunicorn workers
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.abspath(os.path.join(BASE_DIR, '../cache')),
+    }
+}
+
+
+# Instrumentation
+
+LISTS_PERF_SAMPLE_RATE = 0.1
+LISTS_PERF_DUMP_DIR = os.path.abspath(os.path.join(BASE_DIR, '../perf'))
+
+
+# Live list updates shared by all workers; list pages only subscribe to them
+# with SUPERLISTS_LIVE_UPDATES=1, which the ASGI upstart job sets
+
+LISTS_LIVE_UPDATES = os.environ.get('SUPERLISTS_LIVE_UPDATES') == '1'
+LISTS_BROKER_DIR = os.path.abspath(os.path.join(BASE_DIR, '../broker'))
+
+
+# Search index shared by all workers
+
+LISTS_SEARCH_INDEX = os.path.abspath(os.path.join(BASE_DIR, '../database/search.sqlite3'))
+
+
+# Duplicate item filters shared by all workers
+
+LISTS_ITEM_INDEX_DIR = os.path.abspath(os.path.join(BASE_DIR, '../itemindex'))
+
+
+# Rate limits on writes, shared by all workers; nginx passes the client's
+# address in X-Real-IP
+
+LISTS_RATE_LIMIT_CLIENT = (2.0, 30)
+LISTS_RATE_LIMIT_LIST = (10.0, 100)
+LISTS_RATE_LIMIT_FILE = os.path.abspath(os.path.join(BASE_DIR, '../ratelimit/buckets'))
+LISTS_CLIENT_ADDRESS_HEADER = 'HTTP_X_REAL_IP'
@@ -41,6 +41,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE_CLASSES = [
+    'lists.middleware.PerformanceMiddleware',
+    'lists.middleware.RateLimitMiddleware',
+    'lists.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,6 +85,114 @@ DATABASES = {
     }
 }
 
+DATABASE_ROUTERS = ['lists.routers.ShardRouter']
+
+# Shards (lists.sharding): aliases in DATABASES that lists and their items
+# are spread over, and the function that places each new list, called with
+# its id and the shards. The directory of lists stays on 'default', which
+# needn't be a shard. To try them out locally, add SQLite databases such as
+# ../database/shard1.sqlite3, run `manage.py migrate --database shard1` and
+# spread the existing lists with `manage.py rebalance_lists`.
+LISTS_SHARDS = ['default']
+LISTS_SHARD_PLACEMENT = 'lists.sharding.place_by_id'
+
+# Read replicas (lists.routers, lists.middleware.ReplicaMiddleware): aliases
+# in DATABASES that serve the reads of GET requests, and seconds a client
+# that wrote keeps reading from the primary. They replicate 'default', so
+# with shards they serve the lists on it. Give each one
+# 'TEST': {'MIRROR': 'default'}. To try them out locally, add SQLite
+# databases such as ../database/replica.sqlite3 and keep them current with
+# `manage.py sync_replicas --interval 1`.
+LISTS_REPLICAS = []
+LISTS_REPLICA_PIN_SECONDS = 5
+
+# PRAGMAs run on every new SQLite connection by lists.db.configure_sqlite,
+# e.g. {'journal_mode': 'wal'}. See superlists/production_settings.py.
+LISTS_SQLITE_PRAGMAS = {}
+
+# `manage.py test` runner: adds --browser-only and per-test durations, and times
+# tests run in parallel with --parallel.
+TEST_RUNNER = 'functional_tests.runner.FunctionalTestRunner'
+
+
+# Cache
+# https://docs.djangoproject.com/en/1.9/topics/cache/
+#
+# Local memory is per process. When several gunicorn workers serve the site,
+# point 'default' at a shared backend such as
+# 'django.core.cache.backends.filebased.FileBasedCache' so that a new item
+# invalidates the cached list table in every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache alias and timeout (seconds, None for no expiry) used for the
+# rendered list tables.
+LISTS_CACHE_ALIAS = 'default'
+LISTS_TABLE_CACHE_TIMEOUT = None
+
+# Items shown per page of a list, and fetched per query when a list page is
+# streamed with ?stream=1.
+LISTS_PAGE_SIZE = 100
+LISTS_STREAM_CHUNK_SIZE = 500
+
+# Default and maximum number of items per response of the JSON API.
+LISTS_API_PAGE_SIZE = 100
+LISTS_API_MAX_PAGE_SIZE = 1000
+
+# Request instrumentation (lists.middleware.PerformanceMiddleware): fraction
+# of requests timed, samples kept per view and metric, and where each worker
+# writes its snapshot every LISTS_PERF_DUMP_EVERY sampled requests for
+# `manage.py perfstats` to read (None to keep the stats in memory only).
+LISTS_PERF_SAMPLE_RATE = 1.0
+LISTS_PERF_WINDOW = 1000
+LISTS_PERF_DUMP_DIR = None
+LISTS_PERF_DUMP_EVERY = 100
+
+# Live list updates (lists.broker, lists.events): whether list pages open an
+# event stream, which holds a connection for as long as the page is open and,
+# under WSGI, a worker with it, so only turn it on when serving through
+# superlists.asgi; directory where each worker with event subscribers binds
+# a unix socket so items saved by other workers reach it (None for a single
+# process), and seconds between keepalive comments on an idle event stream.
+LISTS_LIVE_UPDATES = False
+LISTS_BROKER_DIR = None
+LISTS_EVENTS_KEEPALIVE = 15
+
+# Write-behind for items added through the item forms (lists.writebehind):
+# path of the journal they are queued in (None saves them right away),
+# whether each append is fsynced, seconds between flushes by each worker's
+# flusher thread (None to only flush with `manage.py flush_item_journal`),
+# and items saved per transaction.
+LISTS_WRITE_BEHIND_JOURNAL = None
+LISTS_WRITE_BEHIND_FSYNC = True
+LISTS_WRITE_BEHIND_INTERVAL = 0.5
+LISTS_WRITE_BEHIND_BATCH_SIZE = 500
+
+# Rate limits on posts that write lists and items
+# (lists.middleware.RateLimitMiddleware): (requests a second, burst) per
+# client and per list, None for no limit; the file in which the workers
+# share their token buckets (None keeps them per process), and the
+# request.META key holding the client's address.
+LISTS_RATE_LIMIT_CLIENT = None
+LISTS_RATE_LIMIT_LIST = None
+LISTS_RATE_LIMIT_FILE = None
+LISTS_CLIENT_ADDRESS_HEADER = 'REMOTE_ADDR'
+
+# Full-text search (lists.search, /api/lists/search?q=): path of the SQLite
+# FTS5 index of the items, e.g. os.path.join(BASE_DIR, '../database/search.sqlite3')
+# (None scans the items table instead). Fill it with
+# `manage.py rebuild_search_index`.
+LISTS_SEARCH_INDEX = None
+
+# Duplicate item checks (lists.dedupe): directory of the per-list Bloom
+# filters that let most new items skip the duplicate query, shared by every
+# worker (None keeps them per process).
+LISTS_ITEM_INDEX_DIR = None
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
@@ -16,10 +16,12 @@ Including another URLconf
 from django.conf.urls import include, url
 
 from lists import views as list_views
+from lists import api_urls as list_api_urls
 from lists import urls as list_urls
 
 urlpatterns = [
     url(r'^$', list_views.home_page, name='home'),
     url(r'^lists/', include(list_urls)),
+    url(r'^api/lists/', include(list_api_urls)),
    # url(r'^admin/', admin.site.urls),
 ]